@@ -1,137 +1,206 @@
-import json
+import argparse
 import os
-import string
-import random
-from unidecode import unidecode
+import sys
+import time
+from collections import defaultdict
 
-print("--- Iniciando Simulador de IA y Evaluación ---")
+import numpy as np
+
+from comun.io_datos import iter_records
+from comun.metricas import f1_score_batch, substring_accuracy_batch
+from comun.simulacion import ERRORES, FORMATOS, AnswerSimulator, parse_mezcla
 
 BENCHMARK_FILE = "dataset_benchmark_qa.json"
 SIMULATED_ANSWERS_FILE = "respuestas_llm.json"
 
-if not os.path.exists(BENCHMARK_FILE):
-    print(f"Error: No se encuentra '{BENCHMARK_FILE}'.")
-    print("Por favor, ejecuta '2_generador_qa.py' primero.")
-else:
-    with open(BENCHMARK_FILE, 'r', encoding='utf-8') as f:
-        benchmark_data = json.load(f)
-
-    respuestas_simuladas = []
-    
-    print(f"Simulando respuestas de LLM para {len(benchmark_data)} preguntas...")
-
-    sample_size = min(len(benchmark_data), 1000) 
-    if len(benchmark_data) == 0:
-        print("Error: El benchmark está vacío. Revisa el script 2.")
-        exit()
-    
-    benchmark_sample = random.sample(benchmark_data, sample_size)
-    print(f"(Simulando sobre una muestra de {sample_size} preguntas)")
-
-    for item in benchmark_sample:
-        pregunta = item['pregunta']
-        respuesta_correcta = item['respuesta_correcta']
-        
-        # Lógica de simulación para crear variaciones
-        # 1 de cada 5 respuestas será incorrecta
-        if random.random() < 0.20: 
-            respuesta_simulada = "No lo sé." # Respuesta incorrecta
-        else:
-            # Si es correcta, aplicamos una variación al azar
-            rand_val = random.random()
-
-            respuesta_correcta_str = str(respuesta_correcta)
-
-            if rand_val < 0.25:
-                # 1. Respuesta exacta
-                respuesta_simulada = respuesta_correcta_str
-            elif rand_val < 0.5:
-                # 2. Respuesta con texto al inicio
-                respuesta_simulada = f"La respuesta es {respuesta_correcta_str.lower()}"
-            elif rand_val < 0.75:
-                # 3. Respuesta con texto al final
-                respuesta_simulada = f"Se sabe que fue {respuesta_correcta_str.lower()}."
-            else:
-                # 4. Respuesta con mayúsculas/minúsculas raras
-                respuesta_simulada = f"Creo que {respuesta_correcta_str.upper()}"
-        
-        respuestas_simuladas.append({
-            "pregunta": pregunta,
-            "respuesta_llm": respuesta_simulada
-        })
-
-    # Guardar las respuestas simuladas
-    with open(SIMULATED_ANSWERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(respuestas_simuladas, f, ensure_ascii=False, indent=4)
-    
-    print(f"¡Simulación completa! Se guardó '{SIMULATED_ANSWERS_FILE}'.")
-
-    def normalizar_texto(texto):
-        """
-        Convierte el texto a un formato simple para comparación:
-        - Minúsculas
-        - Sin tildes
-        - Sin puntuación
-        """
-        if not isinstance(texto, str):
-            return ""
-        
-        texto = texto.lower()
-        texto = unidecode(texto)
-        texto = texto.translate(str.maketrans('', '', string.punctuation))
-        texto = texto.strip()
-        return texto
-
-    respuestas_correctas = {
-        item['pregunta']: item['respuesta_correcta'] for item in benchmark_data
-    }
-
-    with open(SIMULATED_ANSWERS_FILE, 'r', encoding='utf-8') as f:
-        llm_data = json.load(f)
-
-    total_preguntas = 0
-    correctas = 0
-    resultados_evaluacion = []
-
-    print("Resultados de la evaluación")
-
-    for item_llm in llm_data:
-        pregunta = item_llm['pregunta']
-        respuesta_llm = item_llm['respuesta_llm']
-
-        if pregunta in respuestas_correctas:
-            total_preguntas += 1
-            respuesta_correcta = respuestas_correctas[pregunta]
-
-            norm_correcta = normalizar_texto(respuesta_correcta)
-            norm_llm = normalizar_texto(respuesta_llm)
-
-            es_correcta = False
-            
-            if norm_correcta in norm_llm and norm_correcta != "":
-                es_correcta = True
-                correctas += 1
-            
-            resultados_evaluacion.append({
-                "pregunta": pregunta,
-                "respuesta_correcta": respuesta_correcta,
-                "respuesta_llm": respuesta_llm,
-                "evaluacion": "CORRECTO" if es_correcta else "INCORRECTO"
-            })
 
+def cargar_preguntas(path, cantidad, semilla):
+    """
+    Registros del benchmark a simular
+
+    Con cantidad > 0 se toma una muestra reproducible (hay que leer el archivo
+    entero); con cantidad 0 se recorre el benchmark completo en streaming.
+    """
+    if cantidad <= 0:
+        return iter_records(path)
+    datos = list(iter_records(path))
+    if len(datos) > cantidad:
+        indices = np.random.default_rng(semilla).choice(len(datos), size=cantidad, replace=False)
+        datos = [datos[i] for i in indices]
+    return datos
+
+
+class EscritorRespuestas:
+    """Escribe las respuestas a medida que se generan: JSONL, o arreglo JSON si la salida es .json"""
+
+    def __init__(self, path):
+        self.f = open(path, 'w', encoding='utf-8')
+        self.arreglo = path.endswith('.json')
+        self.escritos = 0
+        if self.arreglo:
+            self.f.write('[')
+
+    def escribir(self, df):
+        if df.empty:
+            return
+        # to_json serializa el bloque entero de una vez (mucho más rápido que json.dumps por fila)
+        lineas = df.to_json(orient='records', lines=True, force_ascii=False)
+        if self.arreglo:
+            lineas = (',\n' if self.escritos else '\n') + lineas.rstrip('\n').replace('\n', ',\n')
+        elif not lineas.endswith('\n'):
+            lineas += '\n'
+        self.f.write(lineas)
+        self.escritos += len(df)
+
+    def cerrar(self):
+        if self.arreglo:
+            self.f.write('\n]\n')
+        self.f.close()
+
+
+def juzgar_muestra(muestra, args):
+    """Pasa una muestra de respuestas simuladas por el juez y mide su throughput"""
+    from comun.juez import PipelinedJudge
+
+    token = os.environ.get("HUGGING_FACE_TOKEN")
+    print(f"\n--- Juez sobre {len(muestra)} respuestas (dispositivo {args.judge_device}, worker {args.judge_worker}) ---")
+    inicio = time.perf_counter()
+    juez = PipelinedJudge(token, args.judge_device, worker=args.judge_worker)
+    for i, item in enumerate(muestra):
+        juez.submit(i, item['pregunta'], item['respuesta_llm'], item['respuesta_correcta'])
+    resultados = juez.finish()
+    segundos = time.perf_counter() - inicio
+
+    acuerdo = sum(int(resultados[i][0] == item['evaluacion_substring']) for i, item in enumerate(muestra))
+    aprobadas = sum(resultados[i][0] for i in range(len(muestra)))
+    print(f"Juez: {len(muestra)} evaluaciones en {segundos:.1f}s ({len(muestra) / segundos:.2f}/s, incluye la carga del modelo)")
+    print(f"Aprobadas por el juez: {aprobadas} | acuerdo con substring accuracy: {acuerdo} de {len(muestra)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simular respuestas de LLM (reproducible y vectorizado) y evaluarlas.")
+    parser.add_argument("--benchmark", default=BENCHMARK_FILE, help=f"Benchmark de QA (default: {BENCHMARK_FILE}).")
+    parser.add_argument("--output", default=SIMULATED_ANSWERS_FILE,
+                        help=f"Respuestas simuladas: .jsonl, o arreglo JSON si termina en .json (default: {SIMULATED_ANSWERS_FILE}).")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla de la simulación (default: 42).")
+    parser.add_argument("--cantidad", type=int, default=1000, help="Preguntas a muestrear; 0 = benchmark completo en streaming (default: 1000).")
+    parser.add_argument("--variantes", type=int, default=1, help="Respuestas simuladas por pregunta (default: 1).")
+    parser.add_argument("--tasa_error", type=float, default=0.20, help="Fracción de respuestas incorrectas (default: 0.20).")
+    parser.add_argument("--formatos", default=None,
+                        help=f"Mezcla de formatos correctos, p. ej. 'exacta=1,prefijo=1' (opciones: {', '.join(FORMATOS)}).")
+    parser.add_argument("--errores", default=None,
+                        help=f"Mezcla de errores, p. ej. 'no_se=0.5,otra=0.5' (opciones: {', '.join(ERRORES)}).")
+    parser.add_argument("--bloque", type=int, default=10000, help="Preguntas por bloque de simulación y evaluación (default: 10000).")
+    parser.add_argument("--juez", type=int, default=0, help="Pasar además las primeras N respuestas por el modelo juez (default: 0).")
+    parser.add_argument("--judge_device", default="cuda:0", help="Dispositivo del juez con --juez (default: cuda:0).")
+    parser.add_argument("--judge_worker", default="thread", choices=["thread", "process"], help="Worker del juez con --juez.")
+    args = parser.parse_args()
+    if not 0 <= args.tasa_error <= 1:
+        parser.error(f"--tasa_error debe estar entre 0 y 1, no {args.tasa_error}")
+
+    print("--- Iniciando Simulador de IA y Evaluación ---")
+
+    if not os.path.exists(args.benchmark):
+        print(f"Error: No se encuentra '{args.benchmark}'.")
+        print("Por favor, ejecuta '2_generador_qa.py' primero.")
+        sys.exit(1)
+
+    try:
+        simulador = AnswerSimulator(
+            semilla=args.semilla,
+            tasa_error=args.tasa_error,
+            formatos=parse_mezcla(args.formatos, FORMATOS) if args.formatos else None,
+            errores=parse_mezcla(args.errores, ERRORES) if args.errores else None,
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    preguntas = cargar_preguntas(args.benchmark, args.cantidad, args.semilla)
+    if args.cantidad > 0:
+        if not preguntas:
+            print("Error: El benchmark está vacío. Revisa el script 2.")
+            sys.exit(1)
+        print(f"(Simulando sobre una muestra de {len(preguntas)} preguntas, semilla {args.semilla})")
+    else:
+        print(f"(Simulando sobre el benchmark completo en streaming, semilla {args.semilla})")
+    print(f"Variantes por pregunta: {args.variantes} | tasa de error: {args.tasa_error:.0%}")
+
+    tiempos = defaultdict(float)
+    por_tipo = defaultdict(lambda: [0, 0])
+    total_respuestas = correctas = 0
+    suma_f1 = 0.0
+    ejemplos, muestra_juez = [], []
+
+    escritor = EscritorRespuestas(args.output)
+    inicio = time.perf_counter()
+    try:
+        bloques = simulador.iter_bloques(preguntas, variantes=args.variantes, tamano_bloque=args.bloque)
+        while True:
+            t0 = time.perf_counter()
+            df = next(bloques, None)
+            t1 = time.perf_counter()
+            if df is None:
+                break
+            aciertos = substring_accuracy_batch(df['respuesta_llm'], df['respuesta_correcta'], modo='ascii', ignorar_vacias=True)
+            f1 = f1_score_batch(df['respuesta_llm'], df['respuesta_correcta'], modo='ascii')
+            t2 = time.perf_counter()
+            escritor.escribir(df[['pregunta', 'respuesta_llm']])
+            t3 = time.perf_counter()
+            tiempos['simulacion'] += t1 - t0
+            tiempos['metricas'] += t2 - t1
+            tiempos['escritura'] += t3 - t2
+
+            total_respuestas += len(df)
+            correctas += int(aciertos.sum())
+            suma_f1 += float(f1.sum())
+            conteo = df.assign(acierto=aciertos).groupby('tipo', observed=True)['acierto'].agg(['sum', 'count'])
+            for tipo, (aciertos_tipo, n) in conteo.iterrows():
+                por_tipo[tipo][0] += int(aciertos_tipo)
+                por_tipo[tipo][1] += int(n)
+
+            faltan = max(10 - len(ejemplos), args.juez - len(muestra_juez))
+            if faltan > 0:
+                cabeza = df.head(faltan).assign(evaluacion_substring=aciertos[:faltan]).to_dict('records')
+                ejemplos.extend(cabeza[:10 - len(ejemplos)])
+                muestra_juez.extend(cabeza[:args.juez - len(muestra_juez)])
+    finally:
+        escritor.cerrar()
+    segundos = time.perf_counter() - inicio
+
+    print(f"¡Simulación completa! Se guardó '{args.output}'.")
 
     print("\n--- Tabla de Resultados de Evaluación (Muestra) ---")
-    for res in resultados_evaluacion[:10]: # Muestra solo los primeros 10
+    for res in ejemplos:
         print(f"  P: {res['pregunta']}")
         print(f"  R. Correcta: {res['respuesta_correcta']}")
-        print(f"  R. LLM: {res['respuesta_llm']} -> {res['evaluacion']}")
+        print(f"  R. LLM: {res['respuesta_llm']} -> {'CORRECTO' if res['evaluacion_substring'] else 'INCORRECTO'}")
         print("  ---")
 
-    if total_preguntas > 0:
-        puntaje = (correctas / total_preguntas) * 100
-        print(f"\n Resultado Final (Simulación): {correctas} de {total_preguntas} correctas ({puntaje:.1f}%)")
-        print("Este puntaje demuestra que tu evaluador es robusto y maneja variaciones.")
-    else:
+    if total_respuestas == 0:
         print("No se evaluaron preguntas.")
+        return
+
+    print(f"\n{'Tipo':12s} {'Respuestas':>11s} {'Correctas':>10s} {'Accuracy':>9s}")
+    for tipo in simulador.tipos:
+        if tipo in por_tipo:
+            aciertos_tipo, n = por_tipo[tipo]
+            print(f"{tipo:12s} {n:11d} {aciertos_tipo:10d} {100 * aciertos_tipo / n:8.1f}%")
+
+    print(f"\n⏱️  Throughput ({total_respuestas} respuestas en {segundos:.2f}s, {total_respuestas / segundos:,.0f}/s)")
+    for etapa in ('simulacion', 'metricas', 'escritura'):
+        if tiempos[etapa] > 0:
+            print(f"   {etapa:11s} {tiempos[etapa]:8.2f}s  {total_respuestas / tiempos[etapa]:12,.0f} respuestas/s")
+
+    puntaje = (correctas / total_respuestas) * 100
+    print(f"\n Resultado Final (Simulación): {correctas} de {total_respuestas} correctas ({puntaje:.1f}%) | F1 medio: {suma_f1 / total_respuestas:.3f}")
+    print("Este puntaje demuestra que tu evaluador es robusto y maneja variaciones.")
+
+    if muestra_juez:
+        juzgar_muestra(muestra_juez, args)
+
+    print("-------------------------------------------------")
+
 
-    print("-------------------------------------------------")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,211 @@
+import argparse
 import json
 import os
-import string
 import random
+from collections import defaultdict
 
-try:
-    from unidecode import unidecode
-except ImportError:
-    print("Error: Necesitas 'unidecode'. Instalalo con: pip install unidecode")
-    exit()
-try:
-    from vllm import LLM, SamplingParams
-except ImportError:
-    print("Error: Necesitas 'vllm'. Instálalo con: pip install vllm")
-    exit()
-
-# --- MODIFICACIÓN 1: Cambiar el modelo ---
-MODELO = "TinyLlama/TinyLlama-1.1B-Chat-v1.0" 
-CANTIDAD = 100
+from comun.backends import BACKENDS, create_backend
+from comun.cache_generacion import GenerationCache
+from comun.evaluacion import generate_predictions
+from comun.io_datos import iter_chunks, iter_records
+from comun.metricas import substring_accuracy_batch
 
+# --- Valores por defecto (los del experimento original) ---
+MODELO = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+CANTIDAD = 100
+SEMILLA = 42 # Muestra reproducible: sin semilla la caché casi nunca acierta
+CACHE_FILE = "cache_generacion.sqlite"
 BENCHMARK_FILE = "dataset_benchmark_qa.json"
-OUTPUT_FILE = f"evaluacion_real_{MODELO.split('/')[-1]}.json"
-
-if not os.path.exists(BENCHMARK_FILE):
-    print(f"Error: No se encuentra '{BENCHMARK_FILE}'. Ejecuta el script 2 primero.")
-    exit()
-
-with open(BENCHMARK_FILE, 'r', encoding='utf-8') as f:
-    benchmark_data = json.load(f)
-
-if len(benchmark_data) == 0:
-    print("Error: El benchmark está vacío.")
-    exit()
-
-print(f"Cargando {len(benchmark_data)} preguntas. Se probará una muestra de {CANTIDAD}.")
-benchmark_sample = random.sample(benchmark_data, min(len(benchmark_data), CANTIDAD))
-
-# --- MODIFICACIÓN 2: Cambiar el formato del prompt para TinyLlama ---
-prompts = [f"<|user|>\n{item['pregunta']}<|assistant|>" for item in benchmark_sample]
-# --- FIN MODIFICACIÓN 2 ---
-
-respuestas_correctas_sample = [item['respuesta_correcta'] for item in benchmark_sample]
-
-print(f"\nCargando modelo '{MODELO}' en la GPU. (Esto puede tardar)...")
-sampling_params = SamplingParams(temperature=0.1, top_p=0.9, max_tokens=100)
-
-# Mantenemos la utilización de memoria baja
-llm = LLM(model=MODELO, gpu_memory_utilization=0.7) 
-
-print("¡Modelo cargado! Iniciando generación de respuestas...")
-
-outputs = llm.generate(prompts, sampling_params)
-print("¡Generación completa! Evaluando respuestas...")
-
-def normalizar_texto(texto):
-    if not isinstance(texto, str): return ""
-    texto = texto.lower()
-    texto = unidecode(texto)
-    texto = texto.translate(str.maketrans('', '', string.punctuation))
-    texto = texto.strip()
-    return texto
-
-total_preguntas = 0
-correctas = 0
-resultados_evaluacion = []
-
-for i, output in enumerate(outputs):
-    pregunta_original = benchmark_sample[i]['pregunta'] 
-    respuesta_llm = output.outputs[0].text.strip()
-    respuesta_correcta_gt = respuestas_correctas_sample[i]
-
-    norm_correcta = normalizar_texto(respuesta_correcta_gt)
-    norm_llm = normalizar_texto(respuesta_llm)
-    
-    es_correcta = False
-    if norm_correcta in norm_llm and norm_correcta != "":
-        es_correcta = True
-        correctas += 1
-    
-    total_preguntas += 1
-    
-    resultados_evaluacion.append({
-        "pregunta": pregunta_original,
-        "respuesta_correcta": respuesta_correcta_gt,
-        "respuesta_llm": respuesta_llm,
-        "evaluacion": "CORRECTO" if es_correcta else "INCORRECTO"
-    })
-
-print("\n--- Tabla de Resultados de Evaluación (Muestra de 10) ---")
-for res in resultados_evaluacion[:10]:
-    print(f"  P: {res['pregunta']}")
-    print(f"  R. Correcta: {res['respuesta_correcta']}")
-    print(f"  R. LLM: {res['respuesta_llm']} -> {res['evaluacion']}")
-    print("  ---")
-
-if total_preguntas > 0:
-    puntaje = (correctas / total_preguntas) * 100
-    print(f"\n Resultado Final ({MODELO}): {correctas} de {total_preguntas} correctas ({puntaje:.1f}%)")
-else:
-    print("No se evaluaron preguntas.")
-
-with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-    json.dump(resultados_evaluacion, f, ensure_ascii=False, indent=4)
-print(f"Resultados detallados guardados en '{OUTPUT_FILE}'")
-print("-------------------------------------------------")
\ No newline at end of file
+BLOQUE = 5000 # Preguntas por bloque en --completo
+
+# Campos del benchmark por los que se agrega la accuracy (si existen)
+CAMPOS_GRUPO = ("region", "category", "categoria")
+
+
+def evaluar_bloque(backend, cache, bloque):
+    """Genera y evalúa un bloque de items; devuelve los resultados en el formato de salida"""
+    respuestas_llm = generate_predictions(backend, [item['pregunta'] for item in bloque], cache)
+    respuestas_correctas = [item['respuesta_correcta'] for item in bloque]
+    aciertos = substring_accuracy_batch(respuestas_llm, respuestas_correctas, modo='ascii', ignorar_vacias=True)
+
+    resultados = []
+    for item, respuesta_llm, acierto in zip(bloque, respuestas_llm, aciertos):
+        resultado = {
+            "pregunta": item['pregunta'],
+            "respuesta_correcta": item['respuesta_correcta'],
+            "respuesta_llm": respuesta_llm,
+            "evaluacion": "CORRECTO" if acierto else "INCORRECTO"
+        }
+        for campo in CAMPOS_GRUPO:
+            if campo in item:
+                resultado[campo] = item[campo]
+        resultados.append(resultado)
+    return resultados
+
+
+def grupos_de(resultado):
+    """Claves de agregación de un resultado ('total' más una por campo de grupo)"""
+    claves = ["total"]
+    for campo in CAMPOS_GRUPO:
+        if campo in resultado:
+            claves.append(f"{campo}={resultado[campo]}")
+    return claves
+
+
+def imprimir_accuracy(grupos, limite=None):
+    filas = sorted(grupos.items(), key=lambda kv: (kv[0] != "total", -kv[1][1], kv[0]))
+    for clave, (correctas, total) in filas[:limite]:
+        print(f"   {clave:40s} {correctas:>8d}/{total:<8d} {100 * correctas / total:6.1f}%")
+
+
+def evaluar_completo(args, backend, cache, output_file):
+    """
+    Recorre todo el benchmark por bloques, agregando los resultados a un JSONL
+
+    Tras cada bloque se guarda un estado (<salida>.estado.json) con el número
+    de bloques completos, el tamaño válido del JSONL y los contadores por
+    grupo. Al reejecutar se trunca el JSONL a ese tamaño (descarta un bloque a
+    medio escribir) y se continúa desde el bloque siguiente.
+    """
+    estado_file = output_file + ".estado.json"
+    estado = {"benchmark": os.path.abspath(args.benchmark), "bloque": args.bloque,
+              "bloques": 0, "procesadas": 0, "bytes": 0, "grupos": {}}
+
+    if os.path.exists(estado_file) and not args.reiniciar:
+        with open(estado_file, 'r', encoding='utf-8') as f:
+            previo = json.load(f)
+        if previo["benchmark"] != estado["benchmark"] or previo["bloque"] != args.bloque:
+            print(f"Error: '{estado_file}' corresponde a otra ejecución (benchmark o --bloque distintos). "
+                  "Usa --reiniciar para empezar de cero.")
+            return
+        estado = previo
+        print(f"Reanudando desde el bloque {estado['bloques']} ({estado['procesadas']} preguntas ya evaluadas).")
+
+    grupos = defaultdict(lambda: [0, 0], {k: list(v) for k, v in estado["grupos"].items()})
+    modo = 'r+b' if estado["bytes"] > 0 and os.path.exists(output_file) else 'wb'
+    with open(output_file, modo) as salida:
+        salida.truncate(estado["bytes"])
+        salida.seek(estado["bytes"])
+
+        registros = iter_records(args.benchmark)
+        for n, bloque in enumerate(iter_chunks(registros, args.bloque)):
+            if n < estado["bloques"]:
+                continue
+            resultados = evaluar_bloque(backend, cache, bloque)
+            for resultado in resultados:
+                salida.write((json.dumps(resultado, ensure_ascii=False) + "\n").encode('utf-8'))
+                for clave in grupos_de(resultado):
+                    grupos[clave][0] += resultado["evaluacion"] == "CORRECTO"
+                    grupos[clave][1] += 1
+            salida.flush()
+            os.fsync(salida.fileno())
+
+            estado.update({"bloques": n + 1, "procesadas": estado["procesadas"] + len(bloque),
+                           "bytes": salida.tell(), "grupos": dict(grupos)})
+            temporal = estado_file + ".tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(estado, f, ensure_ascii=False)
+            os.replace(temporal, estado_file)
+
+            correctas, total = grupos["total"]
+            print(f"📦 Bloque {n + 1}: {estado['procesadas']} preguntas evaluadas | "
+                  f"accuracy acumulada {100 * correctas / total:.1f}%")
+            imprimir_accuracy(grupos, limite=6)
+
+    if not grupos:
+        print("No se evaluaron preguntas.")
+        return
+    print(f"\n Resultado Final ({args.modelo}, {args.backend}), benchmark completo:")
+    imprimir_accuracy(grupos)
+    print(f"Resultados detallados en '{output_file}'")
+    print("-------------------------------------------------")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluar un modelo sobre el benchmark QA con cualquier backend.")
+    parser.add_argument("--backend", default="vllm", choices=list(BACKENDS), help="Motor de generación (default: vllm).")
+    parser.add_argument("--modelo", default=MODELO, help=f"Alias o id de Hugging Face (default: {MODELO}).")
+    parser.add_argument("--benchmark", default=BENCHMARK_FILE, help=f"Benchmark QA (default: {BENCHMARK_FILE}).")
+    parser.add_argument("--cantidad", type=int, default=CANTIDAD, help=f"Tamaño de la muestra; 0 = todas las preguntas (default: {CANTIDAD}).")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help=f"Semilla de la muestra (default: {SEMILLA}).")
+    parser.add_argument("--output", default=None, help="Salida (default: evaluacion_real_<modelo>.json, o .jsonl con --completo).")
+    parser.add_argument("--completo", action="store_true", help="Evaluar todo el benchmark por bloques, en streaming a un JSONL reanudable.")
+    parser.add_argument("--bloque", type=int, default=BLOQUE, help=f"Preguntas por bloque en --completo (default: {BLOQUE}).")
+    parser.add_argument("--reiniciar", action="store_true", help="En --completo, ignorar el estado guardado y empezar de cero.")
+    parser.add_argument("--cache_path", default=CACHE_FILE, help=f"Caché de generaciones (default: {CACHE_FILE}).")
+    parser.add_argument("--no_cache", action="store_true", help="No consultar ni escribir la caché de generaciones.")
+    parser.add_argument("--gpu_id", type=int, default=None, help="GPU a utilizar.")
+    parser.add_argument("--draft_model", default=None, help="Modelo borrador de hf-speculative (debe compartir el tokenizer).")
+    parser.add_argument("--num_draft_tokens", type=int, default=5, help="Tokens propuestos por ronda en hf-speculative.")
+    args = parser.parse_args()
+
+    extension = "jsonl" if args.completo else "json"
+    output_file = args.output or f"evaluacion_real_{args.modelo.split('/')[-1]}.{extension}"
+
+    if not os.path.exists(args.benchmark):
+        print(f"Error: No se encuentra '{args.benchmark}'. Ejecuta el script 2 primero.")
+        return
+
+    try:
+        backend = create_backend(args.backend, args.modelo, gpu_id=args.gpu_id,
+                                 token=os.environ.get("HUGGING_FACE_TOKEN"), max_new_tokens=100,
+                                 draft_model=args.draft_model, num_draft_tokens=args.num_draft_tokens)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    cache = GenerationCache(args.cache_path, enabled=not args.no_cache)
+
+    if args.completo:
+        try:
+            evaluar_completo(args, backend, cache, output_file)
+        finally:
+            cache.close()
+            backend.close()
+        return
+
+    try:
+        # Arreglo JSON o JSONL (comprimido o no), como lo escribe 2_generador_qa.py
+        benchmark_data = list(iter_records(args.benchmark))
+
+        if len(benchmark_data) == 0:
+            print("Error: El benchmark está vacío.")
+            return
+
+        if args.cantidad > 0:
+            print(f"Cargando {len(benchmark_data)} preguntas. Se probará una muestra de {args.cantidad}.")
+            random.seed(args.semilla)
+            benchmark_sample = random.sample(benchmark_data, min(len(benchmark_data), args.cantidad))
+        else:
+            print(f"Cargando {len(benchmark_data)} preguntas. Se probarán todas.")
+            benchmark_sample = benchmark_data
+
+        # El chat template lo aplica el backend (antes estaba fijo el formato de TinyLlama)
+        resultados_evaluacion = evaluar_bloque(backend, cache, benchmark_sample)
+    finally:
+        cache.close()
+        backend.close()
+    print("¡Generación y evaluación completas!")
+
+    total_preguntas = len(resultados_evaluacion)
+    correctas = sum(res["evaluacion"] == "CORRECTO" for res in resultados_evaluacion)
+
+    print("\n--- Tabla de Resultados de Evaluación (Muestra de 10) ---")
+    for res in resultados_evaluacion[:10]:
+        print(f"  P: {res['pregunta']}")
+        print(f"  R. Correcta: {res['respuesta_correcta']}")
+        print(f"  R. LLM: {res['respuesta_llm']} -> {res['evaluacion']}")
+        print("  ---")
+
+    if total_preguntas > 0:
+        puntaje = (correctas / total_preguntas) * 100
+        print(f"\n Resultado Final ({args.modelo}, {args.backend}): {correctas} de {total_preguntas} correctas ({puntaje:.1f}%)")
+    else:
+        print("No se evaluaron preguntas.")
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(resultados_evaluacion, f, ensure_ascii=False, indent=4)
+    print(f"Resultados detallados guardados en '{output_file}'")
+    print("-------------------------------------------------")
+
+if __name__ == "__main__":
+    main()
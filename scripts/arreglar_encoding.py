@@ -1,12 +1,14 @@
 import json
 
+from comun.io_datos import dataset_from_records, is_jsonl, open_text, save_dataset
+
 INPUT_FILE = "subset_experimento_preliminar.json"
-OUTPUT_FILE = "subset_experimento_final.json"
+OUTPUT_FILE = "subset_experimento_final.json"  # .jsonl.gz / .jsonl.zst: JSONL comprimido
 
 print(f"Limpiando agresivamente {INPUT_FILE}...")
 
-with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-    # Leemos todo el contenido como texto
+with open_text(INPUT_FILE) as f:
+    # Leemos todo el contenido como texto (descomprimido si hace falta)
     content = f.read()
 
 # Diccionario de reemplazos manuales basados en tu snippet
@@ -43,11 +45,15 @@ for bad, good in replacements.items():
 
 # Verificar que siga siendo un JSON válido
 try:
-    data_json = json.loads(content)
+    if is_jsonl(INPUT_FILE):
+        # Solo '\n' separa líneas (como en iter_records): splitlines también corta en
+        # U+0085/U+2028/U+2029, que json.dumps(ensure_ascii=False) deja dentro de los textos
+        data_json = dataset_from_records(json.loads(line) for line in content.split('\n') if line.strip())
+    else:
+        data_json = json.loads(content)
     
     # Guardar
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data_json, f, ensure_ascii=False, indent=4)
+    save_dataset(data_json, OUTPUT_FILE)
         
     print(f"¡Listo! Archivo limpio guardado en: {OUTPUT_FILE}")
     print("Revisa este archivo visualmente. Si se ve bien, mándaselo a Gonza.")
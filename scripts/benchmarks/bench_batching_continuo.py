@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: batching continuo vs. batches estáticos (model.generate)
+
+Usa los prompts reales de subset_h2_completion.json con el chat template del
+modelo. Pensado para correr en CPU con un modelo pequeño, por ejemplo:
+
+    python benchmarks/bench_batching_continuo.py --modelo HuggingFaceTB/SmolLM2-135M-Instruct
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.batching_continuo import ContinuousBatchingEngine, static_batch_generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar throughput de batching continuo vs. estático')
+    parser.add_argument('--modelo', default='HuggingFaceTB/SmolLM2-135M-Instruct',
+                        help='Modelo HF (id o ruta local)')
+    parser.add_argument('--dataset', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'subset_h2_completion.json'),
+                        help='Dataset de completion con campo input_text')
+    parser.add_argument('--n_prompts', type=int, default=64, help='Cantidad de prompts a generar')
+    parser.add_argument('--batch_size', type=int, default=8, help='Tamaño de batch (ambas rutas)')
+    parser.add_argument('--max_new_tokens', type=int, default=64, help='Máximo de tokens nuevos')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(args.modelo, torch_dtype=torch.float32).eval()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    prompts = []
+    for item in data[:args.n_prompts]:
+        messages = [{"role": "user", "content": item['input_text']}]
+        try:
+            prompts.append(tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True))
+        except Exception:
+            prompts.append(item['input_text'])
+
+    print(f"Modelo: {args.modelo} | {len(prompts)} prompts | batch {args.batch_size} | "
+          f"max_new_tokens {args.max_new_tokens}")
+
+    _, static_stats = static_batch_generate(model, tokenizer, prompts, args.batch_size, args.max_new_tokens)
+    engine = ContinuousBatchingEngine(model, tokenizer, max_batch_size=args.batch_size,
+                                      max_new_tokens=args.max_new_tokens)
+    engine.generate(prompts)
+    cont_stats = engine.stats
+
+    print(f"{'Ruta':12s} {'segundos':>10s} {'tokens':>8s} {'tokens/s':>10s}")
+    print(f"{'estática':12s} {static_stats['seconds']:10.2f} {static_stats['new_tokens']:8d} "
+          f"{static_stats['tokens_per_second']:10.1f}")
+    print(f"{'continua':12s} {cont_stats['seconds']:10.2f} {cont_stats['new_tokens']:8d} "
+          f"{cont_stats['tokens_per_second']:10.1f}")
+    print(f"Uso de slots (continua): {cont_stats['slot_utilization']:.1%}")
+    if static_stats['seconds'] > 0:
+        print(f"Speedup en tiempo total: {static_stats['seconds'] / cont_stats['seconds']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tiempo de carga y tamaño de JSON/CSV vs. su versión Parquet
+
+Para cada archivo convierte a Parquet (en un directorio temporal) y mide:
+  - tamaño en disco de cada versión,
+  - json.load (o pd.read_csv) del original vs. load_json (o read_triples)
+    del Parquet, que devuelven el mismo objeto,
+  - para listas planas, además la carga directa a DataFrame (sin pasar por
+    dicts), que es lo que hacen los scripts de lens.
+
+    python benchmarks/bench_columnar.py ../data/usa_qa.json ../data/subset_h2_final.json
+    python benchmarks/bench_columnar.py ../data/pintores_latam_4671Entities.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import csv_to_parquet, json_to_parquet, load_json, read_triples
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data')
+
+
+def mejor_tiempo(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def cargar_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar carga y tamaño de JSON/CSV contra Parquet')
+    parser.add_argument('archivos', nargs='*', help='Archivos .json, .jsonl o .csv (default: los de data/)')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Cargas por caso (se toma la mejor)')
+    args = parser.parse_args()
+
+    archivos = args.archivos or sorted(
+        os.path.join(DATA, nombre) for nombre in os.listdir(DATA) if nombre.endswith(('.json', '.csv'))
+    )
+
+    filas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for archivo in archivos:
+            destino = os.path.join(tmp, os.path.splitext(os.path.basename(archivo))[0] + '.parquet')
+            if archivo.endswith('.csv'):
+                csv_to_parquet(archivo, destino)
+                t_original, original = mejor_tiempo(lambda: pd.read_csv(archivo, index_col=False), args.repeticiones)
+                t_parquet, columnar = mejor_tiempo(lambda: read_triples(destino), args.repeticiones)
+                iguales = original.astype(str).equals(columnar.astype(str))
+            else:
+                json_to_parquet(archivo, destino)
+                t_original, original = mejor_tiempo(lambda: cargar_json(archivo), args.repeticiones)
+                t_parquet, columnar = mejor_tiempo(lambda: load_json(destino), args.repeticiones)
+                iguales = original == columnar
+            t_df = None
+            if isinstance(original, (list, pd.DataFrame)):
+                t_df, _ = mejor_tiempo(lambda: pd.read_parquet(destino), args.repeticiones)
+            filas.append((os.path.basename(archivo), os.path.getsize(archivo), os.path.getsize(destino),
+                          t_original, t_parquet, t_df, iguales))
+
+    print(f"\n{'Archivo':38s} {'MB orig':>8s} {'MB pq':>7s} {'carga orig':>11s} {'carga pq':>9s} {'x':>6s} "
+          f"{'pq→DataFrame':>13s} {'igual':>6s}")
+    for nombre, tam, tam_pq, t_o, t_p, t_df, iguales in filas:
+        df = f"{t_df * 1000:10.1f} ms" if t_df is not None else f"{'-':>13s}"
+        print(f"{nombre[:38]:38s} {tam / 1e6:8.2f} {tam_pq / 1e6:7.2f} {t_o * 1000:8.1f} ms {t_p * 1000:6.1f} ms "
+              f"{t_o / t_p:5.1f}x {df} {'sí' if iguales else 'NO':>6s}")
+
+
+if __name__ == '__main__':
+    main()
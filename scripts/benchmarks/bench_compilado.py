@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: ruta compilada (torch.compile + formas estáticas) vs. eager
+
+Mide, para el lens de trayectorias y para la generación greedy con
+StaticCache, el costo de warmup (compilación) y el tiempo en régimen
+estable, y verifica que ambas rutas den lo mismo. Pensado para CPU:
+
+    python benchmarks/bench_compilado.py --modelo HuggingFaceTB/SmolLM2-135M-Instruct
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.compilado import CompiledLens, StaticCacheGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar la ruta compilada vs. eager (lens y generación)')
+    parser.add_argument('--modelo', default='HuggingFaceTB/SmolLM2-135M-Instruct',
+                        help='Modelo HF (id o ruta local)')
+    parser.add_argument('--dataset', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'subset_h2_completion.json'),
+                        help='Dataset de completion con campos input_text y target')
+    parser.add_argument('--n_prompts', type=int, default=64, help='Prompts para el lens')
+    parser.add_argument('--n_generacion', type=int, default=8, help='Prompts para la generación')
+    parser.add_argument('--bucket', type=int, default=32, help='Múltiplo de relleno de los prompts')
+    parser.add_argument('--batch_size', type=int, default=8, help='Prompts por forward del lens')
+    parser.add_argument('--max_new_tokens', type=int, default=32, help='Máximo de tokens nuevos')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    model = AutoModelForCausalLM.from_pretrained(args.modelo, torch_dtype=torch.float32).eval()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    prompt_ids, target_ids = [], []
+    for item in data:
+        if len(prompt_ids) >= args.n_prompts:
+            break
+        if not item.get('input_text') or not item.get('target'):
+            continue
+        gt_tokens = tokenizer(item['target'].strip(), add_special_tokens=False)['input_ids']
+        if gt_tokens:
+            prompt_ids.append(tokenizer(item['input_text'].strip())['input_ids'])
+            target_ids.append(gt_tokens[0])
+
+    print(f"Modelo: {args.modelo} | {len(prompt_ids)} prompts | bucket {args.bucket} | "
+          f"batch {args.batch_size} | threads {torch.get_num_threads()}")
+
+    # --- Lens ---
+    resultados = {}
+    for compilado in (False, True):
+        lens = CompiledLens(model, tokenizer, bucket=args.bucket, batch_size=args.batch_size, compile=compilado)
+        lens.trajectories(prompt_ids, target_ids)          # warmup: compila cada bucket
+        lens.stats = {'calls': 0, 'warmup_seconds': lens.stats['warmup_seconds'], 'seconds': 0.0}
+        probs, _ = lens.trajectories(prompt_ids, target_ids)  # régimen estable
+        resultados[compilado] = (lens.stats, probs)
+
+    eager, compiled = resultados[False][0], resultados[True][0]
+    diff = (resultados[False][1] - resultados[True][1]).abs().max().item()
+    print(f"\nLens ({len(lens.compiled_shapes)} buckets)")
+    print(f"{'Ruta':12s} {'warmup s':>10s} {'estable s':>10s}")
+    print(f"{'eager':12s} {eager['warmup_seconds']:10.2f} {eager['seconds']:10.3f}")
+    print(f"{'compilada':12s} {compiled['warmup_seconds']:10.2f} {compiled['seconds']:10.3f}")
+    if compiled['seconds'] > 0:
+        print(f"Speedup estable: {eager['seconds'] / compiled['seconds']:.2f}x | diferencia máx. de probabilidad: {diff:.2e}")
+
+    # --- Generación greedy ---
+    gen_ids = prompt_ids[:args.n_generacion]
+    salidas = {}
+    for compilado in (False, True):
+        generator = StaticCacheGenerator(model, tokenizer, max_new_tokens=args.max_new_tokens,
+                                         bucket=args.bucket, compile=compilado)
+        salidas[compilado] = (generator.generate_ids(gen_ids), dict(generator.stats))
+
+    eager, compiled = salidas[False][1], salidas[True][1]
+    iguales = sum(a == b for a, b in zip(salidas[False][0], salidas[True][0]))
+    print(f"\nGeneración greedy ({len(gen_ids)} prompts, max_new_tokens {args.max_new_tokens})")
+    print(f"{'Ruta':12s} {'warmup s':>10s} {'ms/paso':>10s} {'tokens':>8s}")
+    print(f"{'eager':12s} {eager['warmup_seconds']:10.2f} {eager['ms_per_decode_step']:10.2f} {eager['new_tokens']:8d}")
+    print(f"{'compilada':12s} {compiled['warmup_seconds']:10.2f} {compiled['ms_per_decode_step']:10.2f} {compiled['new_tokens']:8d}")
+    if compiled['ms_per_decode_step'] > 0:
+        print(f"Speedup estable por paso: {eager['ms_per_decode_step'] / compiled['ms_per_decode_step']:.2f}x | "
+              f"salidas idénticas: {iguales} de {len(gen_ids)}")
+
+
+if __name__ == '__main__':
+    main()
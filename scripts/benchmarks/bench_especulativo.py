@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: decodificación especulativa vs. greedy sin borrador
+
+Verifica además que ambas rutas den exactamente los mismos tokens. El par de
+modelos debe compartir el tokenizer, por ejemplo:
+
+    python benchmarks/bench_especulativo.py \\
+        --modelo HuggingFaceTB/SmolLM2-360M-Instruct --borrador HuggingFaceTB/SmolLM2-135M-Instruct
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.especulativo import SpeculativeDecoder
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar decodificación especulativa vs. greedy')
+    parser.add_argument('--modelo', default='HuggingFaceTB/SmolLM2-360M-Instruct',
+                        help='Modelo a evaluar (id o ruta local)')
+    parser.add_argument('--borrador', default='HuggingFaceTB/SmolLM2-135M-Instruct',
+                        help='Modelo borrador con el mismo tokenizer')
+    parser.add_argument('--dataset', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'subset_h2_completion.json'),
+                        help='Dataset de completion con campo input_text')
+    parser.add_argument('--n_prompts', type=int, default=16, help='Cantidad de prompts a generar')
+    parser.add_argument('--num_draft_tokens', type=int, default=5, help='Tokens propuestos por ronda')
+    parser.add_argument('--max_new_tokens', type=int, default=64, help='Máximo de tokens nuevos')
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    draft_tokenizer = AutoTokenizer.from_pretrained(args.borrador)
+    model = AutoModelForCausalLM.from_pretrained(args.modelo, torch_dtype=torch.float32).eval()
+    draft_model = AutoModelForCausalLM.from_pretrained(args.borrador, torch_dtype=torch.float32).eval()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    prompt_ids = []
+    for item in data[:args.n_prompts]:
+        messages = [{"role": "user", "content": item['input_text']}]
+        try:
+            text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        except Exception:
+            text = item['input_text']
+        prompt_ids.append(tokenizer(text)['input_ids'])
+
+    print(f"Modelo: {args.modelo} | borrador: {args.borrador} | {len(prompt_ids)} prompts | "
+          f"k={args.num_draft_tokens} | max_new_tokens {args.max_new_tokens}")
+
+    decoder = SpeculativeDecoder(model, draft_model, tokenizer, num_draft_tokens=args.num_draft_tokens,
+                                 max_new_tokens=args.max_new_tokens, draft_tokenizer=draft_tokenizer)
+
+    # Referencia: greedy sin borrador, un prompt a la vez
+    reference = []
+    start = time.perf_counter()
+    for ids in prompt_ids:
+        with torch.no_grad():
+            out = model.generate(torch.tensor([ids]), max_new_tokens=args.max_new_tokens, do_sample=False,
+                                 pad_token_id=tokenizer.pad_token_id or tokenizer.eos_token_id)
+        tokens = out[0, len(ids):].tolist()
+        for pos, token in enumerate(tokens):
+            if token in decoder.eos_token_ids:
+                tokens = tokens[:pos + 1]
+                break
+        reference.append(tokens)
+    greedy_seconds = time.perf_counter() - start
+    greedy_tokens = sum(len(tokens) for tokens in reference)
+
+    outputs = decoder.generate_ids(prompt_ids)
+    stats = decoder.stats
+    iguales = sum(a == b for a, b in zip(outputs, reference))
+
+    print(f"{'Ruta':14s} {'segundos':>10s} {'tokens':>8s} {'tokens/s':>10s}")
+    print(f"{'greedy':14s} {greedy_seconds:10.2f} {greedy_tokens:8d} {greedy_tokens / greedy_seconds:10.1f}")
+    print(f"{'especulativa':14s} {stats['seconds']:10.2f} {stats['new_tokens']:8d} {stats['tokens_per_second']:10.1f}")
+    print(f"Tasa de aceptación: {stats['acceptance_rate']:.1%} | "
+          f"tokens por forward del modelo: {stats['tokens_per_target_forward']:.2f}")
+    print(f"Salidas idénticas a greedy: {iguales} de {len(prompt_ids)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: extracción de la entidad de las preguntas del benchmark
+
+Compara sobre un dataset de QA completo (arreglo JSON, JSONL o Parquet):
+  - el extract_entity anterior de DatasetMinerMejorado (dos re.search por pregunta),
+  - split(" de ")[-1] de generar_subset_experimento.py / ver_top_usa.py,
+  - comun.plantillas_qa.EntityExtractor (forma fija + relaciones memorizadas por comienzo),
+y cuenta en cuántas preguntas cambia la entidad y cuántas caen en una relación conocida.
+
+    python benchmarks/bench_extraccion_entidades.py --dataset ../data/usa_qa.json
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.io_datos import iter_records
+from comun.plantillas_qa import EntityExtractor
+
+
+def regex_anterior(pregunta):
+    """El extract_entity que tenía DatasetMinerMejorado"""
+    patterns = [
+        r'¿Cuál es .+ de (.+)\?',
+        r'de (.+)\?$'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, pregunta)
+        if match:
+            return match.group(1).strip()
+    return pregunta.replace('¿', '').replace('?', '').strip()
+
+
+def split_anterior(pregunta):
+    """El de generar_subset_experimento.py y ver_top_usa.py"""
+    return pregunta.split(" de ")[-1].replace("?", "").strip()
+
+
+def medir(funcion, preguntas, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for pregunta in preguntas:
+            funcion(pregunta)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar los extractores de entidad de las preguntas')
+    parser.add_argument('--dataset', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'usa_qa.json'),
+                        help='Dataset plano de QA (campo "pregunta")')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Pasadas sobre todas las preguntas')
+    args = parser.parse_args()
+
+    preguntas = [item.get('pregunta', '') for item in iter_records(args.dataset)]
+    n = len(preguntas) * args.repeticiones
+    print(f"{len(preguntas):,} preguntas x {args.repeticiones} pasadas")
+
+    extractor = EntityExtractor()
+    conocidas = sum(extractor.split(p)[0] is not None for p in preguntas)
+    distintas = sum(regex_anterior(p) != extractor.extract(p) for p in preguntas)
+    print(f"Con relación conocida: {conocidas:,} ({conocidas / max(len(preguntas), 1):.1%})")
+    print(f"Entidad distinta a la del regex anterior: {distintas:,}")
+    ejemplos = [p for p in preguntas if regex_anterior(p) != extractor.extract(p)][:5]
+    for p in ejemplos:
+        print(f"  {p}\n    antes: {regex_anterior(p)!r}  ahora: {extractor.extract(p)!r}")
+
+    print(f"\n{'Extractor':28s} {'segundos':>9s} {'preguntas/s':>14s}")
+    for nombre, funcion in [('regex anterior', regex_anterior), ('split(" de ")[-1]', split_anterior),
+                            ('plantillas (memorizado)', extractor.extract)]:
+        segundos = medir(funcion, preguntas, args.repeticiones)
+        print(f"{nombre:28s} {segundos:9.3f} {n / segundos:14,.0f}")
+    print(f"\nComienzos de relación memorizados: {len(extractor._por_cabeza)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: normalización con str.replace encadenados vs. tabla única + caché
+
+Normaliza todas las entidades, preguntas y respuestas de un subset (formato
+{categoria: [{entidad, preguntas: [...]}]} o lista plana de QA) con:
+  - el normalize_text anterior de los mineros (15 str.replace por texto),
+  - comun.normalizacion sin caché (solo str.translate),
+  - comun.normalizacion con el lru_cache,
+y lo mismo para el modo 'ascii' de las métricas (unidecode por texto vs. tabla).
+
+    python benchmarks/bench_normalizacion.py --dataset ../data/subset_h2_final.json
+"""
+
+import argparse
+import json
+import os
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun import normalizacion
+from comun.normalizacion import TABLA_ACENTOS, normalizar_ascii, normalizar_entidad
+
+try:
+    from unidecode import unidecode
+except ImportError:
+    unidecode = None
+
+_REEMPLAZOS = {
+    'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
+    'ñ': 'n', 'ü': 'u', 'à': 'a', 'è': 'e', 'ì': 'i',
+    'ò': 'o', 'ù': 'u', 'ã': 'a', 'õ': 'o', 'ç': 'c'
+}
+_TABLA_PUNTUACION = str.maketrans('', '', string.punctuation)
+
+
+def replace_encadenado(text):
+    """El normalize_text que tenían los mineros"""
+    if not text:
+        return ""
+    text = text.lower().strip()
+    for old, new in _REEMPLAZOS.items():
+        text = text.replace(old, new)
+    return text
+
+
+def tabla_sin_cache(text):
+    if not text:
+        return ""
+    return text.lower().strip().translate(TABLA_ACENTOS)
+
+
+def ascii_unidecode(texto):
+    """El normalizar_texto anterior de las métricas"""
+    return unidecode(texto.lower()).translate(_TABLA_PUNTUACION).strip()
+
+
+def textos_del_dataset(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    grupos = data.values() if isinstance(data, dict) else [data]
+    textos = []
+    for grupo in grupos:
+        for item in grupo:
+            if 'entidad' in item:
+                textos.append(item['entidad'])
+            for qa in item.get('preguntas', [item]):
+                textos.append(str(qa.get('pregunta', '')))
+                textos.append(str(qa.get('respuesta_correcta', '')))
+    return textos
+
+
+def medir(funcion, textos, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for texto in textos:
+            funcion(texto)
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comparar las implementaciones de normalización de texto')
+    parser.add_argument('--dataset', default=os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'subset_h2_final.json'),
+                        help='Subset por categoría o lista plana de QA')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Pasadas sobre todos los textos')
+    args = parser.parse_args()
+
+    textos = textos_del_dataset(args.dataset)
+    n = len(textos) * args.repeticiones
+    print(f"{len(textos)} textos ({len(set(textos))} distintos) x {args.repeticiones} pasadas")
+
+    distintos = sum(replace_encadenado(t) != normalizar_entidad(t) for t in set(textos))
+    print(f"Textos cuyo resultado cambia respecto del replace encadenado: {distintos} (tildes que antes no se quitaban)")
+
+    casos = [('replace encadenado', replace_encadenado), ('tabla', tabla_sin_cache), ('tabla + caché', normalizar_entidad)]
+    if unidecode is not None:
+        casos += [('ascii: unidecode', ascii_unidecode), ('ascii: tabla + caché', normalizar_ascii)]
+
+    print(f"\n{'Implementación':24s} {'segundos':>9s} {'textos/s':>14s}")
+    for nombre, funcion in casos:
+        segundos = medir(funcion, textos, args.repeticiones)
+        print(f"{nombre:24s} {segundos:9.3f} {n / segundos:14,.0f}")
+
+    for nombre, info in normalizacion.cache_info().items():
+        if info.hits or info.misses:
+            print(f"Caché '{nombre}': {info.hits} aciertos, {info.misses} fallos")
+
+
+if __name__ == '__main__':
+    main()
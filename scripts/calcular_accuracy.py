@@ -1,61 +1,182 @@
+import argparse
+import csv
+import glob
 import json
-import sys
+import math
 import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
 
-print("--- Calculando Accuracy desde archivo JSON ---")
+from comun.io_datos import is_json_array, iter_records, open_text, strip_compression
 
-# --- Leer argumento: nombre del archivo JSON ---
-if len(sys.argv) != 2:
-    print("Error: Debes proporcionar el nombre del archivo JSON de resultados.")
-    print("Uso: python calcular_accuracy.py <archivo_resultados.json>")
-    exit()
+# Campos de cada resultado por los que se desagrega (si existen)
+CAMPOS_GRUPO = {"region": ("region",), "categoria": ("category", "categoria")}
 
-input_json_file = sys.argv[1]
 
-# --- Procesar el JSON ---
-if not os.path.exists(input_json_file):
-    print(f"Error: No se encuentra el archivo '{input_json_file}'.")
-else:
-    try:
-        with open(input_json_file, 'r', encoding='utf-8') as f:
-            resultados = json.load(f)
-
-        if not isinstance(resultados, list) or len(resultados) == 0:
-            print("Error: El archivo JSON está vacío o no tiene el formato esperado (una lista de resultados).")
-            exit()
-
-        total_preguntas = 0
-        correctas = 0
-
-        # Contar las correctas
-        for item in resultados:
-            if isinstance(item, dict) and "evaluacion" in item:
-                total_preguntas += 1
-                if item["evaluacion"] == "CORRECTO":
-                    correctas += 1
-            else:
-                print(f"Advertencia: Se encontró un item sin formato esperado: {item}")
-
-
-        # Calcular y mostrar el puntaje
-        if total_preguntas > 0:
-            puntaje = (correctas / total_preguntas) * 100
-            # Extraer nombre del modelo del nombre del archivo (aproximado)
+def nombre_modelo(path):
+    """Nombre del modelo a partir del archivo (evaluacion_real_<modelo>.json[l], comprimido o no)"""
+    base = strip_compression(os.path.basename(path))
+    for extension in ('.jsonl', '.json', '.parquet'):
+        if base.endswith(extension):
+            base = base[:-len(extension)]
+    return base.split('real_')[-1] if 'real_' in base else base
+
+
+def iter_resultados(path, lineas_malas):
+    """
+    Registros de un archivo de resultados
+
+    En JSONL cada línea se lee por separado: las ilegibles (p. ej. la última
+    línea a medio escribir de una corrida --completo interrumpida) se saltan
+    y se cuentan en lineas_malas[0].
+    """
+    if path.endswith('.parquet') or is_json_array(path):
+        yield from iter_records(path)
+        return
+    with open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
             try:
-                 nombre_modelo = input_json_file.split('real_')[-1].replace('.json', '')
-            except:
-                 nombre_modelo = "Modelo Desconocido"
-
-            print(f"\n📊 Resultados para: {input_json_file}")
-            print(f"   Modelo (aprox): {nombre_modelo}")
-            print(f"   Total Evaluado: {total_preguntas} preguntas")
-            print(f"   Respuestas Correctas: {correctas}")
-            print(f"   Accuracy: {puntaje:.1f}%")
-            print("-------------------------------------------------")
+                yield json.loads(line)
+            except ValueError:
+                lineas_malas[0] += 1
+
+
+def contar_archivo(path):
+    """
+    Cuenta aciertos de un archivo de resultados, registro a registro
+
+    Returns:
+        (path, {(modelo, dimension, valor): [correctas, total]}, items_invalidos, lineas_malas, error)
+        Si el archivo no se puede leer (JSON inválido o truncado, error de E/S)
+        los conteos quedan vacíos y error trae el motivo; si no, error es None.
+    """
+    modelo_archivo = nombre_modelo(path)
+    conteos = defaultdict(lambda: [0, 0])
+    invalidos = 0
+    lineas_malas = [0]
+    try:
+        for item in iter_resultados(path, lineas_malas):
+            if not isinstance(item, dict) or "evaluacion" not in item:
+                invalidos += 1
+                continue
+            modelo = item.get("modelo", modelo_archivo)
+            correcta = item["evaluacion"] == "CORRECTO"
+            claves = [(modelo, "total", "-")]
+            for dimension, campos in CAMPOS_GRUPO.items():
+                for campo in campos:
+                    if campo in item:
+                        claves.append((modelo, dimension, str(item[campo])))
+                        break
+            for clave in claves:
+                conteos[clave][0] += correcta
+                conteos[clave][1] += 1
+    except (ValueError, OSError, EOFError) as e:
+        return path, {}, invalidos, lineas_malas[0], f"{type(e).__name__}: {e}"
+    return path, dict(conteos), invalidos, lineas_malas[0], None
+
+
+def intervalo_wilson(correctas, total, confianza=0.95):
+    """Intervalo de Wilson para una proporción (se comporta bien con n chico o p cerca de 0/1)"""
+    if total == 0:
+        return 0.0, 0.0
+    z = NormalDist().inv_cdf(0.5 + confianza / 2)
+    p = correctas / total
+    denominador = 1 + z * z / total
+    centro = (p + z * z / (2 * total)) / denominador
+    margen = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominador
+    return max(0.0, centro - margen), min(1.0, centro + margen)
+
+
+def expandir_entradas(entradas):
+    """Resuelve globs y elimina duplicados conservando el orden"""
+    archivos = []
+    for entrada in entradas:
+        coincidencias = sorted(glob.glob(entrada)) if glob.has_magic(entrada) else [entrada]
+        if not coincidencias:
+            print(f"Advertencia: '{entrada}' no coincide con ningún archivo.")
+        for archivo in coincidencias:
+            if archivo not in archivos:
+                archivos.append(archivo)
+    return archivos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcular accuracy (con intervalos de confianza) de uno o más archivos de resultados.")
+    parser.add_argument("archivos", nargs="+", help="Archivos de resultados .json/.jsonl o globs (p. ej. 'evaluacion_real_*.jsonl').")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (default: uno por archivo, hasta el número de CPUs).")
+    parser.add_argument("--confianza", type=float, default=0.95, help="Nivel de confianza de los intervalos (default: 0.95).")
+    parser.add_argument("--csv", default=None, help="Guardar además la tabla en este CSV.")
+    args = parser.parse_args()
+    if not 0 < args.confianza < 1:
+        parser.error(f"--confianza debe estar entre 0 y 1 (excluidos), no {args.confianza}")
+
+    print("--- Calculando Accuracy desde archivos de resultados ---")
+
+    archivos = []
+    for archivo in expandir_entradas(args.archivos):
+        if os.path.exists(archivo):
+            archivos.append(archivo)
         else:
-            print("No se encontraron evaluaciones válidas en el archivo.")
+            print(f"Error: No se encuentra el archivo '{archivo}'.")
+    if not archivos:
+        sys.exit(1)
+
+    workers = args.workers or min(len(archivos), os.cpu_count() or 1)
+    conteos = defaultdict(lambda: [0, 0])
+    if workers > 1 and len(archivos) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parciales = list(pool.map(contar_archivo, archivos))
+    else:
+        parciales = [contar_archivo(archivo) for archivo in archivos]
+
+    omitidos = 0
+    for path, conteo, invalidos, lineas_malas, error in parciales:
+        if error is not None:
+            print(f"Error: El archivo '{path}' no es un JSON válido o está truncado ({error}). Se omite.")
+            omitidos += 1
+            continue
+        if lineas_malas:
+            print(f"Advertencia: '{path}' tiene {lineas_malas} líneas JSONL ilegibles (se saltaron).")
+        total_archivo = sum(t for (_, dimension, _), (_, t) in conteo.items() if dimension == "total")
+        print(f"📊 {path}: {total_archivo} evaluaciones" + (f" ({invalidos} items sin formato esperado)" if invalidos else ""))
+        for clave, (correctas, total) in conteo.items():
+            conteos[clave][0] += correctas
+            conteos[clave][1] += total
+
+    if omitidos:
+        print(f"⚠️  {omitidos} de {len(archivos)} archivos omitidos por errores de lectura.")
+
+    if not conteos:
+        print("No se encontraron evaluaciones válidas en los archivos.")
+        sys.exit(1)
+
+    # Orden: por modelo; dentro de cada uno, total primero y luego cada dimensión por tamaño
+    orden_dimension = {"total": 0, "region": 1, "categoria": 2}
+    filas = sorted(conteos.items(), key=lambda kv: (kv[0][0], orden_dimension.get(kv[0][1], 3), -kv[1][1], kv[0][2]))
+
+    nivel = f"IC {args.confianza:.0%}"
+    print(f"\n{'Modelo':28s} {'Dimensión':10s} {'Valor':24s} {'Correctas':>10s} {'Total':>9s} {'Accuracy':>9s}  {nivel}")
+    tabla = []
+    for (modelo, dimension, valor), (correctas, total) in filas:
+        inferior, superior = intervalo_wilson(correctas, total, args.confianza)
+        accuracy = correctas / total
+        tabla.append((modelo, dimension, valor, correctas, total, accuracy, inferior, superior))
+        print(f"{modelo[:28]:28s} {dimension:10s} {valor[:24]:24s} {correctas:10d} {total:9d} "
+              f"{100 * accuracy:8.1f}%  [{100 * inferior:.1f}, {100 * superior:.1f}]")
+    print("-------------------------------------------------")
+
+    if args.csv:
+        with open(args.csv, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["modelo", "dimension", "valor", "correctas", "total", "accuracy", "ic_inferior", "ic_superior"])
+            writer.writerows(tabla)
+        print(f"Tabla guardada en '{args.csv}'")
+
 
-    except json.JSONDecodeError:
-        print(f"Error: El archivo '{input_json_file}' no es un JSON válido.")
-    except Exception as e:
-        print(f"Error inesperado procesando el archivo: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,16 @@ Detecta categorías basadas en palabras clave y contexto de las preguntas
 """
 
 import json
-import re
-from typing import Dict, List, Set
-from collections import Counter
+import os
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+from comun.aho_corasick import KeywordAutomaton
+from comun.io_datos import GROUP_KEY, VALUE_KEY, is_flat, is_jsonl, iter_chunks, iter_records, load_dataset, open_text
+from comun.paralelo import map_chunks_ordered
+from comun.normalizacion import normalizar_entidad
+from comun.plantillas_qa import extraer_entidad
 
 
 class DatasetCategorizer:
@@ -128,20 +135,32 @@ class DatasetCategorizer:
                 ]
             }
         }
-        
+        self.compile_keywords()
+
+    def compile_keywords(self):
+        """
+        Compila las palabras clave (normalizadas una sola vez) en dos autómatas
+
+        Hay que volver a llamarlo si se modifica category_keywords.
+        """
+        self.entity_automaton = KeywordAutomaton(
+            (self.normalize_text(keyword), category)
+            for category, keywords in self.category_keywords.items()
+            for keyword in keywords['entidades']
+        )
+        self.text_automaton = KeywordAutomaton(
+            (self.normalize_text(keyword), category)
+            for category, keywords in self.category_keywords.items()
+            for keyword in keywords['palabras']
+        )
+
     def normalize_text(self, text: str) -> str:
         """Normaliza texto para comparación (minúsculas, sin acentos extra)"""
-        if not text:
-            return ""
-        text = text.lower().strip()
-        # Simplificar algunos caracteres especiales comunes
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', 'ü': 'u'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text
+        return normalizar_entidad(text)
+    
+    def entity_from_question(self, pregunta: str) -> str:
+        """Entidad de una pregunta suelta (el mismo extractor que DatasetMinerMejorado)"""
+        return extraer_entidad(pregunta)
     
     def detect_category(self, entidad: str, preguntas: List[Dict]) -> str:
         """
@@ -156,31 +175,23 @@ class DatasetCategorizer:
         """
         entidad_norm = self.normalize_text(entidad)
         
-        # Combinar todo el texto de las preguntas para análisis
-        texto_completo = entidad_norm + " "
-        for p in preguntas:
-            texto_completo += self.normalize_text(p.get('pregunta', '')) + " "
-            texto_completo += self.normalize_text(p.get('respuesta_correcta', '')) + " "
-        
-        # Contar coincidencias para cada categoría
-        scores = {}
+        # Entidad, preguntas y respuestas como segmentos separados por un espacio:
+        # el autómata los recorre uno tras otro sin armar un texto gigante
+        def segmentos():
+            yield entidad_norm
+            for p in preguntas:
+                yield self.normalize_text(p.get('pregunta', ''))
+                yield self.normalize_text(p.get('respuesta_correcta', ''))
         
-        for category, keywords in self.category_keywords.items():
-            score = 0
-            
-            # Puntos por coincidencia en entidad
-            for keyword in keywords['entidades']:
-                keyword_norm = self.normalize_text(keyword)
-                if keyword_norm in entidad_norm:
-                    score += 5  # Mayor peso a coincidencias en entidad
-                    
-            # Puntos por coincidencia en preguntas
-            for keyword in keywords['palabras']:
-                keyword_norm = self.normalize_text(keyword)
-                if keyword_norm in texto_completo:
-                    score += texto_completo.count(keyword_norm)
-                    
-            scores[category] = score
+        # Contar coincidencias para cada categoría en una sola pasada por texto:
+        # 5 puntos por palabra clave presente en la entidad (mayor peso) y uno
+        # por cada ocurrencia de las palabras clave en las preguntas
+        entity_hits = self.entity_automaton.presence(entidad_norm)
+        text_hits = self.text_automaton.counts_segments(segmentos())
+        scores = {
+            category: 5 * entity_hits.get(category, 0) + text_hits.get(category, 0)
+            for category in self.category_keywords
+        }
         
         # Reglas especiales para desambiguar y priorizar categorías específicas
         
@@ -213,49 +224,118 @@ class DatasetCategorizer:
         
         return max(scores, key=scores.get)
     
-    def categorize_dataset(self, input_file: str, output_file: str):
+    def categorize_items(self, items: Iterable, entry_of: Callable[[Dict], Tuple[str, List[Dict]]],
+                         workers: int = 1, chunk_size: int = 256) -> Iterator[Tuple[Dict, str]]:
+        """
+        Categoriza items en orden, por bloques; devuelve pares (item, categoría)
+        
+        entry_of da el par (entidad, preguntas) de cada item. Con workers > 1
+        los bloques se reparten en un pool de procesos con a lo sumo 2 bloques
+        en vuelo por proceso, así la memoria no crece con el dataset. El orden
+        de salida es siempre el de entrada.
+        """
+        pending = deque()
+        
+        def entry_chunks():
+            for chunk in iter_chunks(items, chunk_size):
+                pending.append(chunk)
+                yield [entry_of(item) for item in chunk]
+        
+        # Los resultados llegan en el orden de los bloques: cada uno es del más viejo pendiente
+        for categories in map_chunks_ordered(self, 'detect_categories', entry_chunks(), workers):
+            yield from zip(pending.popleft(), categories)
+    
+    def detect_categories(self, entries: List[Tuple[str, List[Dict]]]) -> List[str]:
+        """detect_category para un bloque de pares (entidad, preguntas)"""
+        return [self.detect_category(entidad, preguntas) for entidad, preguntas in entries]
+    
+    def categorize_dataset(self, input_file: str, output_file: str, workers: int = 1, chunk_size: int = 256):
         """
         Procesa el dataset completo y agrega categorías
         
+        Acepta el subset por región ({region: [{entidad, preguntas}]}) o una
+        lista plana de QA (arreglo JSON o JSONL, p. ej. justo_qa.json), que se
+        lee en streaming y se categoriza pregunta a pregunta. La salida se
+        escribe a medida que se categoriza, un item por línea.
+        
         Args:
             input_file: Ruta al archivo JSON de entrada
-            output_file: Ruta al archivo JSON de salida
+            output_file: Ruta al archivo de salida (.jsonl para JSONL: con la entrada por
+                región, una entidad por línea con la región en GROUP_KEY; .gz / .zst al
+                final para comprimir)
+            workers: Procesos para categorizar en paralelo
+            chunk_size: Entidades (o preguntas) por bloque enviado a cada proceso
         """
         print(f"Leyendo dataset desde {input_file}...")
-        
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        start = time.perf_counter()
         
         # Estadísticas
         stats = Counter()
         total_entities = 0
         
-        # Procesar cada región
-        for region_key in data:
-            if isinstance(data[region_key], list):
-                print(f"\nProcesando región: {region_key}")
-                
-                for item in data[region_key]:
-                    entidad = item.get('entidad', '')
-                    preguntas = item.get('preguntas', [])
-                    
-                    # Detectar categoría
-                    category = self.detect_category(entidad, preguntas)
-                    
-                    # Agregar categoría al item
-                    item['category'] = category
-                    
-                    # Actualizar estadísticas
-                    stats[category] += 1
-                    total_entities += 1
-                    
-                    if total_entities % 100 == 0:
-                        print(f"  Procesadas {total_entities} entidades...")
+        def write_items(out, items, entry_of, progress_every, jsonl=False, group=None):
+            """Categoriza y escribe los items (como JSONL o como elementos de un arreglo)"""
+            n = 0
+            for item, category in self.categorize_items(items, entry_of, workers, chunk_size):
+                item['category'] = category
+                stats[category] += 1
+                line = json.dumps(item if group is None else {GROUP_KEY: group, **item}, ensure_ascii=False)
+                out.write(line + "\n" if jsonl else ("\n" if n == 0 else ",\n") + line)
+                n += 1
+                if (total_entities + n) % progress_every == 0:
+                    print(f"  Procesadas {total_entities + n:,} entidades...")
+            return n
+        
+        jsonl = is_jsonl(output_file)
+        with open_text(output_file, 'w') as out:
+            if is_flat(input_file):
+                # Lista plana de QA: una categoría por pregunta
+                print(f"\nProcesando lista plana de preguntas ({workers} procesos)")
+                out.write("" if jsonl else "[")
+                total_entities += write_items(
+                    out, iter_records(input_file),
+                    lambda item: (item.get('entidad') or self.entity_from_question(item.get('pregunta', '')), [item]),
+                    10000, jsonl,
+                )
+                out.write("" if jsonl else "\n]\n")
+            elif jsonl:
+                data = load_dataset(input_file)
+                # Procesar cada región (una entidad por línea, con su región)
+                for region_key, entities in data.items():
+                    if not isinstance(entities, list) or not entities:
+                        record = {GROUP_KEY: region_key}
+                        if not isinstance(entities, list):
+                            record[VALUE_KEY] = entities
+                        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        continue
+                    print(f"\nProcesando región: {region_key}")
+                    total_entities += write_items(
+                        out, entities,
+                        lambda item: (item.get('entidad', ''), item.get('preguntas', [])),
+                        100, jsonl, region_key,
+                    )
+            else:
+                data = load_dataset(input_file)
+                # Procesar cada región (un objeto JSON; cada entidad en una línea)
+                out.write("{")
+                for n_key, region_key in enumerate(data):
+                    out.write(("\n" if n_key == 0 else ",\n") + json.dumps(region_key, ensure_ascii=False) + ": ")
+                    if not isinstance(data[region_key], list):
+                        out.write(json.dumps(data[region_key], ensure_ascii=False))
+                        continue
+                    print(f"\nProcesando región: {region_key}")
+                    out.write("[")
+                    total_entities += write_items(
+                        out, data[region_key],
+                        lambda item: (item.get('entidad', ''), item.get('preguntas', [])),
+                        100,
+                    )
+                    out.write("\n]")
+                out.write("\n}\n")
         
-        # Guardar resultado
-        print(f"\nGuardando dataset categorizado en {output_file}...")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        elapsed = time.perf_counter() - start
+        print(f"\nDataset categorizado guardado en {output_file} "
+              f"({total_entities:,} en {elapsed:.1f}s, {total_entities / max(elapsed, 1e-9):,.0f}/s)")
         
         # Mostrar estadísticas
         print("\n" + "="*60)
@@ -288,7 +368,19 @@ def main():
         'output_file',
         nargs='?',
         default='subset_experimento_categorizado.json',
-        help='Archivo JSON de salida (default: subset_experimento_categorizado.json)'
+        help='Archivo de salida, JSON o JSONL con .jsonl / .jsonl.gz / .jsonl.zst (default: subset_experimento_categorizado.json)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Procesos para categorizar en paralelo (default: número de CPUs)'
+    )
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=256,
+        help='Entidades (o preguntas) por bloque enviado a cada proceso (default: 256)'
     )
     parser.add_argument(
         '--interactive',
@@ -299,7 +391,8 @@ def main():
     args = parser.parse_args()
     
     categorizer = DatasetCategorizer()
-    stats = categorizer.categorize_dataset(args.input_file, args.output_file)
+    stats = categorizer.categorize_dataset(args.input_file, args.output_file,
+                                           workers=args.workers, chunk_size=args.chunk_size)
     
     print("\n✓ Categorización completada exitosamente!")
     print(f"✓ Archivo generado: {args.output_file}")
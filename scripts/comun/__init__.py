@@ -0,0 +1,7 @@
+"""
+Utilidades compartidas por los scripts de minería, evaluación y análisis.
+
+Los scripts de ``scripts/`` las importan directamente (``from comun... import``);
+los de ``h0/``, ``h2/`` y ``gen_dataset/`` agregan primero el directorio padre
+a ``sys.path``.
+"""
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de muchas palabras clave en una sola pasada (Aho-Corasick).
+
+DatasetCategorizer buscaba cada palabra clave por separado (`in` y después
+`str.count`), cientos de recorridos del texto por entidad. KeywordAutomaton
+compila todas las palabras una vez y devuelve, en un solo recorrido, los
+conteos sumados por clave (por ejemplo, por categoría) con la misma semántica
+que `str.count`: ocurrencias sin solapamiento de cada palabra, de izquierda a
+derecha. Si una palabra aparece varias veces en la lista de una clave
+(p. ej. 'perú' y 'peru' una vez normalizadas), cuenta esas veces.
+
+Usa pyahocorasick (extensión en C) si está instalado; si no, una
+implementación en Python puro con el mismo resultado.
+
+    automata = KeywordAutomaton([('pintor', 'painters'), ('museo', 'landmarks')])
+    automata.counts(texto)    # {'painters': 2, 'landmarks': 1}
+    automata.presence(texto)  # {'painters': 1, 'landmarks': 1}
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, Iterator, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordAutomaton:
+    """Conteo de palabras clave por clave en una sola pasada sobre el texto"""
+
+    def __init__(self, keywords: Iterable[Tuple[str, Hashable]], backend: str = 'auto'):
+        """
+        Args:
+            keywords: Pares (palabra, clave); las palabras ya normalizadas
+            backend: 'auto', 'c' (pyahocorasick) o 'python'
+        """
+        weights = defaultdict(Counter)
+        for word, key in keywords:
+            weights[word][key] += 1
+        # '' está en cualquier texto y str.count('') es len + 1: se trata aparte
+        self.empty = weights.pop('', Counter())
+        self.patterns = list(weights)
+        self.lengths = [len(p) for p in self.patterns]
+        self.weights = [weights[p] for p in self.patterns]
+
+        if backend == 'auto':
+            backend = 'c' if ahocorasick is not None else 'python'
+        if backend == 'c':
+            if ahocorasick is None:
+                raise ImportError("Necesitas 'pyahocorasick'. Instálalo con: pip install pyahocorasick")
+            self._automaton = ahocorasick.Automaton()
+            for index, pattern in enumerate(self.patterns):
+                self._automaton.add_word(pattern, index)
+            if self.patterns:
+                self._automaton.make_automaton()
+        elif backend != 'python':
+            raise ValueError(f"Backend '{backend}' no soportado. Opciones: auto, c, python")
+        else:
+            self._build()
+        self.backend = backend
+
+    def _build(self):
+        """Trie con enlaces de fallo; cada estado guarda todas sus salidas"""
+        goto = [{}]
+        output = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state].append(index)
+
+        fail = [0] * len(goto)
+        frontier = list(goto[0].values())
+        while frontier:
+            siguiente = []
+            for state in frontier:
+                for char, child in goto[state].items():
+                    link = fail[state]
+                    while link and char not in goto[link]:
+                        link = fail[link]
+                    fail[child] = goto[link].get(char, 0) if goto[link].get(char) != child else 0
+                    output[child] = output[child] + output[fail[child]]
+                    siguiente.append(child)
+            frontier = siguiente
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(o) for o in output]
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(índice de patrón, posición final exclusiva) de todas las ocurrencias, solapadas incluidas"""
+        if not self.patterns:
+            return
+        if self.backend == 'c':
+            for end, index in self._automaton.iter(text):
+                yield index, end + 1
+            return
+        yield from self._scan([text])
+
+    def _scan(self, segments: Iterable[str]) -> Iterator[Tuple[int, int]]:
+        """Recorre los segmentos como si fueran un solo texto (el estado pasa de uno al otro)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        offset = 0
+        for segment in segments:
+            for position, char in enumerate(segment, offset + 1):
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                for index in output[state]:
+                    yield index, position
+            offset += len(segment)
+
+    def _pattern_counts(self, matches: Iterable[Tuple[int, int]]) -> Counter:
+        counts = Counter()
+        last_end = {}
+        lengths = self.lengths
+        for index, end in matches:
+            # Las ocurrencias llegan ordenadas por final: tomar una si empieza
+            # después de la anterior aceptada del mismo patrón
+            if end - lengths[index] >= last_end.get(index, 0):
+                last_end[index] = end
+                counts[index] += 1
+        return counts
+
+    def _totals(self, pattern_counts: Counter, length: int) -> Dict[Hashable, int]:
+        totals = Counter()
+        for index, n in pattern_counts.items():
+            for key, weight in self.weights[index].items():
+                totals[key] += weight * n
+        for key, weight in self.empty.items():
+            totals[key] += weight * (length + 1)
+        return dict(totals)
+
+    def pattern_counts(self, text: str) -> Counter:
+        """Ocurrencias sin solapamiento de cada patrón (lo mismo que text.count(patrón))"""
+        return self._pattern_counts(self.matches(text))
+
+    def counts(self, text: str) -> Dict[Hashable, int]:
+        """Suma, por clave, de text.count(palabra) sobre sus palabras"""
+        return self._totals(self.pattern_counts(text), len(text))
+
+    def counts_segments(self, segments: Iterable[str], separator: str = ' ') -> Dict[Hashable, int]:
+        """
+        Lo mismo que counts(''.join(s + separator for s in segments)) sin armar ese texto
+
+        Con el backend en Python el autómata consume un segmento tras otro
+        (las palabras que cruzan de un segmento al siguiente se cuentan igual);
+        pyahocorasick no puede retomar el estado, así que ahí se une una vez.
+        """
+        if self.backend == 'c' or not self.patterns:
+            return self.counts(''.join(segment + separator for segment in segments))
+        lengths = []
+
+        def con_separador():
+            for segment in segments:
+                lengths.append(len(segment) + len(separator))
+                yield segment
+                yield separator
+
+        counts = self._pattern_counts(self._scan(con_separador()))
+        return self._totals(counts, sum(lengths))
+
+    def presence(self, text: str) -> Dict[Hashable, int]:
+        """Suma, por clave, de las palabras que aparecen al menos una vez"""
+        totals = Counter()
+        for index in {index for index, _ in self.matches(text)}:
+            for key, weight in self.weights[index].items():
+                totals[key] += weight
+        for key, weight in self.empty.items():
+            totals[key] += weight
+        return dict(totals)
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backends de generación intercambiables para los evaluadores.
+
+Todos exponen la misma interfaz, así el mismo driver de evaluación, las mismas
+métricas y el mismo formato de salida sirven con cualquier motor:
+
+    backend = create_backend('hf-batched', 'llama3', gpu_id=0)
+    textos = [backend.build_prompt(p) for p in prompts]   # chat template
+    predicciones = backend.generate(textos)
+    backend.close()
+
+Backends disponibles:
+  - 'hf-eager':   transformers, un prompt a la vez con model.generate
+                  (respeta el generation_config del modelo)
+  - 'hf-batched': transformers con batching continuo (greedy)
+  - 'hf-compiled': transformers con StaticCache y el paso de decodificación
+                  compilado con torch.compile (greedy)
+  - 'hf-speculative': transformers con decodificación especulativa (greedy,
+                  un modelo borrador pequeño propone y el modelo evaluado verifica)
+  - 'vllm':       vLLM offline
+  - 'fake':       determinista y sin modelo, para pruebas del pipeline
+
+torch, transformers y vllm se importan recién al crear el backend que los usa.
+"""
+
+import gc
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+# Alias cortos usados por los scripts y el run_pipeline.sh
+MODELOS = {
+    'llama3': 'meta-llama/Meta-Llama-3.1-8B-Instruct',
+    'qwen3': 'Qwen/Qwen3-VL-8B-Instruct',
+    'tinyllama': 'TinyLlama/TinyLlama-1.1B-Chat-v1.0',
+    'llama3-1b': 'meta-llama/Llama-3.2-1B-Instruct',
+}
+
+# Borrador por defecto para 'hf-speculative' (debe compartir el tokenizer)
+DRAFT_MODELS = {
+    'meta-llama/Meta-Llama-3.1-8B-Instruct': 'meta-llama/Llama-3.2-1B-Instruct',
+}
+
+# Modelos que necesitan trust_remote_code al cargarse con transformers
+_TRUST_REMOTE_CODE = {'Qwen/Qwen3-VL-8B-Instruct'}
+
+
+def resolve_model_id(model_name: str) -> str:
+    """Traduce un alias ('llama3', 'qwen3', ...) a su id de Hugging Face"""
+    return MODELOS.get(model_name, model_name)
+
+
+class GenerationBackend:
+    """Interfaz común de los backends de generación"""
+
+    name = None
+
+    def __init__(self, model_id: str, max_new_tokens: int = 200):
+        self.model_id = model_id
+        self.max_new_tokens = max_new_tokens
+        self.dtype = "none"
+        self.tokenizer = None
+
+    def build_prompt(self, prompt: str) -> str:
+        """Aplica el chat template del modelo (si tiene uno)"""
+        if self.tokenizer is None:
+            return prompt
+        # Usar chat template para mejorar el rendimiento en modelos Instruct
+        messages = [{"role": "user", "content": prompt}]
+        try:
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        except Exception:
+            return prompt
+
+    def decoding_params(self) -> Dict:
+        """Parámetros efectivos de decodificación (forman parte de la clave de caché)"""
+        raise NotImplementedError
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Genera una respuesta por prompt (con el chat template ya aplicado)"""
+        raise NotImplementedError
+
+    def close(self):
+        """Libera la memoria del modelo"""
+        gc.collect()
+
+
+class _HFBackend(GenerationBackend):
+    """Base de los backends de transformers: tokenizer al crear, pesos al generar"""
+
+    def __init__(self, model_id: str, max_new_tokens: int = 200, gpu_id: Optional[int] = None,
+                 token: Optional[str] = None, dtype: str = "float16"):
+        super().__init__(model_id, max_new_tokens)
+        import torch
+        from transformers import AutoTokenizer, GenerationConfig
+
+        self._torch = torch
+        if torch.cuda.is_available():
+            self.device = f"cuda:{gpu_id}" if gpu_id is not None else "cuda"
+        else:
+            self.device = "cpu"
+        self.token = token
+        self.dtype = dtype
+        self.trust_remote_code = model_id in _TRUST_REMOTE_CODE
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, trust_remote_code=self.trust_remote_code, token=token)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        try:
+            self.generation_config = GenerationConfig.from_pretrained(model_id, token=token)
+        except Exception:
+            self.generation_config = GenerationConfig()
+        # El modelo se carga recién en el primer fallo de caché
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            from transformers import AutoModelForCausalLM
+            self._model = AutoModelForCausalLM.from_pretrained(
+                self.model_id,
+                trust_remote_code=self.trust_remote_code,
+                token=self.token,
+                torch_dtype=getattr(self._torch, self.dtype)
+            ).to(self.device)
+            self._model.eval()
+        return self._model
+
+    def close(self):
+        self._model = None
+        if self._torch.cuda.is_available():
+            self._torch.cuda.empty_cache()
+        super().close()
+
+
+class HFEagerBackend(_HFBackend):
+    """transformers, un prompt a la vez (comportamiento original de 3_evaluar_paralelo.py)"""
+
+    name = 'hf-eager'
+
+    def decoding_params(self) -> Dict:
+        config = self.generation_config
+        return {
+            'max_new_tokens': self.max_new_tokens,
+            'do_sample': bool(config.do_sample),
+            'temperature': config.temperature,
+            'top_p': config.top_p,
+            'top_k': config.top_k,
+            'repetition_penalty': config.repetition_penalty,
+        }
+
+    def generate_one(self, text: str) -> str:
+        inputs = self.tokenizer(text, return_tensors="pt").to(self.device)
+        with self._torch.no_grad():
+            generate_ids = self.model.generate(
+                inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                max_new_tokens=self.max_new_tokens,
+                pad_token_id=self.tokenizer.eos_token_id
+            )
+        new_tokens = generate_ids[0][inputs.input_ids.shape[1]:]
+        return self.tokenizer.batch_decode([new_tokens], skip_special_tokens=True, clean_up_tokenization_spaces=False)[0].strip()
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        from tqdm import tqdm
+        return [self.generate_one(text) for text in tqdm(prompts)]
+
+
+class HFBatchedBackend(_HFBackend):
+    """transformers con batching continuo (greedy)"""
+
+    name = 'hf-batched'
+
+    def __init__(self, model_id: str, max_new_tokens: int = 200, batch_size: int = 16, **kwargs):
+        super().__init__(model_id, max_new_tokens, **kwargs)
+        self.batch_size = batch_size
+        self.last_stats = {}
+
+    def decoding_params(self) -> Dict:
+        return {'max_new_tokens': self.max_new_tokens, 'do_sample': False}
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        from comun.batching_continuo import ContinuousBatchingEngine
+        engine = ContinuousBatchingEngine(self.model, self.tokenizer, max_batch_size=self.batch_size,
+                                          max_new_tokens=self.max_new_tokens)
+        predictions = engine.generate(prompts)
+        self.last_stats = engine.stats
+        print(f"Batching continuo: {engine.stats['new_tokens']} tokens en {engine.stats['seconds']:.1f}s "
+              f"({engine.stats['tokens_per_second']:.1f} tokens/s, uso de slots {engine.stats['slot_utilization']:.1%})")
+        return predictions
+
+
+class HFCompiledBackend(_HFBackend):
+    """transformers con StaticCache + torch.compile (greedy)"""
+
+    name = 'hf-compiled'
+
+    def __init__(self, model_id: str, max_new_tokens: int = 200, bucket: int = 32, **kwargs):
+        super().__init__(model_id, max_new_tokens, **kwargs)
+        self.bucket = bucket
+        self._generator = None
+
+    def decoding_params(self) -> Dict:
+        # Misma salida greedy que 'hf-batched': comparten las claves de caché
+        return {'max_new_tokens': self.max_new_tokens, 'do_sample': False}
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        from comun.compilado import StaticCacheGenerator
+        # Se conserva entre bloques para no volver a compilar
+        if self._generator is None:
+            self._generator = StaticCacheGenerator(self.model, self.tokenizer, max_new_tokens=self.max_new_tokens,
+                                                   bucket=self.bucket)
+        predictions = self._generator.generate(prompts)
+        stats = self._generator.stats
+        print(f"Compilado: {stats['new_tokens']} tokens en {stats['seconds']:.1f}s "
+              f"(warmup {stats['warmup_seconds']:.1f}s, {stats['ms_per_decode_step']:.1f} ms por paso)")
+        return predictions
+
+    def close(self):
+        self._generator = None
+        super().close()
+
+
+class HFSpeculativeBackend(_HFBackend):
+    """transformers con decodificación especulativa (greedy, salida idéntica a greedy)"""
+
+    name = 'hf-speculative'
+
+    def __init__(self, model_id: str, max_new_tokens: int = 200, draft_model: Optional[str] = None,
+                 num_draft_tokens: int = 5, **kwargs):
+        super().__init__(model_id, max_new_tokens, **kwargs)
+        draft_id = resolve_model_id(draft_model) if draft_model else DRAFT_MODELS.get(model_id)
+        if draft_id is None:
+            raise ValueError(f"No hay modelo borrador por defecto para '{model_id}'; indicar uno con --draft_model.")
+        from transformers import AutoTokenizer
+        self.draft_id = draft_id
+        self.num_draft_tokens = num_draft_tokens
+        self.draft_tokenizer = AutoTokenizer.from_pretrained(draft_id, token=self.token)
+        self._draft_model = None
+        self.last_stats = {}
+
+    @property
+    def draft_model(self):
+        if self._draft_model is None:
+            from transformers import AutoModelForCausalLM
+            self._draft_model = AutoModelForCausalLM.from_pretrained(
+                self.draft_id,
+                token=self.token,
+                torch_dtype=getattr(self._torch, self.dtype)
+            ).to(self.device)
+            self._draft_model.eval()
+        return self._draft_model
+
+    def decoding_params(self) -> Dict:
+        # Mismos parámetros (y por lo tanto mismas claves de caché) que 'hf-batched':
+        # ambos producen exactamente la salida greedy
+        return {'max_new_tokens': self.max_new_tokens, 'do_sample': False}
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        from comun.especulativo import SpeculativeDecoder
+        decoder = SpeculativeDecoder(self.model, self.draft_model, self.tokenizer,
+                                     num_draft_tokens=self.num_draft_tokens,
+                                     max_new_tokens=self.max_new_tokens,
+                                     draft_tokenizer=self.draft_tokenizer)
+        predictions = decoder.generate(prompts)
+        self.last_stats = decoder.stats
+        print(f"Especulativa ({self.draft_id}): {decoder.stats['new_tokens']} tokens en {decoder.stats['seconds']:.1f}s "
+              f"({decoder.stats['tokens_per_second']:.1f} tokens/s, aceptación {decoder.stats['acceptance_rate']:.1%}, "
+              f"{decoder.stats['tokens_per_target_forward']:.2f} tokens por forward)")
+        return predictions
+
+    def close(self):
+        self._draft_model = None
+        super().close()
+
+
+class VLLMBackend(GenerationBackend):
+    """vLLM offline (el motor se crea recién al generar)"""
+
+    name = 'vllm'
+
+    def __init__(self, model_id: str, max_new_tokens: int = 100, gpu_id: Optional[int] = None,
+                 dtype: str = "auto", temperature: float = 0.1, top_p: float = 0.9,
+                 gpu_memory_utilization: float = 0.7, **kwargs):
+        super().__init__(model_id, max_new_tokens)
+        if gpu_id is not None:
+            # vLLM usa la primera GPU visible
+            os.environ.setdefault("CUDA_VISIBLE_DEVICES", str(gpu_id))
+        from transformers import AutoTokenizer
+        self.dtype = dtype
+        self.temperature = temperature
+        self.top_p = top_p
+        self.gpu_memory_utilization = gpu_memory_utilization
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, token=kwargs.get('token'))
+        self._llm = None
+
+    def decoding_params(self) -> Dict:
+        return {'temperature': self.temperature, 'top_p': self.top_p, 'max_tokens': self.max_new_tokens}
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        from vllm import LLM, SamplingParams
+        if self._llm is None:
+            print(f"\nCargando modelo '{self.model_id}' en vLLM. (Esto puede tardar)...")
+            # Mantenemos la utilización de memoria baja
+            self._llm = LLM(model=self.model_id, gpu_memory_utilization=self.gpu_memory_utilization, dtype=self.dtype)
+        outputs = self._llm.generate(prompts, SamplingParams(**self.decoding_params()))
+        return [output.outputs[0].text.strip() for output in outputs]
+
+    def close(self):
+        self._llm = None
+        super().close()
+
+
+class FakeBackend(GenerationBackend):
+    """Backend determinista sin modelo: misma entrada, misma salida, siempre"""
+
+    name = 'fake'
+
+    def __init__(self, model_id: str = 'fake', max_new_tokens: int = 200, **kwargs):
+        super().__init__(model_id, max_new_tokens)
+
+    def decoding_params(self) -> Dict:
+        return {'max_new_tokens': self.max_new_tokens}
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        predictions = []
+        for prompt in prompts:
+            digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+            # Repite las últimas palabras del prompt: da aciertos parciales en F1
+            tail = " ".join(prompt.split()[-3:])
+            predictions.append(f"{tail} {digest[:8]}"[:self.max_new_tokens * 4])
+        return predictions
+
+
+BACKENDS = {
+    HFEagerBackend.name: HFEagerBackend,
+    HFBatchedBackend.name: HFBatchedBackend,
+    HFCompiledBackend.name: HFCompiledBackend,
+    HFSpeculativeBackend.name: HFSpeculativeBackend,
+    VLLMBackend.name: VLLMBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def create_backend(backend_name: str, model_name: str, **kwargs) -> GenerationBackend:
+    """
+    Crea un backend por nombre
+
+    Args:
+        backend_name: 'hf-eager', 'hf-batched', 'hf-compiled', 'hf-speculative', 'vllm' o 'fake'
+        model_name: Alias de MODELOS o id de Hugging Face
+        **kwargs: Opciones del backend (gpu_id, token, max_new_tokens, batch_size, draft_model, ...)
+    """
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Backend '{backend_name}' no soportado. Opciones: {', '.join(BACKENDS)}")
+    if backend_name == 'fake':
+        kwargs = {k: v for k, v in kwargs.items() if k == 'max_new_tokens'}
+    if backend_name != 'hf-batched':
+        kwargs.pop('batch_size', None)
+    if backend_name != 'hf-speculative':
+        kwargs.pop('draft_model', None)
+        kwargs.pop('num_draft_tokens', None)
+    return BACKENDS[backend_name](resolve_model_id(model_name), **kwargs)
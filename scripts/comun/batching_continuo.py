@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de generación con batching continuo para modelos causales de Hugging Face.
+
+Con batches estáticos, una respuesta que termina en 3 tokens deja su lugar
+ocioso hasta que la más larga del batch llega al límite. Aquí cada secuencia
+que termina libera su fila de inmediato y se admite el siguiente prompt de la
+cola en el mismo paso.
+
+El caché KV se mantiene como un único batch con padding a la izquierda:
+  - al admitir prompts se hace su prefill (juntos, con padding izquierdo) y
+    sus filas se concatenan al batch activo, rellenando con ceros al inicio la
+    parte más corta y marcándola en la máscara de atención;
+  - al terminar una secuencia se eliminan sus filas del caché y se recortan
+    las columnas iniciales que quedaron solo con padding.
+
+La decodificación es greedy. Funciona en CPU con modelos pequeños.
+"""
+
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import torch
+
+try:
+    from transformers import DynamicCache
+except ImportError:
+    DynamicCache = None
+
+
+def cache_to_tuples(cache) -> List[tuple]:
+    """Convierte un caché de HF (cualquier versión) a [(keys, values)] por capa"""
+    if isinstance(cache, (tuple, list)):
+        return [(layer[0], layer[1]) for layer in cache]
+    if hasattr(cache, 'layers'):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def tuples_to_cache(layers: List[tuple]):
+    """Construye un DynamicCache a partir de [(keys, values)] por capa"""
+    if DynamicCache is None:
+        return tuple(layers)
+    cache = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(layers):
+        cache.update(keys, values, layer_idx)
+    return cache
+
+
+def crop_cache(cache, length: int):
+    """Deja en el caché KV solo las primeras `length` posiciones"""
+    if hasattr(cache, 'crop'):
+        # Con un valor negativo (tokens a quitar) funciona en todas las versiones de transformers
+        excess = cache.get_seq_length() - length
+        if excess > 0:
+            cache.crop(-excess)
+        return cache
+    return tuples_to_cache([(k[:, :, :length, :], v[:, :, :length, :]) for k, v in cache_to_tuples(cache)])
+
+
+def _left_pad(tensor: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+class ContinuousBatchingEngine:
+    """Scheduler de batching continuo (greedy) alrededor de un modelo HF"""
+
+    def __init__(self, model, tokenizer, max_batch_size: int = 8,
+                 max_new_tokens: int = 200, eos_token_ids: Optional[Iterable[int]] = None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_new_tokens = max_new_tokens
+        self.device = next(model.parameters()).device
+
+        if eos_token_ids is None:
+            eos_token_ids = getattr(model.generation_config, 'eos_token_id', None)
+            if eos_token_ids is None:
+                eos_token_ids = tokenizer.eos_token_id
+        if isinstance(eos_token_ids, int):
+            eos_token_ids = [eos_token_ids]
+        self.eos_token_ids = set(eos_token_ids or [])
+
+        self.pad_token_id = tokenizer.pad_token_id
+        if self.pad_token_id is None:
+            self.pad_token_id = tokenizer.eos_token_id
+
+        self.stats = {}
+
+    # ------------------------------------------------------------------
+    # Estado del batch activo
+    # ------------------------------------------------------------------
+
+    def _reset_state(self):
+        self._clear_batch()
+        self.generated = {}           # índice del prompt -> tokens generados
+
+    def _clear_batch(self):
+        self.layers = None            # [(keys, values)] con forma [B, H, T, D]
+        self.attention_mask = None    # [B, T]
+        self.next_tokens = None       # [B] último token generado (aún no está en el caché)
+        self.lengths = None           # [B] tokens reales en el caché (= posición del próximo)
+        self.rows = []                # índice del prompt en cada fila
+
+    def _is_finished(self, idx: int) -> bool:
+        tokens = self.generated[idx]
+        return tokens[-1] in self.eos_token_ids or len(tokens) >= self.max_new_tokens
+
+    def _admit(self, queue: deque, prompt_ids: Dict[int, List[int]]):
+        """Hace el prefill de los prompts que caben y los suma al batch activo"""
+        free = self.max_batch_size - len(self.rows)
+        admitted = []
+        while queue and len(admitted) < free:
+            admitted.append(queue.popleft())
+        if not admitted:
+            return
+
+        max_len = max(len(prompt_ids[idx]) for idx in admitted)
+        input_ids = torch.full((len(admitted), max_len), self.pad_token_id, dtype=torch.long)
+        mask = torch.zeros((len(admitted), max_len), dtype=torch.long)
+        for row, idx in enumerate(admitted):
+            ids = prompt_ids[idx]
+            input_ids[row, max_len - len(ids):] = torch.tensor(ids, dtype=torch.long)
+            mask[row, max_len - len(ids):] = 1
+        input_ids = input_ids.to(self.device)
+        mask = mask.to(self.device)
+        position_ids = (mask.cumsum(-1) - 1).clamp(min=0)
+
+        with torch.no_grad():
+            out = self.model(
+                input_ids=input_ids,
+                attention_mask=mask,
+                position_ids=position_ids,
+                use_cache=True,
+            )
+        self.stats['prefill_tokens'] += int(mask.sum())
+        first_tokens = out.logits[:, -1, :].argmax(dim=-1)
+        new_layers = cache_to_tuples(out.past_key_values)
+
+        # Las secuencias que terminan con su primer token no entran al batch
+        keep = []
+        for row, idx in enumerate(admitted):
+            self.generated[idx] = [int(first_tokens[row])]
+            if not self._is_finished(idx):
+                keep.append(row)
+        if not keep:
+            return
+        keep_t = torch.tensor(keep, device=self.device)
+        new_layers = [(k.index_select(0, keep_t), v.index_select(0, keep_t)) for k, v in new_layers]
+        mask = mask.index_select(0, keep_t)
+        new_rows = [admitted[row] for row in keep]
+        new_next = first_tokens.index_select(0, keep_t)
+        new_lengths = mask.sum(dim=-1)
+
+        if self.layers is None:
+            self.layers, self.attention_mask = new_layers, mask
+            self.next_tokens, self.lengths, self.rows = new_next, new_lengths, new_rows
+            return
+
+        # Fusionar: se alinean ambos bloques a la derecha con padding izquierdo
+        total = max(self.attention_mask.shape[1], mask.shape[1])
+        self.layers = [
+            (torch.cat([_left_pad(k_old, total, 2), _left_pad(k_new, total, 2)], dim=0),
+             torch.cat([_left_pad(v_old, total, 2), _left_pad(v_new, total, 2)], dim=0))
+            for (k_old, v_old), (k_new, v_new) in zip(self.layers, new_layers)
+        ]
+        self.attention_mask = torch.cat(
+            [_left_pad(self.attention_mask, total, 1), _left_pad(mask, total, 1)], dim=0)
+        self.next_tokens = torch.cat([self.next_tokens, new_next])
+        self.lengths = torch.cat([self.lengths, new_lengths])
+        self.rows = self.rows + new_rows
+
+    def _evict(self, keep: List[int]):
+        """Elimina del caché las filas que terminaron y recorta el padding sobrante"""
+        if not keep:
+            self._clear_batch()
+            return
+        keep_t = torch.tensor(keep, device=self.device)
+        self.attention_mask = self.attention_mask.index_select(0, keep_t)
+        self.next_tokens = self.next_tokens.index_select(0, keep_t)
+        self.lengths = self.lengths.index_select(0, keep_t)
+        self.rows = [self.rows[row] for row in keep]
+
+        # Columnas iniciales que son padding para todas las filas restantes
+        start = int((self.attention_mask.sum(dim=0) > 0).int().argmax())
+        self.attention_mask = self.attention_mask[:, start:]
+        self.layers = [
+            (k.index_select(0, keep_t)[:, :, start:, :], v.index_select(0, keep_t)[:, :, start:, :])
+            for k, v in self.layers
+        ]
+
+    def _decode_step(self):
+        """Un paso de decodificación para todas las filas activas"""
+        ones = torch.ones((len(self.rows), 1), dtype=self.attention_mask.dtype, device=self.device)
+        attention_mask = torch.cat([self.attention_mask, ones], dim=1)
+        with torch.no_grad():
+            out = self.model(
+                input_ids=self.next_tokens.unsqueeze(-1),
+                attention_mask=attention_mask,
+                position_ids=self.lengths.unsqueeze(-1),
+                past_key_values=tuples_to_cache(self.layers),
+                use_cache=True,
+            )
+        self.layers = cache_to_tuples(out.past_key_values)
+        self.attention_mask = attention_mask
+        self.lengths = self.lengths + 1
+        self.next_tokens = out.logits[:, -1, :].argmax(dim=-1)
+        self.stats['decode_steps'] += 1
+        self.stats['slot_steps'] += len(self.rows)
+
+        keep = []
+        for row, idx in enumerate(self.rows):
+            self.generated[idx].append(int(self.next_tokens[row]))
+            if not self._is_finished(idx):
+                keep.append(row)
+        if len(keep) < len(self.rows):
+            self._evict(keep)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def generate_ids(self, prompt_ids: List[List[int]]) -> List[List[int]]:
+        """Genera para prompts ya tokenizados; devuelve los tokens nuevos de cada uno"""
+        self._reset_state()
+        self.stats = {'prefill_tokens': 0, 'decode_steps': 0, 'slot_steps': 0}
+        ids_by_idx = dict(enumerate(prompt_ids))
+        queue = deque(range(len(prompt_ids)))
+        outputs = {}
+        start = time.perf_counter()
+
+        while queue or self.rows:
+            self._admit(queue, ids_by_idx)
+            # Recoger las que terminaron en el prefill
+            for idx in list(self.generated):
+                if idx not in outputs and idx not in self.rows and self._is_finished(idx):
+                    outputs[idx] = self.generated.pop(idx)
+            if self.rows:
+                self._decode_step()
+            for idx in list(self.generated):
+                if idx not in self.rows and self._is_finished(idx):
+                    outputs[idx] = self.generated.pop(idx)
+
+        elapsed = time.perf_counter() - start
+        new_tokens = sum(len(tokens) for tokens in outputs.values())
+        self.stats.update({
+            'seconds': elapsed,
+            'new_tokens': new_tokens,
+            'tokens_per_second': new_tokens / elapsed if elapsed > 0 else 0.0,
+            'slot_utilization': (self.stats['slot_steps'] /
+                                 (self.stats['decode_steps'] * self.max_batch_size)
+                                 if self.stats['decode_steps'] else 0.0),
+        })
+        return [outputs[idx] for idx in range(len(prompt_ids))]
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Genera para textos (con el chat template ya aplicado)"""
+        prompt_ids = [self.tokenizer(text)['input_ids'] for text in prompts]
+        outputs = self.generate_ids(prompt_ids)
+        return [
+            self.tokenizer.decode(
+                [t for t in tokens if t not in self.eos_token_ids],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=False,
+            ).strip()
+            for tokens in outputs
+        ]
+
+
+def static_batch_generate(model, tokenizer, prompts: List[str], batch_size: int = 8,
+                          max_new_tokens: int = 200) -> tuple:
+    """
+    Ruta de referencia: batches estáticos con model.generate (greedy)
+
+    Returns:
+        (predicciones, stats) con el mismo formato de stats que el motor continuo
+    """
+    device = next(model.parameters()).device
+    eos_token_ids = getattr(model.generation_config, 'eos_token_id', None)
+    if eos_token_ids is None:
+        eos_token_ids = tokenizer.eos_token_id
+    eos_token_ids = {eos_token_ids} if isinstance(eos_token_ids, int) else set(eos_token_ids or [])
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = 'left'
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    predictions = []
+    new_tokens = 0
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(prompts), batch_size):
+            batch = tokenizer(prompts[i:i + batch_size], return_tensors='pt', padding=True).to(device)
+            with torch.no_grad():
+                generated = model.generate(
+                    **batch,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=False,
+                    pad_token_id=tokenizer.pad_token_id,
+                )
+            for row in generated[:, batch['input_ids'].shape[1]:]:
+                tokens = row.tolist()
+                # Contar hasta el primer EOS inclusive (el resto es relleno del batch)
+                for pos, token in enumerate(tokens):
+                    if token in eos_token_ids:
+                        tokens = tokens[:pos + 1]
+                        break
+                new_tokens += len(tokens)
+                predictions.append(tokenizer.decode(
+                    tokens, skip_special_tokens=True, clean_up_tokenization_spaces=False).strip())
+    finally:
+        tokenizer.padding_side = padding_side
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'seconds': elapsed,
+        'new_tokens': new_tokens,
+        'tokens_per_second': new_tokens / elapsed if elapsed > 0 else 0.0,
+    }
+    return predictions, stats
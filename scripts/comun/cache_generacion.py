@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché local de generaciones direccionada por contenido.
+
+Cada predicción se guarda bajo el hash de (modelo, dtype, motor de
+generación, prompt con chat template ya aplicado, parámetros de
+decodificación). El motor entra en la clave porque los backends greedy
+(hf-batched con padding, hf-compiled con caché estático, hf-speculative) no
+dan necesariamente el mismo texto bit a bit. Si alguno de esos elementos cambia, la clave cambia y la predicción se vuelve a generar; si no,
+reejecutar el pipeline (por ejemplo tras tocar el juez o los gráficos) no
+recalcula nada.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+
+class GenerationCache:
+    """Caché de predicciones sobre SQLite (segura para varios procesos)"""
+
+    def __init__(self, path: str, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+
+        if self.enabled:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # Las 8 particiones escriben en el mismo archivo: WAL + timeout largo
+            self._conn = sqlite3.connect(path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generaciones ("
+                "clave TEXT PRIMARY KEY, modelo TEXT, prediccion TEXT)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model_id: str, dtype: str, prompt: str, decoding: Dict, engine: str) -> str:
+        """Clave SHA-256 de (modelo, dtype, motor, prompt con template, decodificación)"""
+        payload = json.dumps(
+            {
+                'model_id': model_id,
+                'dtype': str(dtype),
+                'engine': engine,
+                'prompt': prompt,
+                'decoding': decoding,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la predicción guardada o None (y actualiza los contadores)"""
+        if not self.enabled:
+            self.misses += 1
+            return None
+        row = self._conn.execute(
+            "SELECT prediccion FROM generaciones WHERE clave = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Consulta varias claves de una vez; devuelve solo las encontradas"""
+        found = {}
+        for key in keys:
+            prediction = self.get(key)
+            if prediction is not None:
+                found[key] = prediction
+        return found
+
+    def put(self, key: str, prediction: str, model_id: str = ""):
+        """Guarda una predicción (se confirma de inmediato para no perder trabajo)"""
+        if not self.enabled:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO generaciones (clave, modelo, prediccion) VALUES (?, ?, ?)",
+            (key, model_id, prediction),
+        )
+        self._conn.commit()
+
+    def put_many(self, items: Iterable[tuple], model_id: str = ""):
+        """Guarda varias (clave, predicción) en una sola transacción"""
+        if not self.enabled:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO generaciones (clave, modelo, prediccion) VALUES (?, ?, ?)",
+            [(key, model_id, prediction) for key, prediction in items],
+        )
+        self._conn.commit()
+
+    def summary(self) -> str:
+        """Resumen de aciertos/fallos para los logs"""
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        state = "" if self.enabled else " [deshabilitada]"
+        return (f"Caché de generación{state}: {self.hits} aciertos, "
+                f"{self.misses} fallos ({rate:.1f}% de aciertos)")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Forma columnar (Parquet) de las tripletas y de los datasets de QA/completion.
+
+Cada etapa escribe JSON con indent=4 o CSV, y la siguiente vuelve a parsear
+todo el texto. Aquí se guarda lo mismo en Parquet (zstd), con las columnas de
+entidad, relación y categoría codificadas como diccionario (cada valor
+distinto se guarda una vez y las filas son índices; en pandas quedan como
+dtype 'category').
+
+Formatos:
+  - Tripletas: las columnas del CSV (entidad, relacion, valor, *_qid, ...).
+  - Lista plana de items (usa_qa.json, subset_h2_completion.json): una fila
+    por item.
+  - Subset agrupado ({grupo: [{entidad, preguntas|samples: [...]}]}, como
+    subset_h2_final.json o dataset_completion_base_full.json): una fila por
+    pregunta, con el grupo y los campos de la entidad repetidos (el
+    diccionario los guarda una vez). load_json reconstruye el mismo objeto.
+
+Los cargadores llaman a prefer_parquet(path): si existe el .parquet hermano y
+no es más viejo que el original, se lee ese.
+
+    json_to_parquet('subset_h2_final.json')       # -> subset_h2_final.parquet
+    data = load_json(prefer_parquet('subset_h2_final.json'))
+    df = read_triples(prefer_parquet('tripletas_completas.csv'))
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from comun.io_datos import is_flat, iter_chunks, iter_records, load_dataset, strip_compression
+
+# Columnas que se codifican como diccionario (si están)
+DICTIONARY_COLUMNS = ('grupo', 'entidad', 'entity', 'relacion', 'category', 'categoria', 'region',
+                      'sujeto_qid', 'entidad_qid', 'relacion_qid', 'valor_qid')
+
+# Columnas internas del formato agrupado
+_GROUP = 'grupo'
+_ENTITY_N = '_entidad_n'
+_ITEM_N = '_item_n'
+
+# Clave de los metadatos del archivo con la descripción del formato
+_METADATA_KEY = b'columnar'
+
+COMPRESSION = 'zstd'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Necesitas 'pyarrow'. Instálalo con: pip install pyarrow")
+
+
+def parquet_path(path: str) -> str:
+    """Ruta del .parquet hermano (mismo nombre, otra extensión; sin la de compresión)"""
+    return os.path.splitext(strip_compression(path))[0] + '.parquet'
+
+
+def prefer_parquet(path: str, verbose: bool = True) -> str:
+    """
+    Devuelve el .parquet hermano de `path` si existe y está al día; si no, `path`
+
+    Sin pyarrow instalado, o si el original es más nuevo que el .parquet
+    (se regeneró y no se volvió a convertir), se usa el original.
+    """
+    if pa is None or path.endswith('.parquet'):
+        return path
+    columnar = parquet_path(path)
+    if not os.path.exists(columnar):
+        return path
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(columnar):
+        if verbose:
+            print(f"  ⚠️  {columnar} es más viejo que {path}; se lee el original")
+        return path
+    if verbose:
+        print(f"  📦 Leyendo la versión columnar: {columnar}")
+    return columnar
+
+
+def _encode_dictionaries(table: 'pa.Table') -> 'pa.Table':
+    """Pasa a diccionario las columnas de texto de DICTIONARY_COLUMNS"""
+    for index, field in enumerate(table.schema):
+        if field.name in DICTIONARY_COLUMNS and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            table = table.set_column(index, field.name, table.column(index).dictionary_encode())
+    return table
+
+
+def _with_metadata(table: 'pa.Table', description: Dict) -> 'pa.Table':
+    metadata = dict(table.schema.metadata or {})
+    metadata[_METADATA_KEY] = json.dumps(description, ensure_ascii=False).encode('utf-8')
+    return table.replace_schema_metadata(metadata)
+
+
+def _description(path: str) -> Dict:
+    metadata = pq.read_schema(path).metadata or {}
+    if _METADATA_KEY not in metadata:
+        return {'formato': 'tabla'}
+    return json.loads(metadata[_METADATA_KEY])
+
+
+def write_dataframe(df: pd.DataFrame, path: str, formato: str = 'tabla'):
+    """Escribe un DataFrame (p. ej. tripletas) con las columnas de DICTIONARY_COLUMNS como diccionario"""
+    _require_pyarrow()
+    table = _encode_dictionaries(pa.Table.from_pandas(df, preserve_index=False))
+    pq.write_table(_with_metadata(table, {'formato': formato}), path, compression=COMPRESSION)
+
+
+def _schema_of(rows: Callable[[], Iterator[Dict]], chunk_size: int) -> Optional['pa.Schema']:
+    """
+    Esquema de todas las filas: la unión de los campos de todos los bloques
+
+    Un campo que aparece recién en una fila o un bloque posterior también
+    entra; lo que no se pudo inferir (siempre null) queda como texto. None si no hay filas.
+
+    Raises:
+        ValueError: si un campo tiene tipos incompatibles (p. ej. número y texto)
+    """
+    schema = None
+    for chunk in iter_chunks(rows(), chunk_size):
+        try:
+            # pa.array junta las claves de todos los dicts (from_pylist mira solo el primero)
+            chunk_schema = pa.schema(list(pa.array(chunk).type))
+            schema = chunk_schema if schema is None else pa.unify_schemas([schema, chunk_schema])
+        except (pa.ArrowTypeError, pa.ArrowInvalid) as e:
+            raise ValueError(f"Un campo tiene tipos incompatibles entre filas: {e}") from e
+    if schema is None:
+        return None
+    return pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+
+
+def _write_rows(rows: Callable[[], Iterator[Dict]], path: str, description: Dict, chunk_size: int) -> int:
+    """
+    Escribe filas por bloques (memoria acotada)
+
+    `rows` se llama dos veces: una pasada para el esquema de todas las filas
+    (ver _schema_of) y otra para escribirlas.
+    """
+    schema = _schema_of(rows, chunk_size)
+    if schema is None:
+        # Dataset vacío: archivo sin columnas, pero con la descripción
+        pq.write_table(_with_metadata(pa.table({}), description), path, compression=COMPRESSION)
+        return 0
+    writer = None
+    n = 0
+    try:
+        for chunk in iter_chunks(rows(), chunk_size):
+            table = _encode_dictionaries(pa.Table.from_pylist(chunk, schema=schema))
+            if writer is None:
+                writer = pq.ParquetWriter(path, _with_metadata(table, description).schema, compression=COMPRESSION)
+            writer.write_table(table.cast(writer.schema))
+            n += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def _grouped_rows(data: Dict[str, Any], list_key: str, entity_fields: List[str]) -> Iterator[Dict]:
+    entity_n = 0
+    for group, entities in data.items():
+        for entity in entities:
+            base = {_GROUP: group, _ENTITY_N: entity_n}
+            base.update({field: entity.get(field) for field in entity_fields if field != list_key})
+            items = entity.get(list_key) or []
+            if not items:
+                # Entidad sin items: una fila sin campos de item para no perderla
+                yield {**base, _ITEM_N: -1}
+            for item_n, item in enumerate(items):
+                yield {**base, _ITEM_N: item_n, **item}
+            entity_n += 1
+
+
+def _grouped_layout(data: Dict[str, Any]) -> Optional[Dict]:
+    """Describe un subset agrupado, o None si el objeto no tiene esa forma"""
+    list_key = None
+    entity_fields = []
+    item_fields = []
+    for entities in data.values():
+        if not isinstance(entities, list):
+            return None
+        for entity in entities:
+            if not isinstance(entity, dict):
+                return None
+            for field, value in entity.items():
+                if isinstance(value, list) and all(isinstance(v, dict) for v in value):
+                    if list_key not in (None, field):
+                        return None
+                    list_key = field
+                    if field not in entity_fields:
+                        entity_fields.append(field)
+                    for item in value:
+                        item_fields.extend(k for k in item if k not in item_fields)
+                elif field not in entity_fields:
+                    entity_fields.append(field)
+    if list_key is None:
+        return None
+    # campos_entidad conserva el orden de las claves, la lista incluida
+    repeated = set(entity_fields) & set(item_fields) | {_GROUP, _ENTITY_N, _ITEM_N} & set(entity_fields + item_fields)
+    if repeated:
+        raise ValueError(f"Campos repetidos entre entidad e items: {sorted(repeated)}")
+    return {'formato': 'agrupado', 'grupos': list(data), 'clave_lista': list_key,
+            'campos_entidad': entity_fields, 'campos_item': item_fields}
+
+
+def json_to_parquet(path: str, output: Optional[str] = None, chunk_size: int = 50000) -> str:
+    """
+    Convierte un dataset JSON/JSONL, comprimido o no (lista plana o subset agrupado), a Parquet
+
+    Las listas planas se leen en streaming; los subsets agrupados se cargan
+    enteros (son pequeños). Devuelve la ruta escrita.
+    """
+    _require_pyarrow()
+    output = output or parquet_path(path)
+    if is_flat(path):
+        n = _write_rows(lambda: iter_records(path), output, {'formato': 'plano'}, chunk_size)
+    else:
+        data = load_dataset(path)
+        layout = _grouped_layout(data)
+        if layout is None:
+            raise ValueError(f"{path}: formato no soportado (se espera lista de items o {{grupo: [entidades]}})")
+        n = _write_rows(lambda: _grouped_rows(data, layout['clave_lista'], layout['campos_entidad']),
+                        output, layout, chunk_size)
+    print(f"  ✓ {path} → {output} ({n:,} filas)")
+    return output
+
+
+def csv_to_parquet(path: str, output: Optional[str] = None, encoding: str = 'utf-8', sep: str = ',') -> str:
+    """Convierte un CSV de tripletas (entidad, relacion, valor, *_qid) a Parquet"""
+    df = pd.read_csv(path, index_col=False, encoding=encoding, sep=sep, on_bad_lines='skip')
+    output = output or parquet_path(path)
+    write_dataframe(df, output, 'tripletas')
+    print(f"  ✓ {path} → {output} ({len(df):,} tripletas)")
+    return output
+
+
+def read_triples(path: str, columns: Optional[List[str]] = None, **read_csv_kwargs) -> pd.DataFrame:
+    """Tripletas como DataFrame, desde Parquet (entidad/relacion como 'category') o CSV"""
+    if path.endswith('.parquet'):
+        _require_pyarrow()
+        return pq.read_table(path, columns=columns).to_pandas()
+    read_csv_kwargs.setdefault('index_col', False)
+    return pd.read_csv(path, usecols=columns, **read_csv_kwargs)
+
+
+def iter_triples(path: str, columns: Optional[List[str]] = None, chunk_size: int = 100000,
+                 **read_csv_kwargs) -> Iterator[pd.DataFrame]:
+    """Tripletas por bloques de `chunk_size` filas, desde Parquet o CSV (memoria acotada)"""
+    if path.endswith('.parquet'):
+        _require_pyarrow()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    read_csv_kwargs.setdefault('index_col', False)
+    yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size, **read_csv_kwargs)
+
+
+def write_dataframes(frames: Iterator[pd.DataFrame], path: str, formato: str = 'tabla') -> int:
+    """Escribe bloques de DataFrame (mismas columnas) en un Parquet, uno por vez; devuelve las filas"""
+    _require_pyarrow()
+    writer = None
+    n = 0
+    try:
+        for df in frames:
+            table = _encode_dictionaries(pa.Table.from_pandas(df, preserve_index=False))
+            if writer is None:
+                writer = pq.ParquetWriter(path, _with_metadata(table, {'formato': formato}).schema,
+                                          compression=COMPRESSION)
+            writer.write_table(table.cast(writer.schema))
+            n += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(_with_metadata(pa.table({}), {'formato': formato}), path, compression=COMPRESSION)
+    return n
+
+
+def iter_parquet_records(path: str, batch_size: int = 10000) -> Iterator[Dict]:
+    """Filas de un Parquet como diccionarios, por lotes (memoria acotada)"""
+    _require_pyarrow()
+    internal = {_GROUP, _ENTITY_N, _ITEM_N}
+    parquet = pq.ParquetFile(path)
+    columns = [name for name in parquet.schema_arrow.names if name not in internal]
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+def _column_lists(table: 'pa.Table') -> Dict[str, List]:
+    """Columnas como listas; las de diccionario se decodifican una vez por valor distinto"""
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_dictionary(column.type):
+            values = []
+            for chunk in column.chunks:
+                dictionary = chunk.dictionary.to_pylist()
+                values.extend(None if i is None else dictionary[i] for i in chunk.indices.to_pylist())
+            columns[name] = values
+        else:
+            columns[name] = column.to_pylist()
+    return columns
+
+
+def _rows(columns: Dict[str, List], fields: List[str], indices: Iterator[int]) -> Iterator[Dict]:
+    """Filas (sin los campos null) de las columnas dadas"""
+    present = [(field, columns[field]) for field in fields if field in columns]
+    for i in indices:
+        yield {field: values[i] for field, values in present if values[i] is not None}
+
+
+def load_json(path: str) -> Any:
+    """
+    Lo mismo que json.load sobre el original, venga de JSON, JSONL (ver
+    comun.io_datos.load_dataset) o Parquet
+
+    Un Parquet plano vuelve como lista de dicts; uno agrupado, como
+    {grupo: [{entidad..., clave_lista: [items]}]} en el orden original.
+    Los campos ausentes (o null) en el original no aparecen.
+    """
+    if not path.endswith('.parquet'):
+        return load_dataset(path)
+    _require_pyarrow()
+    description = _description(path)
+    table = pq.read_table(path)
+    if description.get('formato') != 'agrupado':
+        if any(column.null_count for column in table.columns):
+            return list(_rows(_column_lists(table), table.column_names, range(table.num_rows)))
+        # Sin nulls (lo habitual): pyarrow arma los dicts, más rápido con las columnas sin diccionario
+        plain = pa.schema([field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                           for field in table.schema])
+        return table.cast(plain).to_pylist()
+
+    columns = _column_lists(table)
+
+    list_key = description['clave_lista']
+    entity_fields = description['campos_entidad']
+    data = {group: [] for group in description['grupos']}
+    groups, entity_ns, item_ns = columns[_GROUP], columns[_ENTITY_N], columns[_ITEM_N]
+    items = _rows(columns, description['campos_item'], range(table.num_rows))
+    current_n = None
+    entity = None
+    for i, item in enumerate(items):
+        if entity_ns[i] != current_n:
+            current_n = entity_ns[i]
+            entity = {}
+            for field in entity_fields:
+                if field == list_key:
+                    entity[field] = []
+                elif columns[field][i] is not None:
+                    entity[field] = columns[field][i]
+            data[groups[i]].append(entity)
+        if item_ns[i] >= 0:
+            entity[list_key].append(item)
+    return data
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ruta rápida (opcional) con torch.compile para el lens y la generación greedy.
+
+Las formas en nuestras cargas se repiten mucho (prompts de completion cortos,
+número de capas fijo), así que conviene compilar con formas estáticas:
+
+  - CompiledLens: un forward con output_hidden_states que devuelve, para el
+    último token y cada capa, la probabilidad del primer token de la respuesta
+    y la probabilidad top-1 (lo mismo que 1_analizar_trayectorias calcula con
+    los wrappers, pero desembebiendo solo la última posición). Los prompts se
+    rellenan a la izquierda hasta un múltiplo de `bucket` y los batches se
+    completan hasta `batch_size`: cada bucket compila una sola vez.
+  - StaticCacheGenerator: greedy con StaticCache de tamaño fijo. El paso de
+    decodificación (la parte caliente) se compila una vez, con forma
+    [1, 1]; el prefill corre en eager para no recompilar por largo de prompt.
+
+Ambas clases aceptan compile=False para comparar contra la misma ruta sin
+compilar (ver benchmarks/bench_compilado.py).
+"""
+
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import torch
+
+try:
+    from transformers import StaticCache
+except ImportError:
+    StaticCache = None
+
+
+def bucket_length(length: int, bucket: int) -> int:
+    """Redondea un largo hacia arriba al múltiplo de `bucket`"""
+    return max(bucket, ((length + bucket - 1) // bucket) * bucket)
+
+
+class CompiledLens:
+    """Probabilidades por capa en el último token, con formas estáticas por bucket"""
+
+    def __init__(self, model, tokenizer, bucket: int = 32, batch_size: int = 1, compile: bool = True):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.device = next(model.parameters()).device
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        self._forward = torch.compile(self._lens, dynamic=False) if compile else self._lens
+        self.compiled_shapes = set()
+        self.stats = {'calls': 0, 'warmup_seconds': 0.0, 'seconds': 0.0}
+
+    def _lens(self, input_ids, attention_mask, position_ids, target_ids):
+        base = self.model.model
+        out = base(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                   output_hidden_states=True, use_cache=False)
+        # hidden_states[i + 1] es la salida cruda de la capa i; la de la última capa
+        # ya viene normalizada en last_hidden_state
+        last = [base.norm(h[:, -1]) for h in out.hidden_states[1:-1]] + [out.last_hidden_state[:, -1]]
+        logits = self.model.lm_head(torch.stack(last, dim=1)).float()   # [B, capas, vocab]
+        probs = torch.softmax(logits, dim=-1)
+        target_probs = probs.gather(-1, target_ids[:, None, None].expand(-1, probs.shape[1], 1)).squeeze(-1)
+        return target_probs, probs.max(dim=-1).values
+
+    def trajectories(self, prompt_ids: List[List[int]], target_ids: List[int]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Args:
+            prompt_ids: Prompts tokenizados
+            target_ids: Primer token de la respuesta de cada prompt
+
+        Returns:
+            (prob_respuesta, prob_top1), ambos de forma [n_prompts, capas] en CPU
+        """
+        target_out, top_out = [], []
+        for start in range(0, len(prompt_ids), self.batch_size):
+            batch = prompt_ids[start:start + self.batch_size]
+            targets = target_ids[start:start + self.batch_size]
+            n = len(batch)
+            # Completar el batch repitiendo la primera fila: la forma no cambia nunca
+            batch = batch + [batch[0]] * (self.batch_size - n)
+            targets = targets + [targets[0]] * (self.batch_size - n)
+
+            length = bucket_length(max(len(ids) for ids in batch), self.bucket)
+            input_ids = torch.full((self.batch_size, length), self.pad_token_id, dtype=torch.long)
+            mask = torch.zeros((self.batch_size, length), dtype=torch.long)
+            for row, ids in enumerate(batch):
+                input_ids[row, length - len(ids):] = torch.tensor(ids, dtype=torch.long)
+                mask[row, length - len(ids):] = 1
+            position_ids = (mask.cumsum(-1) - 1).clamp(min=0)
+
+            begin = time.perf_counter()
+            with torch.no_grad():
+                target_probs, top_probs = self._forward(
+                    input_ids.to(self.device), mask.to(self.device), position_ids.to(self.device),
+                    torch.tensor(targets, dtype=torch.long, device=self.device))
+            elapsed = time.perf_counter() - begin
+            # La primera llamada de cada forma incluye la compilación
+            if length in self.compiled_shapes:
+                self.stats['seconds'] += elapsed
+                self.stats['calls'] += 1
+            else:
+                self.compiled_shapes.add(length)
+                self.stats['warmup_seconds'] += elapsed
+
+            target_out.append(target_probs[:n].cpu())
+            top_out.append(top_probs[:n].cpu())
+        return torch.cat(target_out), torch.cat(top_out)
+
+
+class StaticCacheGenerator:
+    """Greedy con StaticCache y el paso de decodificación compilado"""
+
+    def __init__(self, model, tokenizer, max_new_tokens: int = 200, bucket: int = 32,
+                 compile: bool = True, eos_token_ids: Optional[Iterable[int]] = None):
+        if StaticCache is None:
+            raise ImportError("Esta versión de transformers no tiene StaticCache.")
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens
+        self.bucket = bucket
+        self.device = next(model.parameters()).device
+        self.dtype = next(model.parameters()).dtype
+
+        if eos_token_ids is None:
+            eos_token_ids = getattr(model.generation_config, 'eos_token_id', None)
+            if eos_token_ids is None:
+                eos_token_ids = tokenizer.eos_token_id
+        if isinstance(eos_token_ids, int):
+            eos_token_ids = [eos_token_ids]
+        self.eos_token_ids = set(eos_token_ids or [])
+
+        self._decode = torch.compile(self._decode_step, dynamic=False) if compile else self._decode_step
+        self.cache = None
+        self.cache_len = 0
+        self._warm = False
+        self.stats = {}
+
+    def _decode_step(self, token, cache_position):
+        out = self.model(input_ids=token, cache_position=cache_position, position_ids=cache_position.unsqueeze(0),
+                         past_key_values=self.cache, use_cache=True)
+        return out.logits[:, -1, :].argmax(dim=-1, keepdim=True)
+
+    def _ensure_cache(self, max_prompt_len: int):
+        # Largo fijo por bucket: mientras no crezca, el grafo compilado se reutiliza
+        needed = bucket_length(max_prompt_len, self.bucket) + self.max_new_tokens
+        if self.cache is None or needed > self.cache_len:
+            self.cache = StaticCache(config=self.model.config, max_batch_size=1, max_cache_len=needed,
+                                     device=self.device, dtype=self.dtype)
+            self.cache_len = needed
+            self._warm = False
+
+    def generate_one_ids(self, ids: List[int]) -> List[int]:
+        self.cache.reset()
+        input_ids = torch.tensor([ids], dtype=torch.long, device=self.device)
+        positions = torch.arange(len(ids), device=self.device)
+        with torch.no_grad():
+            out = self.model(input_ids=input_ids, cache_position=positions, position_ids=positions.unsqueeze(0),
+                             past_key_values=self.cache, use_cache=True)
+        token = out.logits[:, -1, :].argmax(dim=-1, keepdim=True)
+        tokens = [int(token)]
+
+        position = len(ids)
+        while tokens[-1] not in self.eos_token_ids and len(tokens) < self.max_new_tokens:
+            begin = time.perf_counter()
+            with torch.no_grad():
+                token = self._decode(token, torch.tensor([position], device=self.device))
+            elapsed = time.perf_counter() - begin
+            if not self._warm:
+                # El primer paso con un caché nuevo incluye la compilación
+                self.stats['warmup_seconds'] += elapsed
+                self._warm = True
+            else:
+                self.stats['decode_steps'] += 1
+                self.stats['decode_seconds'] += elapsed
+            tokens.append(int(token))
+            position += 1
+        return tokens
+
+    def generate_ids(self, prompt_ids: List[List[int]]) -> List[List[int]]:
+        """Genera para prompts tokenizados; devuelve los tokens nuevos de cada uno"""
+        self.stats = {'decode_steps': 0, 'decode_seconds': 0.0, 'warmup_seconds': 0.0}
+        self._ensure_cache(max(len(ids) for ids in prompt_ids))
+        start = time.perf_counter()
+        outputs = [self.generate_one_ids(ids) for ids in prompt_ids]
+        elapsed = time.perf_counter() - start
+        new_tokens = sum(len(tokens) for tokens in outputs)
+        self.stats.update({
+            'seconds': elapsed,
+            'new_tokens': new_tokens,
+            'tokens_per_second': new_tokens / elapsed if elapsed > 0 else 0.0,
+            'ms_per_decode_step': (1000 * self.stats['decode_seconds'] / self.stats['decode_steps']
+                                   if self.stats['decode_steps'] else 0.0),
+        })
+        return outputs
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Genera para textos (con el chat template ya aplicado)"""
+        prompt_ids = [self.tokenizer(text)['input_ids'] for text in prompts]
+        outputs = self.generate_ids(prompt_ids)
+        return [
+            self.tokenizer.decode(
+                [t for t in tokens if t not in self.eos_token_ids],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=False,
+            ).strip()
+            for tokens in outputs
+        ]
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Decodificación especulativa (greedy) con un modelo borrador pequeño.
+
+En cada ronda el borrador propone k tokens, uno por paso (barato), y el modelo
+grande los verifica todos en un único forward. Se aceptan los tokens del
+borrador mientras coinciden con el argmax del modelo grande; en el primer
+desacuerdo se toma el token del modelo grande y se descarta el resto. Si se
+aceptan los k, el mismo forward da un token extra. Los cachés KV de ambos
+modelos se recortan a la parte aceptada.
+
+Como todo token emitido es el argmax del modelo grande dado el prefijo ya
+emitido, la salida es idéntica a la de greedy sin borrador; solo cambia
+cuántos forwards del modelo grande hacen falta.
+
+Requiere que ambos modelos compartan el vocabulario. Ojo: TinyLlama usa el
+tokenizer de Llama 2 (32000 tokens) y no sirve de borrador para Llama 3.1;
+para meta-llama/Meta-Llama-3.1-8B-Instruct el par natural es
+meta-llama/Llama-3.2-1B-Instruct.
+"""
+
+import time
+from typing import Iterable, List, Optional
+
+import torch
+
+from comun.batching_continuo import crop_cache
+
+
+def _same_vocabulary(tokenizer, draft_tokenizer) -> bool:
+    if draft_tokenizer is None or draft_tokenizer is tokenizer:
+        return True
+    try:
+        return tokenizer.get_vocab() == draft_tokenizer.get_vocab()
+    except (AttributeError, NotImplementedError):
+        return len(tokenizer) == len(draft_tokenizer)
+
+
+class SpeculativeDecoder:
+    """Generación greedy asistida por un modelo borrador (un prompt a la vez)"""
+
+    def __init__(self, model, draft_model, tokenizer, num_draft_tokens: int = 5,
+                 max_new_tokens: int = 200, eos_token_ids: Optional[Iterable[int]] = None,
+                 draft_tokenizer=None):
+        """
+        Args:
+            model: Modelo a evaluar (verifica)
+            draft_model: Modelo borrador (propone)
+            tokenizer: Tokenizer del modelo a evaluar
+            num_draft_tokens: Tokens propuestos por ronda (k)
+            max_new_tokens: Máximo de tokens nuevos por prompt
+            eos_token_ids: Tokens de fin (default: generation_config del modelo)
+            draft_tokenizer: Tokenizer del borrador, solo para validar el vocabulario
+        """
+        if not _same_vocabulary(tokenizer, draft_tokenizer):
+            raise ValueError("El modelo borrador no comparte el vocabulario del modelo a evaluar.")
+        self.model = model
+        self.draft_model = draft_model
+        self.tokenizer = tokenizer
+        self.num_draft_tokens = num_draft_tokens
+        self.max_new_tokens = max_new_tokens
+        self.device = next(model.parameters()).device
+        self.draft_device = next(draft_model.parameters()).device
+
+        if eos_token_ids is None:
+            eos_token_ids = getattr(model.generation_config, 'eos_token_id', None)
+            if eos_token_ids is None:
+                eos_token_ids = tokenizer.eos_token_id
+        if isinstance(eos_token_ids, int):
+            eos_token_ids = [eos_token_ids]
+        self.eos_token_ids = set(eos_token_ids or [])
+
+        self.stats = {}
+
+    def _forward(self, model, device, ids: List[int], cache):
+        input_ids = torch.tensor([ids], dtype=torch.long, device=device)
+        with torch.no_grad():
+            out = model(input_ids=input_ids, past_key_values=cache, use_cache=True)
+        return out.logits[0], out.past_key_values
+
+    def _finish(self, tokens: List[int], new: List[int]) -> bool:
+        """Agrega los tokens nuevos cortando en EOS / max_new_tokens; True si terminó"""
+        for token in new:
+            tokens.append(token)
+            if token in self.eos_token_ids or len(tokens) >= self.max_new_tokens:
+                return True
+        return False
+
+    def generate_one_ids(self, prompt_ids: List[int]) -> List[int]:
+        """Genera para un prompt tokenizado; devuelve los tokens nuevos"""
+        # Prefill: el último token de la secuencia queda siempre pendiente
+        # (todavía no está en el caché del modelo grande)
+        logits, cache = self._forward(self.model, self.device, prompt_ids, None)
+        self.stats['target_forwards'] += 1
+        tokens = []
+        if self._finish(tokens, [int(logits[-1].argmax())]):
+            return tokens
+        sequence = list(prompt_ids) + tokens
+
+        draft_cache = None
+        draft_len = 0  # tokens de `sequence` que ya están en el caché del borrador
+
+        while True:
+            k = min(self.num_draft_tokens, self.max_new_tokens - len(tokens))
+
+            # 1) El borrador propone k tokens
+            proposal = []
+            pending = sequence[draft_len:]
+            for _ in range(k):
+                draft_logits, draft_cache = self._forward(self.draft_model, self.draft_device, pending, draft_cache)
+                proposal.append(int(draft_logits[-1].argmax()))
+                pending = proposal[-1:]
+            # El último token propuesto nunca entra al caché del borrador
+            draft_len = len(sequence) + k - 1
+
+            # 2) El modelo grande verifica todo en un forward: [pendiente] + propuesta
+            logits, cache = self._forward(self.model, self.device, sequence[-1:] + proposal, cache)
+            self.stats['target_forwards'] += 1
+            verified = logits.argmax(dim=-1).tolist()
+
+            accepted = 0
+            while accepted < k and proposal[accepted] == verified[accepted]:
+                accepted += 1
+            self.stats['drafted_tokens'] += k
+            self.stats['accepted_tokens'] += accepted
+
+            # Aceptados + corrección (o token extra si se aceptó todo)
+            new = proposal[:accepted] + [verified[accepted]]
+            cache = crop_cache(cache, len(sequence) + accepted)
+            draft_len = min(draft_len, len(sequence) + accepted)
+            draft_cache = crop_cache(draft_cache, draft_len)
+
+            done = self._finish(tokens, new)
+            sequence = list(prompt_ids) + tokens
+            if done:
+                return tokens
+
+    def generate_ids(self, prompt_ids: List[List[int]]) -> List[List[int]]:
+        """Genera para varios prompts tokenizados (de a uno)"""
+        self.stats = {'target_forwards': 0, 'drafted_tokens': 0, 'accepted_tokens': 0}
+        start = time.perf_counter()
+        outputs = [self.generate_one_ids(ids) for ids in prompt_ids]
+        elapsed = time.perf_counter() - start
+        new_tokens = sum(len(tokens) for tokens in outputs)
+        self.stats.update({
+            'seconds': elapsed,
+            'new_tokens': new_tokens,
+            'tokens_per_second': new_tokens / elapsed if elapsed > 0 else 0.0,
+            'acceptance_rate': (self.stats['accepted_tokens'] / self.stats['drafted_tokens']
+                                if self.stats['drafted_tokens'] else 0.0),
+            'tokens_per_target_forward': (new_tokens / self.stats['target_forwards']
+                                          if self.stats['target_forwards'] else 0.0),
+        })
+        return outputs
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        """Genera para textos (con el chat template ya aplicado)"""
+        prompt_ids = [self.tokenizer(text)['input_ids'] for text in prompts]
+        outputs = self.generate_ids(prompt_ids)
+        return [
+            self.tokenizer.decode(
+                [t for t in tokens if t not in self.eos_token_ids],
+                skip_special_tokens=True,
+                clean_up_tokenization_spaces=False,
+            ).strip()
+            for tokens in outputs
+        ]
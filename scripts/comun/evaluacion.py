@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Driver de evaluación común a todos los backends de generación.
+
+Aplica el chat template, consulta la caché de generaciones, genera solo lo que
+falta con el backend elegido y calcula las métricas de texto. El formato de
+salida de cada script no depende del backend.
+"""
+
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from comun.cache_generacion import GenerationCache
+from comun.metricas import f1_score_batch, substring_accuracy_batch
+
+
+def generate_predictions(backend, prompts: List[str], cache: Optional[GenerationCache] = None,
+                         chunk_size: int = 256,
+                         on_ready: Optional[Callable[[List[Tuple[int, str]]], None]] = None) -> List[str]:
+    """
+    Genera una predicción por prompt, reutilizando la caché cuando es posible
+
+    Args:
+        backend: Instancia de comun.backends.GenerationBackend
+        prompts: Prompts sin chat template
+        cache: Caché de generaciones (None = sin caché)
+        chunk_size: Prompts por llamada al backend
+        on_ready: Se llama con [(índice, predicción), ...] apenas hay predicciones
+            listas: primero las de la caché y luego las de cada bloque generado
+
+    Returns:
+        Lista de predicciones en el mismo orden que los prompts
+    """
+    chat_prompts = [backend.build_prompt(prompt) for prompt in prompts]
+    decoding = backend.decoding_params()
+    # El nombre del backend va en la clave: cada motor tiene sus propias entradas
+    keys = [GenerationCache.make_key(backend.model_id, backend.dtype, text, decoding, backend.name)
+            for text in chat_prompts]
+
+    cached = cache.get_many(keys) if cache is not None else {}
+    predictions = [cached.get(key) for key in keys]
+    pending = [i for i, key in enumerate(keys) if key not in cached]
+    print(f"[{backend.name}] {len(cached)} de {len(keys)} predicciones encontradas en caché; "
+          f"{len(pending)} por generar")
+    if on_ready is not None and cached:
+        on_ready([(i, predictions[i]) for i, key in enumerate(keys) if key in cached])
+
+    # Por bloques: si el proceso se corta, lo ya generado queda en la caché
+    for start in range(0, len(pending), chunk_size):
+        block = pending[start:start + chunk_size]
+        generated = backend.generate([chat_prompts[i] for i in block])
+        for i, prediction in zip(block, generated):
+            predictions[i] = prediction
+        if cache is not None:
+            cache.put_many([(keys[i], predictions[i]) for i in block], model_id=backend.model_id)
+        if on_ready is not None:
+            on_ready([(i, predictions[i]) for i in block])
+
+    if cache is not None:
+        print(cache.summary())
+    return predictions
+
+
+def add_text_metrics(df: pd.DataFrame, prediction_col: str = 'prediction',
+                     ground_truth_col: str = 'ground_truth') -> pd.DataFrame:
+    """Agrega las columnas f1_score y substring_accuracy (modo 'regex')"""
+    df['f1_score'] = f1_score_batch(df[prediction_col], df[ground_truth_col])
+    df['substring_accuracy'] = substring_accuracy_batch(df[prediction_col], df[ground_truth_col])
+    return df
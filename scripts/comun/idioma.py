@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Filtro por idioma de la columna 'valor' de las tripletas, con caché.
+
+Los mezcladores de CSV (gen_dataset/1_merge_csv.py, merge_paises.py,
+merge_tomy.py, merge_usa.py) llamaban a langdetect.detect fila por fila con
+df['valor'].apply(...): lento, distinto en cada corrida (langdetect es
+aleatorio si no se fija la semilla) y repetido para los miles de valores
+iguales ("español", "Chile", "Estados Unidos"). Aquí:
+
+  - se detecta cada valor distinto una sola vez,
+  - los casos obvios no pasan por langdetect: sin letras (fechas, números,
+    códigos) no hay idioma; con varias palabras vacías de un solo idioma
+    ("el", "los", "del" / "the", "of", "and") se toma ese idioma,
+  - el resto se reparte en bloques entre procesos (comun.paralelo) con la
+    semilla fija, así el resultado es el mismo en serie o en paralelo y de
+    una corrida a otra,
+  - lo detectado se guarda en un JSON (texto -> código de idioma) que se
+    reusa en las corridas siguientes y entre los scripts.
+
+Para muchos bloques de filas (comun.mezcla_csv) LanguageFilter mantiene el
+caché en memoria entre bloques y lo guarda al final.
+
+    mask = language_mask(df['valor'], 'es', cache_path='cache_idioma.json', workers=4)
+    df_es = df[mask]
+"""
+
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from comun.io_datos import iter_chunks
+from comun.paralelo import map_chunks_ordered
+
+# Semilla de langdetect (DetectorFactory.seed)
+SEED = 0
+
+# Cambia si cambia la forma de detectar (invalida los cachés guardados)
+CACHE_VERSION = 1
+
+# Valores distintos por bloque enviado a cada proceso
+CHUNK_SIZE = 2000
+
+# Palabras vacías que casi no aparecen en el otro idioma de los datasets
+PALABRAS_VACIAS = {
+    'es': frozenset({'el', 'los', 'las', 'del', 'y', 'por', 'para', 'con', 'una', 'su', 'sus', 'al', 'entre',
+                     'sobre', 'como', 'desde', 'hasta', 'sin', 'muy', 'también', 'según'}),
+    'en': frozenset({'the', 'of', 'and', 'with', 'for', 'from', 'by', 'his', 'her', 'its', 'their', 'is', 'are',
+                     'was', 'were', 'which', 'who', 'this', 'that', 'between', 'into'}),
+}
+
+_RE_PALABRA = re.compile(r"[^\W\d_]+")
+
+
+def guess_language(texto: str) -> Optional[str]:
+    """
+    Idioma de los casos obvios, sin langdetect
+
+    Returns:
+        '' si el texto no tiene letras (langdetect no puede detectarlo),
+        'es' / 'en' si tiene al menos 2 palabras vacías de ese idioma y
+        ninguna del otro, None si hay que preguntarle a langdetect
+    """
+    palabras = _RE_PALABRA.findall(texto.lower())
+    if not palabras:
+        return ''
+    aciertos = {idioma: sum(p in vacias for p in palabras) for idioma, vacias in PALABRAS_VACIAS.items()}
+    candidatos = [idioma for idioma, n in aciertos.items() if n > 0]
+    if len(candidatos) == 1 and aciertos[candidatos[0]] >= 2:
+        return candidatos[0]
+    return None
+
+
+class LanguageDetector:
+    """langdetect con semilla fija, aplicable por bloques en un pool de procesos"""
+
+    def __init__(self, seed: int = SEED):
+        self.seed = seed
+
+    def detect_chunk(self, textos: List[str]) -> List[str]:
+        """Código de idioma de cada texto ('' si langdetect no puede detectarlo)"""
+        from langdetect import DetectorFactory, LangDetectException, detect
+        # Cada proceso del pool tiene su propia copia de DetectorFactory
+        DetectorFactory.seed = self.seed
+        idiomas = []
+        for texto in textos:
+            try:
+                idiomas.append(detect(texto))
+            except LangDetectException:
+                idiomas.append('')
+        return idiomas
+
+
+def load_cache(path: str, seed: int = SEED) -> Dict[str, str]:
+    """Caché {texto: idioma} guardado, si es de la misma versión y semilla; si no, vacío"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if payload.get('version') != CACHE_VERSION or payload.get('semilla') != seed:
+        return {}
+    return payload.get('idiomas', {})
+
+
+def save_cache(path: str, cache: Dict[str, str], seed: int = SEED):
+    """Guarda el caché {texto: idioma}"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    payload = {'version': CACHE_VERSION, 'semilla': seed, 'idiomas': cache}
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    # Reemplazo atómico: una corrida interrumpida no deja el caché a medias
+    os.replace(temporary, path)
+
+
+def detect_languages(textos: Iterable[str], cache: Dict[str, str], workers: int = 1,
+                     chunk_size: int = CHUNK_SIZE, seed: int = SEED) -> Dict[str, str]:
+    """
+    Idioma de cada texto distinto
+
+    Args:
+        textos: Textos (con repeticiones); se detecta cada uno una vez
+        cache: {texto: idioma} ya detectado; se le agrega lo que pase por langdetect
+        workers: Procesos para langdetect
+        chunk_size: Textos por bloque enviado a cada proceso
+        seed: Semilla de langdetect
+
+    Returns:
+        {texto: código de idioma ('' si no se pudo detectar)}
+    """
+    idiomas = {}
+    pendientes = []
+    heuristicos = 0
+    for texto in dict.fromkeys(textos):
+        if texto in cache:
+            idiomas[texto] = cache[texto]
+            continue
+        idioma = guess_language(texto)
+        if idioma is None:
+            pendientes.append(texto)
+        else:
+            idiomas[texto] = idioma
+            heuristicos += 1
+
+    print(f"  🔤 {len(idiomas) + len(pendientes):,} valores distintos: {len(idiomas) - heuristicos:,} en caché, "
+          f"{heuristicos:,} obvios, {len(pendientes):,} a langdetect")
+    if not pendientes:
+        return idiomas
+
+    detector = LanguageDetector(seed)
+    resultados = map_chunks_ordered(detector, 'detect_chunk', iter_chunks(pendientes, chunk_size), workers)
+    for bloque, detectados in zip(iter_chunks(pendientes, chunk_size), resultados):
+        for texto, idioma in zip(bloque, detectados):
+            idiomas[texto] = idioma
+            cache[texto] = idioma
+    return idiomas
+
+
+class LanguageFilter:
+    """Filtro por idioma con el caché en memoria, para aplicarlo a muchos bloques de filas"""
+
+    def __init__(self, idioma: str, min_len: int = 2, cache_path: Optional[str] = None, workers: int = 1,
+                 chunk_size: int = CHUNK_SIZE, seed: int = SEED):
+        """
+        Args:
+            idioma: Código de idioma que se conserva ('es', 'en', ...)
+            min_len: Largo mínimo (sin espacios a los lados); los más cortos se descartan
+            cache_path: JSON con lo ya detectado (None = sin caché persistente)
+            workers: Procesos para langdetect
+            chunk_size: Textos por bloque enviado a cada proceso
+            seed: Semilla de langdetect
+        """
+        self.idioma = idioma
+        self.min_len = min_len
+        self.cache_path = cache_path
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.cache = load_cache(cache_path, seed) if cache_path else {}
+        self._guardados = len(self.cache)
+
+    def mask(self, valores: pd.Series) -> pd.Series:
+        """
+        Máscara de las filas cuyo valor está en el idioma
+
+        Los valores que no son texto o son más cortos que min_len quedan
+        afuera sin detectar.
+        """
+        es_texto = valores.map(lambda v: isinstance(v, str))
+        candidatos = valores[es_texto]
+        candidatos = candidatos[candidatos.str.strip().str.len() >= self.min_len]
+        idiomas = detect_languages(candidatos.unique(), self.cache, self.workers, self.chunk_size, self.seed)
+        mask = pd.Series(False, index=valores.index)
+        mask[candidatos.index] = candidatos.map(idiomas).eq(self.idioma).to_numpy()
+        return mask
+
+    def save(self):
+        """Guarda el caché si se detectó algo nuevo"""
+        if self.cache_path and len(self.cache) > self._guardados:
+            save_cache(self.cache_path, self.cache, self.seed)
+            self._guardados = len(self.cache)
+            print(f"  💾 Caché de idiomas guardado en {self.cache_path} ({len(self.cache):,} valores)")
+
+
+def language_mask(valores: pd.Series, idioma: str, min_len: int = 2, cache_path: Optional[str] = None,
+                  workers: int = 1, chunk_size: int = CHUNK_SIZE, seed: int = SEED) -> pd.Series:
+    """Máscara de las filas cuyo valor está en `idioma` (ver LanguageFilter), guardando el caché"""
+    language_filter = LanguageFilter(idioma, min_len, cache_path, workers, chunk_size, seed)
+    mask = language_filter.mask(valores)
+    language_filter.save()
+    return mask
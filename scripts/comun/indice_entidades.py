@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de entidades por categoría construido desde los CSV, persistido en disco.
+
+SubsetExtractor leía cada CSV fila a fila con csv.DictReader, aplicaba las
+exclusiones entidad por entidad y se detenía a las 500 entidades: de
+cine_latam (151K) y landmarks_LATAM (103K) quedaba afuera casi todo, y el
+índice se rearmaba en cada corrida. Aquí cada CSV se lee por bloques con
+pandas (solo la columna 'entidad'), la normalización y las exclusiones se
+aplican sobre la columna entera, y el resultado {categoría: entidades
+normalizadas} se guarda en un JSON junto con la huella de los CSV de origen
+(ruta, tamaño y fecha de modificación) y de los parámetros. Si un CSV cambia,
+la huella no coincide y el índice se reconstruye solo.
+
+    index = load_or_build_index(csv_files, exclusions, 'indice_entidades.json')
+    index['movies']   # {'amores perros', 'la cienaga', ...}
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from comun.normalizacion import TABLA_ACENTOS, normalizar_entidad
+
+# Cambia si cambia la forma de construir el índice (invalida los guardados)
+INDEX_VERSION = 1
+
+# Filas de CSV leídas por bloque
+CHUNK_SIZE = 100000
+
+
+def fingerprint(csv_files: Dict[str, str], exclusions: Dict[str, List[str]],
+                max_entities: Optional[int] = None) -> Dict:
+    """Huella de los CSV de origen y de los parámetros con que se arma el índice"""
+    sources = {}
+    for category, path in csv_files.items():
+        try:
+            stat = os.stat(path)
+            sources[category] = [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            sources[category] = [os.path.abspath(path), None, None]
+    return {
+        'version': INDEX_VERSION,
+        'fuentes': sources,
+        'exclusiones': {category: sorted(words) for category, words in exclusions.items()},
+        'max_entidades': max_entities,
+    }
+
+
+def normalize_series(entities: pd.Series) -> pd.Series:
+    """normalizar_entidad sobre una columna entera"""
+    return entities.str.lower().str.strip().str.translate(TABLA_ACENTOS)
+
+
+def load_entities(csv_file: str, exclude: List[str] = (), max_entities: Optional[int] = None,
+                  chunk_size: int = CHUNK_SIZE, encoding: str = 'utf-8') -> Tuple[Set[str], int]:
+    """
+    Entidades normalizadas de un CSV, sin las que contienen palabras excluidas
+
+    Args:
+        csv_file: CSV con columna 'entidad' (una fila por tripleta)
+        exclude: Palabras que descartan la entidad si aparecen en ella (normalizada)
+        max_entities: Tope de entidades distintas (en orden de aparición); None = todas
+        chunk_size: Filas leídas por bloque
+
+    Returns:
+        (entidades normalizadas, filas excluidas)
+    """
+    pattern = '|'.join(re.escape(normalizar_entidad(word)) for word in exclude if normalizar_entidad(word))
+    seen = set()
+    index = set()
+    excluded = 0
+    reader = pd.read_csv(csv_file, usecols=['entidad'], dtype={'entidad': str},
+                         chunksize=chunk_size, encoding=encoding, on_bad_lines='skip')
+    for chunk in reader:
+        entities = chunk['entidad'].dropna().str.strip()
+        entities = entities[entities != '']
+        normalized = normalize_series(entities)
+        if pattern:
+            is_excluded = normalized.str.contains(pattern, regex=True)
+            excluded += int(is_excluded.sum())
+            entities, normalized = entities[~is_excluded], normalized[~is_excluded]
+
+        if max_entities is None:
+            index.update(normalized.unique())
+            continue
+        # Con tope: las primeras `max_entities` entidades distintas del archivo
+        for entity, entity_norm in zip(entities.drop_duplicates(), normalized[~entities.duplicated()]):
+            if entity not in seen:
+                seen.add(entity)
+                index.add(entity_norm)
+                if len(seen) >= max_entities:
+                    return index, excluded
+    return index, excluded
+
+
+def save_index(path: str, index: Dict[str, Set[str]], footprint: Dict):
+    """Guarda el índice con su huella"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    payload = {'huella': footprint, 'entidades': {category: sorted(entities) for category, entities in index.items()}}
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False)
+    # Reemplazo atómico: una corrida interrumpida no deja un índice a medias
+    os.replace(temporary, path)
+
+
+def load_index(path: str, footprint: Dict) -> Optional[Dict[str, Set[str]]]:
+    """El índice guardado si existe y su huella coincide; si no, None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if payload.get('huella') != footprint:
+        return None
+    return {category: set(entities) for category, entities in payload['entidades'].items()}
+
+
+def load_or_build_index(csv_files: Dict[str, str], exclusions: Dict[str, List[str]], cache_path: Optional[str],
+                        max_entities: Optional[int] = None, rebuild: bool = False,
+                        chunk_size: int = CHUNK_SIZE) -> Dict[str, Set[str]]:
+    """
+    Índice {categoría: entidades normalizadas}, desde el caché o desde los CSV
+
+    Args:
+        csv_files: {categoría: ruta del CSV}
+        exclusions: {categoría: palabras que excluyen una entidad}
+        cache_path: JSON donde se guarda el índice (None = no persistir)
+        max_entities: Tope por CSV (None = todas)
+        rebuild: Ignorar el caché aunque esté al día
+    """
+    footprint = fingerprint(csv_files, exclusions, max_entities)
+    if cache_path and not rebuild:
+        index = load_index(cache_path, footprint)
+        if index is not None:
+            print(f"  📦 Índice cargado de {cache_path} (los CSV no cambiaron)")
+            return index
+
+    index = {}
+    failed = False
+    for category, csv_file in csv_files.items():
+        print(f"  📄 Cargando {csv_file}...")
+        try:
+            entities, excluded = load_entities(csv_file, exclusions.get(category, []), max_entities, chunk_size)
+        except FileNotFoundError:
+            print(f"     ⚠️  Archivo no encontrado: {csv_file}")
+            index[category] = set()
+            continue
+        except Exception as e:
+            print(f"     ⚠️  Error: {e}")
+            index[category] = set()
+            failed = True
+            continue
+        msg = f"     ✓ {len(entities):,} entidades cargadas"
+        if excluded > 0:
+            msg += f" ({excluded:,} excluidas)"
+        print(msg)
+        index[category] = entities
+
+    # Un CSV que falta queda en la huella; uno ilegible no: ese índice no se guarda
+    if cache_path and not failed:
+        save_index(cache_path, index, footprint)
+        print(f"  💾 Índice guardado en {cache_path}")
+    return index
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lectura incremental de datasets y resultados.
+
+Los benchmarks y los volcados de evaluación pueden pesar varios GB; json.load
+los carga enteros en memoria. Aquí se leen registro a registro, con memoria
+constante, tanto si el archivo es un arreglo JSON (el formato de
+dataset_benchmark_qa.json) como si es JSONL (un objeto por línea), o su
+versión Parquet.
+
+    for item in iter_records('dataset_benchmark_qa.json'):
+        ...
+    for bloque in iter_chunks(iter_records(path), 5000):
+        ...
+
+write_json_frames escribe en el otro sentido: bloques de DataFrame con
+columnas de texto, como JSONL o como el arreglo JSON de json.dump(indent=4),
+sin tener el dataset entero en memoria.
+
+Cualquiera de estos archivos puede estar comprimido con gzip (.gz) o zstd
+(.zst, necesita 'zstandard'): al escribir se elige por la extensión y al
+leer se detecta por los primeros bytes. save_dataset / load_dataset guardan
+y cargan un dataset entero (lista plana o subset agrupado {grupo:
+[entidades]}) como JSON indentado o como JSONL; en JSONL el subset
+agrupado queda con una entidad por línea y el grupo en GROUP_KEY.
+
+    save_dataset(subset, 'subset_h2_final.jsonl.zst')
+    subset = load_dataset('subset_h2_final.jsonl.zst')   # el mismo dict
+"""
+
+import gzip
+import json
+import os
+import re
+from itertools import chain, islice
+from json.encoder import encode_basestring
+from typing import Any, Iterable, Iterator, List, Optional, TextIO
+
+# Caracteres leídos por vez al recorrer un arreglo JSON
+_READ_SIZE = 1 << 20
+
+_WHITESPACE = ' \t\n\r'
+
+_SEPARATORS = re.compile(r'[ \t\n\r,]*')
+
+# Extensión -> compresión (al escribir) y primeros bytes -> compresión (al leer)
+COMPRESSIONS = {'.gz': 'gzip', '.zst': 'zstd'}
+_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\x28\xb5\x2f\xfd', 'zstd'))
+
+# gzip: nivel 6 comprime casi lo mismo que 9 y bastante más rápido
+GZIP_LEVEL = 6
+
+# Campo con el grupo de cada entidad en un subset agrupado guardado como JSONL
+GROUP_KEY = '_grupo'
+# Campo con el valor de un grupo que no es una lista de entidades
+VALUE_KEY = '_valor'
+
+
+def strip_compression(path: str) -> str:
+    """La ruta sin la extensión de compresión (datos.jsonl.gz -> datos.jsonl)"""
+    for extension in COMPRESSIONS:
+        if path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+
+def is_jsonl(path: str) -> bool:
+    """True si la ruta es de un JSONL (comprimido o no)"""
+    return strip_compression(path).endswith('.jsonl')
+
+
+def _compression_of(path: str) -> Optional[str]:
+    """Compresión de un archivo existente, por sus primeros bytes"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, compression in _MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_text(path: str, mode: str = 'r') -> TextIO:
+    """
+    open(path, mode, encoding='utf-8') que comprime o descomprime si hace falta
+
+    Al escribir ('w', 'a') la compresión sale de la extensión (.gz, .zst);
+    al leer, de los primeros bytes del archivo, sin importar el nombre.
+    """
+    if mode.startswith('r'):
+        compression = _compression_of(path)
+    else:
+        compression = COMPRESSIONS.get(os.path.splitext(path)[1])
+    mode = mode.replace('t', '')
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Necesitas 'zstandard' para los .zst. Instálalo con: pip install zstandard")
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _iter_json_array(f, read_size: int = _READ_SIZE) -> Iterator:
+    """Recorre los elementos de un arreglo JSON sin cargarlo entero"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(read_size).lstrip(_WHITESPACE)
+    if not buffer.startswith('['):
+        raise ValueError("Se esperaba un arreglo JSON")
+    pos = 1
+    eof = False
+
+    while True:
+        # Saltar separadores hasta el próximo elemento
+        match = _SEPARATORS.match(buffer, pos)
+        pos = match.end()
+        if pos == len(buffer):
+            if eof:
+                return
+            # Se descarta lo ya consumido solo al leer más (no por elemento)
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Elemento incompleto: leer más y reintentar
+            if eof:
+                raise
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        # Un número o literal puede estar cortado ("12" de "123", "-7" de "-7.5"):
+        # solo vale si después viene un separador
+        if (not eof and not isinstance(item, (dict, list, str))
+                and (end == len(buffer) or buffer[end] not in _WHITESPACE + ',]')):
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+        pos = end
+
+
+def _first_char(path: str) -> str:
+    """Primer carácter no blanco del archivo ('' si está vacío)"""
+    # Se abre aparte: los archivos comprimidos no siempre permiten volver al inicio
+    with open_text(path) as f:
+        while True:
+            char = f.read(1)
+            if not char or char not in _WHITESPACE:
+                return char
+
+
+def is_json_array(path: str) -> bool:
+    """True si el archivo es un arreglo JSON (y no un objeto o JSONL)"""
+    return _first_char(path) == '['
+
+
+def is_flat(path: str) -> bool:
+    """True si el archivo es una lista plana de items (arreglo JSON o JSONL sin GROUP_KEY)"""
+    if is_json_array(path):
+        return True
+    if not is_jsonl(path):
+        return False
+    records = iter_records(path)
+    first = next(records, None)
+    records.close()
+    return not (isinstance(first, dict) and GROUP_KEY in first)
+
+
+def iter_records(path: str) -> Iterator:
+    """
+    Itera los registros de un archivo JSON (arreglo) o JSONL, comprimido o no
+
+    El formato se detecta por el primer carácter no blanco: '[' es un
+    arreglo JSON; cualquier otra cosa se lee como JSONL (se saltan líneas
+    vacías). Un .parquet (ver comun.columnar) se lee por lotes de filas.
+    """
+    if path.endswith('.parquet'):
+        from comun.columnar import iter_parquet_records
+        yield from iter_parquet_records(path)
+        return
+    first = _first_char(path)
+    with open_text(path) as f:
+        if first == '[':
+            yield from _iter_json_array(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def iter_chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    """Agrupa un iterable en listas de hasta `size` elementos"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _json_lines(df, indent: bool) -> List[str]:
+    """
+    Cada fila de un DataFrame de columnas de texto como objeto JSON
+
+    Se arma por columnas: cada valor pasa por el mismo escape que usa
+    json.dumps(ensure_ascii=False) y las claves y separadores se concatenan
+    sobre la columna entera. Con indent, igual que json.dump(..., indent=4)
+    dentro de un arreglo.
+    """
+    if indent:
+        start, separator, end = '    {\n        ', ',\n        ', '\n    }'
+    else:
+        start, separator, end = '{', ', ', '}'
+    lines = None
+    for i, column in enumerate(df.columns):
+        field = (separator if i else start) + encode_basestring(str(column)) + ': '
+        values = field + df[column].map(encode_basestring)
+        lines = values if lines is None else lines + values
+    if lines is None:
+        return ['{}'] * len(df)
+    return (lines + end).tolist()
+
+
+def write_json_frames(frames: Iterable, path: str) -> int:
+    """
+    Escribe bloques de DataFrame (columnas de texto, sin nulls) como JSON, uno por vez
+
+    Un .jsonl queda con un objeto por línea; cualquier otra extensión, como
+    el arreglo que escribe json.dump(registros, f, ensure_ascii=False,
+    indent=4) (mismos bytes). Con .gz / .zst al final se comprime.
+    Devuelve la cantidad de registros.
+    """
+    jsonl = is_jsonl(path)
+    n = 0
+    with open_text(path, 'w') as f:
+        if not jsonl:
+            f.write('[')
+        for df in frames:
+            if not len(df):
+                continue
+            lines = _json_lines(df, indent=not jsonl)
+            if jsonl:
+                f.write('\n'.join(lines) + '\n')
+            else:
+                f.write(('\n' if n == 0 else ',\n') + ',\n'.join(lines))
+            n += len(lines)
+        if not jsonl:
+            f.write('\n]' if n else ']')
+    return n
+
+
+def _dataset_records(data: Any) -> Iterator:
+    """Registros JSONL de un dataset: los items de una lista o una entidad por línea"""
+    if isinstance(data, list):
+        yield from data
+        return
+    for group, entities in data.items():
+        if not isinstance(entities, list):
+            # Valor suelto del grupo (no una lista de entidades)
+            yield {GROUP_KEY: group, VALUE_KEY: entities}
+        elif not entities:
+            # Grupo vacío: un registro con solo el grupo
+            yield {GROUP_KEY: group}
+        for entity in entities if isinstance(entities, list) else ():
+            yield {GROUP_KEY: group, **entity}
+
+
+def save_dataset(data: Any, path: str) -> int:
+    """
+    Guarda un dataset (lista plana o {grupo: [entidades]}) según la extensión
+
+    .jsonl (.jsonl.gz, .jsonl.zst): un registro por línea; los subsets
+    agrupados, una entidad por línea con su grupo en GROUP_KEY. Cualquier
+    otra: JSON con indent=4, como hacían los scripts (comprimido si termina
+    en .gz / .zst). Devuelve los registros escritos (o los items / grupos
+    del JSON).
+    """
+    with open_text(path, 'w') as f:
+        if not is_jsonl(path):
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            return len(data)
+        n = 0
+        for record in _dataset_records(data):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            n += 1
+    return n
+
+
+def load_dataset(path: str) -> Any:
+    """
+    Lo mismo que json.load sobre el original, venga de JSON o JSONL, comprimido o no
+
+    Un JSONL con GROUP_KEY vuelve como {grupo: [entidades]} en el orden
+    original; uno sin él, como lista de items.
+    """
+    if not is_jsonl(path):
+        with open_text(path) as f:
+            return json.load(f)
+    return dataset_from_records(iter_records(path))
+
+
+def dataset_from_records(records: Iterable) -> Any:
+    """Dataset de sus registros JSONL: {grupo: [entidades]} si traen GROUP_KEY, si no la lista"""
+    records = iter(records)
+    first = next(records, None)
+    if not (isinstance(first, dict) and GROUP_KEY in first):
+        return [] if first is None else [first, *records]
+
+    data = {}
+    for record in chain([first], records):
+        group = record.pop(GROUP_KEY)
+        if VALUE_KEY in record:
+            data[group] = record[VALUE_KEY]
+            continue
+        entities = data.setdefault(group, [])
+        if record:
+            entities.append(record)
+    return data
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modelo juez (Qwen2.5-7B-Instruct) y su modo en pipeline.
+
+En modo secuencial se genera todo y después se juzga todo. Con PipelinedJudge
+el juez corre en un worker aparte (hilo, o proceso 'spawn' si va en otro
+dispositivo o en CPU) y consume predicciones de una cola acotada mientras la
+generación sigue, así la latencia de una partición tiende a max(gen, juez) en
+vez de gen + juez.
+
+    juez = PipelinedJudge(token, device="cuda:1", worker="process")
+    juez.offer(i, prompt, prediccion, ground_truth)   # no bloquea
+    juez.submit(i, prompt, prediccion, ground_truth)  # bloquea si la cola está llena
+    resultados = juez.finish()                        # {i: (score, raw)}
+"""
+
+import json
+import multiprocessing as mp
+import queue
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from comun.batching_continuo import crop_cache
+
+JUDGE_MODEL = "Qwen/Qwen2.5-7B-Instruct"
+
+# Marca de error del worker en la cola de salida
+_WORKER_ERROR = "__error__"
+
+
+class JudgeModel:
+    """Clase para evaluar con un modelo Juez (Qwen)."""
+    def __init__(self, token, gpu_id=None, device=None, reuse_prefix=True):
+        if device is None:
+            device = f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        # Usamos Qwen2.5-7B-Instruct: Más estable para texto y sin problemas de config
+        model_name = JUDGE_MODEL
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, token=token, trust_remote_code=True)
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            token=token,
+            trust_remote_code=True,
+            # float16 en CPU es lentísimo (o no está soportado)
+            torch_dtype=torch.float16 if self.device.startswith("cuda") else torch.float32
+        ).to(self.device)
+        self._init_prefix_cache(reuse_prefix)
+
+    def _init_prefix_cache(self, reuse_prefix):
+        self.reuse_prefix = reuse_prefix
+        self._prefix = None  # (ids del prefijo constante, caché KV del prefijo)
+        self.stats = {'evaluations': 0, 'prefix_hits': 0, 'prefill_tokens': 0, 'prefill_tokens_saved': 0}
+
+    def build_text(self, prompt, prediction, ground_truth):
+        # Usar chat template para mejor adherencia a instrucciones y formato JSON
+        messages = [
+            {"role": "system", "content": "Eres un juez evaluador experto. Tu tarea es determinar si una predicción es correcta basándote en una respuesta de referencia."},
+            {"role": "user", "content": f"""Evalúa si la 'Predicción' es una respuesta aceptable para el 'Prompt', considerando la 'Respuesta Correcta' como referencia.
+
+            Prompt: {prompt}
+            Respuesta Correcta: {ground_truth}
+            Predicción: {prediction}
+
+            Responde ÚNICAMENTE con un objeto JSON que tenga un campo "score" con valor 1 (aceptable) o 0 (no aceptable).
+            Ejemplo: {{"score": 1}}"""}
+        ]
+
+        return self.tokenizer.apply_chat_template(
+            messages,
+            tokenize=False,
+            add_generation_prompt=True
+        )
+
+    def _prefix_cache(self):
+        """
+        Calcula (una sola vez) el caché KV del prefijo constante del juez
+
+        El prefijo son los tokens comunes a dos renders con contenidos variables
+        distintos: así no incluye tokens que el BPE pueda fusionar con el texto
+        de cada fila.
+        """
+        if self._prefix is None:
+            samples = [self.tokenizer(self.build_text(fill, fill, fill))['input_ids']
+                       for fill in ("A", "Zz 9")]
+            length = 0
+            for a, b in zip(*samples):
+                if a != b:
+                    break
+                length += 1
+            prefix_ids = list(samples[0][:length])
+            cache = None
+            if prefix_ids:
+                with torch.no_grad():
+                    out = self.model(input_ids=torch.tensor([prefix_ids], device=self.device), use_cache=True)
+                cache = out.past_key_values
+                self.stats['prefill_tokens'] += len(prefix_ids)
+            self._prefix = (prefix_ids, cache)
+        return self._prefix
+
+    def evaluate(self, prompt, prediction, ground_truth):
+        text = self.build_text(prompt, prediction, ground_truth)
+
+        inputs = self.tokenizer([text], return_tensors="pt").to(self.device)
+
+        # Reusar el caché del prefijo si la fila empieza con exactamente esos tokens
+        past_key_values = None
+        prefix_ids, prefix_cache = self._prefix_cache() if self.reuse_prefix else ([], None)
+        row_ids = inputs.input_ids[0].tolist()
+        if prefix_cache is not None and row_ids[:len(prefix_ids)] == prefix_ids:
+            past_key_values = prefix_cache
+            self.stats['prefix_hits'] += 1
+            self.stats['prefill_tokens_saved'] += len(prefix_ids)
+            self.stats['prefill_tokens'] += len(row_ids) - len(prefix_ids)
+        else:
+            self.stats['prefill_tokens'] += len(row_ids)
+        self.stats['evaluations'] += 1
+
+        try:
+            with torch.no_grad():
+                output_tokens = self.model.generate(
+                    inputs.input_ids,
+                    attention_mask=inputs.attention_mask,
+                    past_key_values=past_key_values,
+                    max_new_tokens=50,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )[0]
+        finally:
+            # generate extiende el caché in place: volver al prefijo para la próxima fila
+            if past_key_values is not None:
+                crop_cache(prefix_cache, len(prefix_ids))
+
+        response = self.tokenizer.decode(output_tokens[len(inputs.input_ids[0]):], skip_special_tokens=True).strip()
+
+        # Intentar parsear JSON
+        score = 0
+        try:
+            # Buscar algo que parezca un JSON: { ... }
+            json_match = re.search(r'\{.*?\}', response, re.DOTALL)
+            if json_match:
+                data = json.loads(json_match.group(0))
+                score = int(data.get("score", 0))
+            else:
+                # Fallback a búsqueda de dígitos si falla JSON
+                match = re.search(r'\d', response)
+                if match:
+                    score = int(match.group(0))
+        except Exception as e:
+            print(f"Error parsing JSON judge response: {e}")
+            # Fallback final
+            match = re.search(r'\d', response)
+            if match:
+                score = int(match.group(0))
+
+        return score, response
+
+    def prefill_summary(self):
+        """Línea de resumen del reuso del prefijo"""
+        stats = self.stats
+        total = stats['prefill_tokens'] + stats['prefill_tokens_saved']
+        saved = stats['prefill_tokens_saved'] / total if total else 0.0
+        return (f"Prefill del juez: {stats['prefill_tokens']} tokens calculados, "
+                f"{stats['prefill_tokens_saved']} ahorrados ({saved:.1%}) reusando el prefijo en "
+                f"{stats['prefix_hits']} de {stats['evaluations']} evaluaciones")
+
+
+def judge_one(judge: JudgeModel, n: int, prompt: str, prediction: str, ground_truth: str) -> Tuple[int, str]:
+    """Evalúa un ejemplo; nunca lanza excepción (score 0 y 'ERROR' si falla)"""
+    try:
+        score, raw_response = judge.evaluate(prompt, prediction, ground_truth)
+
+        # Debug print para las primeras iteraciones
+        if n < 3:
+            print(f"\n[DEBUG Juez #{n}]")
+            print(f"Predicción: {prediction[:50]}...")
+            print(f"Respuesta Juez Raw: {raw_response}")
+            print(f"Score extraído: {score}")
+
+    except Exception as e:
+        print(f"Error juez: {e}")
+        score = 0
+        raw_response = "ERROR"
+    return score, raw_response
+
+
+def judge_worker(in_queue, out_queue, token: Optional[str], device: str, reuse_prefix: bool = True):
+    """
+    Bucle del worker: carga el juez y evalúa hasta recibir None
+
+    Cada ítem de entrada es (índice, prompt, predicción, ground_truth) y cada
+    salida (índice, score, raw). Al terminar envía None; si el juez no carga,
+    envía (_WORKER_ERROR, mensaje) y sale.
+    """
+    try:
+        judge = JudgeModel(token, device=device, reuse_prefix=reuse_prefix)
+    except Exception as e:
+        out_queue.put((_WORKER_ERROR, str(e)))
+        return
+
+    n = 0
+    while True:
+        item = in_queue.get()
+        if item is None:
+            break
+        index, prompt, prediction, ground_truth = item
+        score, raw_response = judge_one(judge, n, prompt, prediction, ground_truth)
+        out_queue.put((index, score, raw_response))
+        n += 1
+
+    print(judge.prefill_summary())
+    del judge
+    if device.startswith("cuda"):
+        torch.cuda.empty_cache()
+    out_queue.put(None)
+
+
+class PipelinedJudge:
+    """Juez en un worker aparte alimentado por una cola acotada"""
+
+    def __init__(self, token: Optional[str], device: str, queue_size: int = 64, worker: str = "thread",
+                 reuse_prefix: bool = True):
+        """
+        Args:
+            token: Token de Hugging Face
+            device: Dispositivo del juez ('cuda:N' o 'cpu')
+            queue_size: Máximo de ejemplos en vuelo hacia el juez
+            worker: 'thread' (mismo proceso; torch libera el GIL en los kernels)
+                    o 'process' (spawn; recomendable con el juez en CPU)
+            reuse_prefix: Reusar el caché KV del prefijo constante del juez
+        """
+        if worker == "process":
+            ctx = mp.get_context("spawn")
+            self.in_queue = ctx.Queue(maxsize=queue_size)
+            self.out_queue = ctx.Queue()
+            self._worker = ctx.Process(target=judge_worker, args=(self.in_queue, self.out_queue, token, device, reuse_prefix), daemon=True)
+        elif worker == "thread":
+            self.in_queue = queue.Queue(maxsize=queue_size)
+            self.out_queue = queue.Queue()
+            self._worker = threading.Thread(target=judge_worker, args=(self.in_queue, self.out_queue, token, device, reuse_prefix), daemon=True)
+        else:
+            raise ValueError(f"Worker '{worker}' no soportado. Opciones: thread, process")
+        self.submitted = 0
+        self._worker.start()
+
+    def offer(self, index: int, prompt: str, prediction: str, ground_truth: str) -> bool:
+        """Encola sin bloquear; devuelve False si la cola está llena"""
+        try:
+            self.in_queue.put_nowait((index, prompt, prediction, ground_truth))
+        except queue.Full:
+            return False
+        self.submitted += 1
+        return True
+
+    def submit(self, index: int, prompt: str, prediction: str, ground_truth: str):
+        """Encola esperando lugar en la cola (falla si el worker murió)"""
+        while True:
+            try:
+                self.in_queue.put((index, prompt, prediction, ground_truth), timeout=1.0)
+                break
+            except queue.Full:
+                if not self._worker.is_alive():
+                    self._raise_worker_error()
+        self.submitted += 1
+
+    def _raise_worker_error(self):
+        try:
+            item = self.out_queue.get(timeout=1.0)
+        except queue.Empty:
+            item = None
+        if item is not None and item[0] == _WORKER_ERROR:
+            raise RuntimeError(f"Error al cargar el modelo Juez: {item[1]}")
+        raise RuntimeError("El worker del juez terminó inesperadamente.")
+
+    def finish(self) -> Dict[int, Tuple[int, str]]:
+        """Cierra la cola, espera al worker y devuelve {índice: (score, raw)}"""
+        self.submit_end()
+        results = {}
+        while True:
+            try:
+                item = self.out_queue.get(timeout=5.0)
+            except queue.Empty:
+                if not self._worker.is_alive():
+                    # Lo que quedara en la cola ya se habría leído
+                    raise RuntimeError(f"El worker del juez terminó con {len(results)} de {self.submitted} evaluaciones.")
+                continue
+            if item is None:
+                break
+            if item[0] == _WORKER_ERROR:
+                raise RuntimeError(f"Error al cargar el modelo Juez: {item[1]}")
+            index, score, raw_response = item
+            results[index] = (score, raw_response)
+        self._worker.join()
+        return results
+
+    def submit_end(self):
+        """Envía la marca de fin al worker"""
+        while True:
+            try:
+                self.in_queue.put(None, timeout=1.0)
+                return
+            except queue.Full:
+                if not self._worker.is_alive():
+                    return
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas de texto (F1 por tokens y substring accuracy) calculadas por columnas.
+
+Reemplaza las copias que vivían en ``h2/3_evaluar_paralelo.py``,
+``3_simulador_y_evaluador.py`` y ``4_evaluador_vllm.py``. Las expresiones y
+tablas de normalización se compilan una sola vez y cada texto distinto se
+normaliza una sola vez por columna (las respuestas correctas se repiten mucho).
+La normalización en sí vive en ``comun.normalizacion``.
+
+Hay dos modos de normalización, los mismos que usaban los scripts originales:
+  - 'regex': minúsculas y se quita todo lo que no sea palabra/espacio
+             (el de ``3_evaluar_paralelo.py``).
+  - 'ascii': minúsculas, sin tildes, sin puntuación y sin
+             espacios en los extremos (el del simulador y el evaluador vLLM).
+"""
+
+from collections import Counter
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from comun.normalizacion import normalizar_ascii, normalizar_regex
+
+
+def normalize_text(s: str) -> str:
+    """Normalización 'regex': minúsculas y sin signos"""
+    return normalizar_regex(s)
+
+
+def normalizar_texto(texto) -> str:
+    """Normalización 'ascii': minúsculas, sin tildes, sin puntuación"""
+    return normalizar_ascii(texto)
+
+
+_NORMALIZADORES = {
+    'regex': normalizar_regex,
+    'ascii': normalizar_ascii,
+}
+
+
+def normalizar_columna(textos: Iterable, modo: str = 'regex') -> List[str]:
+    """
+    Normaliza una columna completa, procesando cada valor distinto una sola vez
+
+    Args:
+        textos: Serie, lista o cualquier iterable de textos
+        modo: 'regex' o 'ascii' (ver docstring del módulo)
+
+    Returns:
+        Lista de textos normalizados, en el mismo orden
+    """
+    normalizar = _NORMALIZADORES[modo]
+    serie = textos if isinstance(textos, pd.Series) else pd.Series(list(textos), dtype=object)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    normalizados = np.array([normalizar(t) for t in unicos], dtype=object)
+    return normalizados[codigos].tolist() if len(codigos) else []
+
+
+def _f1_tokens(pred_tokens: List[str], gt_tokens: List[str]) -> float:
+    if not gt_tokens:
+        return 1.0 if not pred_tokens else 0.0
+    if not pred_tokens:
+        return 0.0
+    if pred_tokens == gt_tokens:
+        return 1.0
+    common = Counter(pred_tokens) & Counter(gt_tokens)
+    num_same = sum(common.values())
+    if num_same == 0:
+        return 0.0
+    precision = num_same / len(pred_tokens)
+    recall = num_same / len(gt_tokens)
+    return (2 * precision * recall) / (precision + recall)
+
+
+def f1_score_batch(predictions: Iterable, ground_truths: Iterable, modo: str = 'regex') -> np.ndarray:
+    """F1 por tokens para cada par (predicción, referencia)"""
+    preds = normalizar_columna(predictions, modo)
+    gts = normalizar_columna(ground_truths, modo)
+    return np.fromiter(
+        (_f1_tokens(p.split(), g.split()) for p, g in zip(preds, gts)),
+        dtype=np.float64,
+        count=len(preds),
+    )
+
+
+def substring_accuracy_batch(predictions: Iterable, ground_truths: Iterable,
+                             modo: str = 'regex', ignorar_vacias: bool = False) -> np.ndarray:
+    """
+    1 si la referencia normalizada aparece dentro de la predicción normalizada
+
+    Args:
+        ignorar_vacias: Si es True, una referencia vacía tras normalizar cuenta
+                        como incorrecta (criterio del evaluador vLLM)
+    """
+    preds = normalizar_columna(predictions, modo)
+    gts = normalizar_columna(ground_truths, modo)
+    return np.fromiter(
+        (int(g in p and not (ignorar_vacias and g == "")) for p, g in zip(preds, gts)),
+        dtype=np.int64,
+        count=len(preds),
+    )
+
+
+def f1_score(prediction: str, ground_truth: str) -> float:
+    """Versión escalar (modo 'regex') para usos puntuales"""
+    return _f1_tokens(normalize_text(prediction).split(), normalize_text(ground_truth).split())
+
+
+def substring_accuracy(prediction: str, ground_truth: str) -> int:
+    """Versión escalar (modo 'regex') para usos puntuales"""
+    return 1 if normalize_text(ground_truth) in normalize_text(prediction) else 0
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mezcla por bloques de los CSV de tripletas grandes, con memoria acotada.
+
+merge_usa.py y merge_tomy.py leían cada CSV entero con pandas (con
+peliculas_us_176688Entities.csv, cine_latam_151363Entities.csv y
+landmarks_LATAM_103493Entities.csv), los concatenaban, hacían
+drop_duplicates sobre el total y recién entonces filtraban por idioma: en
+memoria estaban a la vez todos los CSV, la concatenación y sus copias.
+
+merge_csvs lee cada CSV por bloques con todas las columnas como texto, y
+por cada bloque:
+  - descarta las filas con vacíos,
+  - descarta las repetidas: de cada fila se guarda solo su hash de 64 bits
+    (pd.util.hash_pandas_object) en tramos ordenados, no la fila,
+  - filtra por idioma (comun.idioma.LanguageFilter, caché compartido entre
+    bloques),
+  - agrega lo que queda al CSV de salida.
+En memoria queda un bloque a la vez más 8 bytes por fila distinta y el
+caché de idiomas; el resultado es el mismo que concat + drop_duplicates + filtro
+(se conserva la primera aparición de cada fila, en el orden de entrada).
+
+    stats = merge_csvs(archivos, 'tripletas_usa_EN.csv', {'entidad': 'entidad', 'relacion': 'relacion',
+                       'valor': 'valor'}, LanguageFilter('es', cache_path='cache_idioma.json'))
+"""
+
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from comun.idioma import LanguageFilter
+
+# Filas de CSV leídas por bloque
+CHUNK_SIZE = 50000
+
+
+def iter_triple_chunks(csv_file: str, columns: Dict[str, str], chunk_size: int = CHUNK_SIZE,
+                       encoding: str = 'latin-1', sep: str = ',') -> Iterator[pd.DataFrame]:
+    """
+    Bloques de un CSV con solo las columnas pedidas, como texto y renombradas
+
+    Args:
+        csv_file: CSV de tripletas
+        columns: {columna del CSV: columna de salida}, en el orden de salida
+        chunk_size: Filas por bloque
+
+    Raises:
+        KeyError: si al CSV le falta alguna de las columnas
+    """
+    header = pd.read_csv(csv_file, nrows=0, index_col=False, encoding=encoding, sep=sep).columns
+    print(f"Columnas encontradas: {header.tolist()}")
+    # Los nombres pueden venir con espacios alrededor
+    by_name = {str(name).strip(): name for name in header}
+    missing = [column for column in columns if column not in by_name]
+    if missing:
+        raise KeyError(missing)
+
+    usecols = [by_name[column] for column in columns]
+    rename = {by_name[column]: output for column, output in columns.items()}
+    reader = pd.read_csv(csv_file, index_col=False, usecols=usecols, dtype=str, chunksize=chunk_size,
+                         encoding=encoding, sep=sep, on_bad_lines='skip')
+    for chunk in reader:
+        yield chunk.rename(columns=rename)[list(rename.values())]
+
+
+class RowDigests:
+    """
+    Hashes de 64 bits de las filas ya vistas (8 bytes por fila)
+
+    Se guardan en tramos ordenados de tamaños decrecientes: cada bloque nuevo
+    es un tramo y se fusiona con el anterior mientras este no sea más del doble
+    de grande. Así cada hash se vuelve a ordenar O(log filas) veces en total
+    y hay pocos tramos donde buscar, en vez de reordenar todo en cada bloque.
+    """
+
+    def __init__(self):
+        self.runs: List[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return sum(len(run) for run in self.runs)
+
+    def _seen(self, hashes: np.ndarray) -> np.ndarray:
+        """Máscara de los hashes que ya están en algún tramo"""
+        # Buscar en orden recorre cada tramo de una pasada (searchsorted
+        # aprovecha que las claves vienen ordenadas)
+        order = np.argsort(hashes)
+        keys = hashes[order]
+        seen = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            position = np.searchsorted(run, keys)
+            position[position == len(run)] = 0
+            seen[order] |= run[position] == keys
+        return seen
+
+    def new_rows(self, chunk: pd.DataFrame) -> np.ndarray:
+        """Máscara de las filas del bloque no vistas antes (y las agrega a las vistas)"""
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        is_new = ~pd.Series(hashes).duplicated().to_numpy() & ~self._seen(hashes)
+        run = np.sort(hashes[is_new])
+        # Dos tramos ordenados: el sort estable (timsort) solo los intercala
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            run = np.concatenate([self.runs.pop(), run])
+            run.sort(kind='stable')
+        if len(run):
+            self.runs.append(run)
+        return is_new
+
+
+def merge_csvs(csv_files: List[str], output: str, columns: Dict[str, str],
+               language_filter: Optional[LanguageFilter] = None, chunk_size: int = CHUNK_SIZE,
+               encoding: str = 'latin-1', sep: str = ',') -> Dict[str, int]:
+    """
+    Mezcla los CSV en `output` (UTF-8) sin repetidas y filtradas por idioma
+
+    Args:
+        csv_files: CSV de entrada, en orden
+        output: CSV de salida (se sobreescribe)
+        columns: {columna del CSV: columna de salida}; el idioma se mira en 'valor'
+        language_filter: Filtro por idioma (None = no filtrar)
+        chunk_size: Filas por bloque
+
+    Returns:
+        Conteos: archivos procesados, filas leídas (sin vacíos), duplicadas y escritas
+    """
+    stats = {'archivos': 0, 'leidas': 0, 'duplicadas': 0, 'escritas': 0}
+    seen = RowDigests()
+    started = False
+    for csv_file in csv_files:
+        print(f"\nProcesando: {csv_file}")
+        rows = 0
+        try:
+            for chunk in iter_triple_chunks(csv_file, columns, chunk_size, encoding, sep):
+                if not started:
+                    # Encabezado aunque al final no pase ninguna fila
+                    chunk.iloc[:0].to_csv(output, index=False, encoding='utf-8')
+                    started = True
+                chunk = chunk.dropna()
+                rows += len(chunk)
+                is_new = seen.new_rows(chunk)
+                stats['duplicadas'] += int((~is_new).sum())
+                chunk = chunk[is_new]
+                if language_filter is not None and len(chunk):
+                    chunk = chunk[language_filter.mask(chunk['valor']).to_numpy()]
+                chunk.to_csv(output, mode='a', header=False, index=False, encoding='utf-8')
+                stats['escritas'] += len(chunk)
+        except KeyError as e:
+            print(f"Error: El archivo {csv_file} no tiene las columnas esperadas {list(columns)} (faltan {e}). Saltando.")
+            continue
+        except Exception as e:
+            print(f"Error inesperado procesando {csv_file}: {e}. Saltando el resto del archivo.")
+            if not rows:
+                continue
+        stats['archivos'] += 1
+        stats['leidas'] += rows
+        print(f"Procesado OK: {rows} filas limpias leídas.")
+
+    if language_filter is not None:
+        language_filter.save()
+    return stats
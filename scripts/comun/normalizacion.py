@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Normalización de texto compartida (minado, limpieza y evaluación).
+
+Antes cada script tenía su propio normalize_text con 7 a 15 str.replace
+encadenados, y no coincidían en qué tildes quitaban (unos convertían 'à' o
+'ç', otros no). Aquí hay una sola tabla para str.translate, calculada una vez
+al importar a partir de la descomposición NFKD de Latin-1 y Latin Extended-A
+(más las letras sin descomposición: ß, æ, ø, đ, ł, ...). Cada función guarda
+sus resultados en un lru_cache, porque las entidades y respuestas se repiten
+muchísimo.
+
+  - normalizar_entidad: minúsculas, sin espacios en los extremos y sin tildes
+    (la de los mineros, SubsetCleaner y DatasetCategorizer).
+  - normalizar_ascii: además sin puntuación, y lo que quede fuera de la tabla
+    pasa por unidecode (modo 'ascii' de comun.metricas).
+  - normalizar_regex: minúsculas y solo palabras y espacios, sin tocar tildes
+    (modo 'regex' de comun.metricas, el de 3_evaluar_paralelo).
+"""
+
+import re
+import string
+import unicodedata
+from functools import lru_cache
+
+try:
+    from unidecode import unidecode
+except ImportError:
+    unidecode = None
+
+# Entradas distintas que se recuerdan por función
+CACHE_SIZE = 1 << 18
+
+# Letras que NFKD no descompone (mismo resultado que unidecode)
+_SIN_DESCOMPOSICION = {
+    'ß': 'ss', 'æ': 'ae', 'Æ': 'AE', 'ø': 'o', 'Ø': 'O', 'œ': 'oe', 'Œ': 'OE',
+    'đ': 'd', 'Đ': 'D', 'ł': 'l', 'Ł': 'L', 'ħ': 'h', 'Ħ': 'H', 'ı': 'i',
+    'ŧ': 't', 'Ŧ': 'T', 'ð': 'd', 'Ð': 'D', 'þ': 'th', 'Þ': 'Th',
+}
+
+
+def _tabla_acentos() -> dict:
+    tabla = {}
+    for codigo in range(0x00C0, 0x0180):  # Latin-1 (letras) y Latin Extended-A
+        caracter = chr(codigo)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', caracter) if not unicodedata.combining(c))
+        if base != caracter and base.isascii() and base.isalpha():
+            tabla[codigo] = base
+    tabla.update({ord(k): v for k, v in _SIN_DESCOMPOSICION.items()})
+    return tabla
+
+
+TABLA_ACENTOS = _tabla_acentos()
+# Quitar tildes y puntuación ASCII en una sola pasada
+TABLA_ASCII = {**TABLA_ACENTOS, **{ord(c): None for c in string.punctuation}}
+_TABLA_PUNTUACION = str.maketrans('', '', string.punctuation)
+_RE_NO_PALABRA = re.compile(r'[^\w\s]')
+
+
+def quitar_acentos(texto: str) -> str:
+    """Reemplaza las letras latinas con diacríticos por su base ASCII"""
+    return texto.translate(TABLA_ACENTOS)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _entidad(texto: str) -> str:
+    return texto.lower().strip().translate(TABLA_ACENTOS)
+
+
+def normalizar_entidad(texto) -> str:
+    """Minúsculas, sin espacios en los extremos y sin tildes ('' si no es texto)"""
+    if not texto or not isinstance(texto, str):
+        return ""
+    return _entidad(texto)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _ascii(texto: str) -> str:
+    resultado = texto.lower().translate(TABLA_ASCII)
+    if not resultado.isascii():
+        # Fuera de Latin-1/Extended-A (o signos como '¿'): unidecode y otra vez sin puntuación
+        if unidecode is None:
+            raise ImportError("Necesitas 'unidecode'. Instálalo con: pip install unidecode")
+        resultado = unidecode(resultado).translate(_TABLA_PUNTUACION)
+    return resultado.strip()
+
+
+def normalizar_ascii(texto) -> str:
+    """Minúsculas, sin tildes, sin puntuación y sin espacios en los extremos"""
+    if not isinstance(texto, str):
+        return ""
+    return _ascii(texto)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _regex(texto: str) -> str:
+    return _RE_NO_PALABRA.sub('', texto.lower())
+
+
+def normalizar_regex(texto) -> str:
+    """Minúsculas y sin signos (conserva las tildes)"""
+    if not isinstance(texto, str):
+        return ""
+    return _regex(texto)
+
+
+def cache_info() -> dict:
+    """Estadísticas de los cachés, por función"""
+    return {'entidad': _entidad.cache_info(), 'ascii': _ascii.cache_info(), 'regex': _regex.cache_info()}
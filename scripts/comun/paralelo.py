@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Procesamiento por bloques en un pool de procesos, con resultados en orden.
+
+Los mineros y el categorizador aplican una función pura a cada pregunta (o
+entidad) de un stream. map_chunks_ordered reparte los bloques del stream
+entre procesos, con a lo sumo 2 bloques en vuelo por proceso (la memoria no
+crece con el dataset), y devuelve los resultados en el orden de entrada: al
+combinarlos en ese orden se obtiene exactamente lo mismo que en serie.
+
+Los parciales de los mineros son {categoría: {entidad: [qa, ...]}} (o
+{categoría: {entidad: conteo}} en la primera pasada del modo en dos
+pasadas); merge_groups y merge_counts los acumulan respetando el orden de
+primera aparición, y top_entities desempata por ese orden: el top-N es el
+mismo que en serie.
+
+    for parcial in map_chunks_ordered(miner, 'aggregate_chunk', iter_chunks(items, 2000), workers=4):
+        ...
+"""
+
+import heapq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Objeto de trabajo de cada proceso del pool (se copia una vez por proceso)
+_WORKER_OBJECT = None
+
+
+def _init_worker(obj: Any):
+    global _WORKER_OBJECT
+    _WORKER_OBJECT = obj
+
+
+def _call(method: str, chunk: List) -> Any:
+    return getattr(_WORKER_OBJECT, method)(chunk)
+
+
+def map_chunks_ordered(obj: Any, method: str, chunks: Iterable[List], workers: int = 1) -> Iterator:
+    """
+    Aplica obj.<method>(bloque) a cada bloque y devuelve los resultados en orden
+
+    Args:
+        obj: Objeto (picklable) con el método a aplicar
+        method: Nombre del método; recibe un bloque y devuelve su resultado
+        chunks: Bloques de entrada (p. ej. iter_chunks(iter_records(path), n))
+        workers: Procesos; con 1 se aplica en el proceso actual
+    """
+    if workers <= 1:
+        function = getattr(obj, method)
+        for chunk in chunks:
+            yield function(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(obj,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_call, method, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def merge_groups(total: Dict[str, Dict[str, List]], partial: Dict[str, Dict[str, List]]):
+    """Agrega un parcial {categoría: {entidad: [qa, ...]}} al acumulado (en su lugar)"""
+    for category, entities in partial.items():
+        destination = total.setdefault(category, {})
+        for entity, items in entities.items():
+            if entity in destination:
+                destination[entity].extend(items)
+            else:
+                destination[entity] = items
+
+
+def merge_counts(total: Dict[str, Dict[str, int]], partial: Dict[str, Dict[str, int]]):
+    """Agrega un parcial {categoría: {entidad: conteo}} al acumulado (en su lugar)"""
+    for category, entities in partial.items():
+        destination = total.setdefault(category, {})
+        for entity, count in entities.items():
+            destination[entity] = destination.get(entity, 0) + count
+
+
+def top_entities(counts: Dict[str, int], n: int) -> List[Tuple[str, int]]:
+    """
+    Las n entidades con más preguntas, de mayor a menor
+
+    Con un heap de tamaño n (no ordena todas). A igual conteo va primero la
+    que apareció antes en el dataset (el orden del dict), igual que
+    sorted(..., reverse=True) estable sobre el dict completo.
+    """
+    best = heapq.nsmallest(n, ((-count, order, entity) for order, (entity, count) in enumerate(counts.items())))
+    return [(entity, -negative) for negative, _, entity in best]
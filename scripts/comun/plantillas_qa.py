@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Plantilla de las preguntas del benchmark y extracción de su entidad.
+
+gen_dataset/2_generador_qa.py arma cada pregunta como
+"¿Cuál es {relación} de {entidad}?", con la relación pasada por
+MAPA_PREGUNTAS (o tal cual si no está). Los mineros recuperaban la entidad
+con regex o con split(" de ")[-1], que se quedan con lo que sigue al último
+" de ": "¿Cuál es el género de La guerra de las galaxias?" daba "las
+galaxias". EntityExtractor conoce las relaciones (las plantillas del mapa y
+las etiquetas frecuentes de Wikidata) y corta la pregunta justo después de
+la relación, así la entidad queda entera aunque tenga " de ".
+
+Las relaciones se repiten en cientos de miles de preguntas: las plantillas
+candidatas se buscan una sola vez por comienzo de relación (lo anterior al
+primer " de ") y quedan memorizadas. Si la relación no se conoce, se usa lo
+que sigue al último " de ", como antes.
+
+    extraer_entidad("¿Cuál es el género de La guerra de las galaxias?")
+    # 'La guerra de las galaxias'
+"""
+
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+# Forma fija de las preguntas (la misma que arma pregunta_de)
+FORMATO_PREGUNTA = "¿Cuál es {relacion} de {entidad}?"
+
+# Relación (etiqueta de la tripleta) -> cómo se lee en la pregunta
+MAPA_PREGUNTAS = {
+    # Relaciones en español (de pintores_latam)
+    'lugar de nacimiento': 'el lugar de nacimiento',
+    'instancia de': 'un tipo de',
+    'lugar de fallecimiento': 'el lugar de fallecimiento',
+    'educado en': 'dónde fue educado',
+    'ocupación': 'la ocupación',
+    'país de nacionalidad': 'el país de nacionalidad',
+    'movimiento': 'el movimiento artístico/cultural',
+    'premio recibido': 'el premio recibido',
+    'género': 'el género',
+    'sello discográfico': 'el sello discográfico',
+    'pareja': 'la pareja',
+    'influenciado por': 'quién lo influenció',
+    'forma parte de': 'de qué forma parte',
+    'obra destacada': 'la obra destacada',
+    'instrumento': 'el instrumento que toca',
+
+    # Relaciones en inglés (principalmente de canon_basic)
+    'author': 'el autor',
+    'country of origin': 'el país de origen',
+    'country of citizenship': 'el país de ciudadanía',
+    'country': 'el país',
+    'located in the administrative territorial entity': 'la ubicación administrativa',
+    'instance of': 'un tipo de', # Duplicado intencional
+    'headquarters location': 'la ubicación de la sede',
+    'location': 'la ubicación',
+    'occupation': 'la ocupación', # Duplicado intencional
+    'position held': 'el puesto ocupado',
+    'member of political party': 'el partido político',
+    'place of birth': 'el lugar de nacimiento', # Duplicado intencional
+    'date of birth': 'la fecha de nacimiento',
+    'publication date': 'la fecha de publicación',
+    'date of death': 'la fecha de muerte',
+    'place of death': 'el lugar de muerte', # Duplicado intencional
+    'founded by': 'el fundador',
+    'child': 'el hijo/a',
+    'member of': 'miembro de',
+    'religion': 'la religión',
+    'spouse': 'el/la cónyuge', # Duplicado intencional
+    'field of work': 'el campo de trabajo',
+    'cause of death': 'la causa de muerte',
+    'currency': 'la moneda',
+    'height': 'la altura',
+    'notable work': 'la obra destacada', # Duplicado intencional
+    'movement': 'el movimiento artístico/cultural', # Duplicado intencional
+    'population': 'la población',
+    'place of burial': 'el lugar de sepultura',
+    'manner of death': 'la forma de muerte',
+    'official language': 'el idioma oficial',
+    'family': 'la familia',
+    'director': 'el director',
+    'screenwriter': 'el guionista',
+    'native language': 'el idioma nativo',
+    # Añade MÁS relaciones aquí si son relevantes
+}
+
+# Etiquetas de Wikidata que llegan sin mapear a las preguntas (las más
+# frecuentes en usa_qa, tomy_qa, justo_qa y los subsets h2)
+RELACIONES_FRECUENTES = (
+    'género', 'ocupación', 'miembro del reparto', 'lugar de filmación', 'país de origen',
+    'país de nacionalidad', 'país', 'guionista', 'director', 'el director', 'idioma',
+    'idioma de la película o programa de televisión', 'idioma original de la obra', 'idioma usado',
+    'empresa productora', 'director de fotografía', 'música de', 'compositor', 'productor',
+    'distribución', 'personajes', 'autor', 'creador', 'ubicación', 'imagen', 'logotipo',
+    'lengua materna', 'lenguas habladas, escritas o signadas', 'hogar ancestral', 'forma artística',
+    'situado en la entidad territorial administrativa', 'categoría principal del tema',
+    'categoría en Commons', 'categoría para las películas en este idioma', 'subclase de',
+    'subdividido en (división administrativa)', 'descrito en la fuente', 'comparte fronteras con',
+    'nombrado en referencia a', 'atraviesa', 'diáspora', 'representa a', 'conmemora', 'diferente de',
+    'localizado en el área protegida', 'estado del idioma en Ethnologue',
+    'ID de género musical en Rate Your Music', 'lugar de nacimiento', 'lugar de fallecimiento',
+    'instancia de', 'forma parte de', 'educado en', 'movimiento', 'premio recibido',
+)
+
+# FORMATO_PREGUNTA en partes, para armar columnas enteras
+_ANTES, _RESTO = FORMATO_PREGUNTA.split('{relacion}')
+_MEDIO, _DESPUES = _RESTO.split('{entidad}')
+_PREFIJO = _ANTES
+# Preguntas con otra forma: lo que sigue a "de " hasta el "?" final
+_RE_DE = re.compile(r'de (.+)\?$')
+
+
+def pregunta_de(relacion: str, entidad: str) -> str:
+    """Pregunta del benchmark para una tripleta (relación sin mapear y entidad)"""
+    return FORMATO_PREGUNTA.format(relacion=MAPA_PREGUNTAS.get(relacion, relacion), entidad=entidad)
+
+
+def preguntas_de(relaciones, entidades):
+    """
+    pregunta_de sobre columnas enteras (pandas.Series de texto, mismo índice)
+
+    El mapa se aplica con Series.map (una búsqueda por fila, en C) y la
+    pregunta se arma concatenando columnas.
+    """
+    plantillas = relaciones.map(MAPA_PREGUNTAS).fillna(relaciones)
+    return _ANTES + plantillas + _MEDIO + entidades + _DESPUES
+
+
+def _mojibake(texto: str) -> str:
+    """Cómo se ve `texto` si se escribió en UTF-8 y se leyó como latin-1 (usa_qa.json)"""
+    try:
+        return texto.encode('utf-8').decode('latin-1')
+    except UnicodeError:
+        return texto
+
+
+class EntityExtractor:
+    """Entidad de "¿Cuál es {relación} de {entidad}?" cortando tras una relación conocida"""
+
+    def __init__(self, relaciones: Optional[Iterable[str]] = None):
+        """
+        Args:
+            relaciones: Relaciones tal como aparecen en las preguntas; por
+                defecto las plantillas de MAPA_PREGUNTAS y RELACIONES_FRECUENTES
+        """
+        if relaciones is None:
+            relaciones = set(MAPA_PREGUNTAS.values()) | set(MAPA_PREGUNTAS) | set(RELACIONES_FRECUENTES)
+        relaciones = {r.strip() for r in relaciones if r and r.strip()}
+        # También como se ven con el encoding roto, para los datasets sin arreglar
+        relaciones |= {_mojibake(r) for r in relaciones}
+        self.relaciones = frozenset(relaciones)
+        # Comienzo de relación (hasta el primer " de ") -> relaciones posibles, la más larga primero
+        self._por_cabeza: Dict[str, Tuple[str, ...]] = {}
+
+    def _candidatas(self, cabeza: str) -> Tuple[Tuple[str, str], ...]:
+        """(relación, comienzo de pregunta hasta la entidad) posibles, la relación más larga primero"""
+        candidatas = self._por_cabeza.get(cabeza)
+        if candidatas is None:
+            # ' de' sin espacio: también relaciones que terminan en "de" ("un tipo de")
+            inicio = cabeza + ' de'
+            relaciones = sorted((r for r in self.relaciones if r == cabeza or r.startswith(inicio)),
+                                key=len, reverse=True)
+            candidatas = tuple((r, _PREFIJO + r + ' de ') for r in relaciones)
+            self._por_cabeza[cabeza] = candidatas
+        return candidatas
+
+    def split(self, pregunta: str) -> Tuple[Optional[str], str]:
+        """
+        (relación, entidad) de una pregunta del benchmark
+
+        La relación es None si no es una relación conocida (la entidad es
+        entonces lo que sigue al último " de ").
+        """
+        texto = pregunta.rstrip()
+        corte = -1
+        if texto.startswith(_PREFIJO) and texto.endswith('?'):
+            corte = texto.find(' de ', len(_PREFIJO))
+        if corte < 0:
+            match = _RE_DE.search(pregunta)
+            if match:
+                return None, match.group(1).strip()
+            return None, pregunta.replace('¿', '').replace('?', '').strip()
+
+        for relacion, comienzo in self._candidatas(texto[len(_PREFIJO):corte]):
+            if texto.startswith(comienzo):
+                return relacion, texto[len(comienzo):-1].strip()
+        return None, texto[texto.rfind(' de ') + 4:-1].strip()
+
+    def extract(self, pregunta: str) -> str:
+        """Entidad de la pregunta"""
+        return self.split(pregunta)[1]
+
+
+_EXTRACTOR = EntityExtractor()
+
+
+def extraer_entidad(pregunta: str) -> str:
+    """Entidad de una pregunta "¿Cuál es {relación} de {entidad}?" (extractor por defecto)"""
+    return _EXTRACTOR.extract(pregunta)
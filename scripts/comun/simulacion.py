@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulador vectorizado y reproducible de respuestas de LLM.
+
+Genera variantes de respuesta a partir de la respuesta correcta con una mezcla
+configurable de formatos (correctas) y de errores (incorrectas). Todo se decide
+por bloques con numpy (un generador con semilla por bloque) y se arma con
+operaciones de columna de pandas, sin bucles por ítem; así se pueden producir
+millones de variantes para probar la carga del evaluador.
+
+    simulador = AnswerSimulator(semilla=42, tasa_error=0.2)
+    for bloque in simulador.iter_bloques(iter_records(benchmark), variantes=10):
+        ...  # DataFrame con pregunta, respuesta_correcta, respuesta_llm, tipo
+"""
+
+from typing import Dict, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from comun.io_datos import iter_chunks
+
+# Variaciones de una respuesta correcta (las del simulador original + puntuación)
+FORMATOS = {
+    'exacta': 0.25,
+    'prefijo': 0.25,      # "La respuesta es x"
+    'sufijo': 0.25,       # "Se sabe que fue x."
+    'mayusculas': 0.25,   # "Creo que X"
+    'puntuacion': 0.0,    # "¡x!"
+}
+
+# Tipos de respuesta incorrecta
+ERRORES = {
+    'no_se': 1.0,         # "No lo sé."
+    'otra': 0.0,          # la respuesta correcta de otra pregunta del bloque
+    'vacia': 0.0,         # ""
+}
+
+
+def parse_mezcla(texto: str, base: Dict[str, float]) -> Dict[str, float]:
+    """Lee 'a=0.5,b=0.5' sobre los nombres válidos de `base`"""
+    mezcla = {nombre: 0.0 for nombre in base}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        nombre = nombre.strip()
+        if nombre not in base:
+            raise ValueError(f"'{nombre}' no es válido. Opciones: {', '.join(base)}")
+        mezcla[nombre] = float(peso)
+    return mezcla
+
+
+def _probabilidades(mezcla: Dict[str, float]) -> np.ndarray:
+    pesos = np.array(list(mezcla.values()), dtype=np.float64)
+    if pesos.sum() <= 0 or (pesos < 0).any():
+        raise ValueError("La mezcla debe tener pesos no negativos con suma positiva.")
+    return pesos / pesos.sum()
+
+
+class AnswerSimulator:
+    """Simulador de respuestas con semilla, mezcla de formatos y de errores"""
+
+    def __init__(self, semilla: int = 42, tasa_error: float = 0.2, formatos: Dict[str, float] = None,
+                 errores: Dict[str, float] = None):
+        if not 0 <= tasa_error <= 1:
+            raise ValueError(f"La tasa de error debe estar entre 0 y 1, no {tasa_error}.")
+        self.semilla = semilla
+        self.tasa_error = tasa_error
+        self.formatos = dict(formatos or FORMATOS)
+        self.errores = dict(errores or ERRORES)
+        self.tipos = list(self.formatos) + list(self.errores)
+        # Un solo sorteo por fila sobre todos los tipos
+        self.probabilidades = np.concatenate([
+            (1 - tasa_error) * _probabilidades(self.formatos),
+            tasa_error * _probabilidades(self.errores),
+        ])
+
+    def simular(self, respuestas_correctas: pd.Series, rng: np.random.Generator) -> pd.DataFrame:
+        """
+        Simula una respuesta por fila
+
+        Returns:
+            DataFrame con las columnas respuesta_llm y tipo (mismo índice)
+        """
+        correctas = respuestas_correctas.astype(str)
+        n = len(correctas)
+        codigos = rng.choice(len(self.tipos), size=n, p=self.probabilidades)
+        tipo = pd.Categorical.from_codes(codigos, categories=self.tipos)
+
+        respuesta = pd.Series("", index=correctas.index, dtype=object)
+        elegir = {nombre: codigos == i for i, nombre in enumerate(self.tipos)}
+
+        minusculas = correctas.str.lower()
+        respuesta[elegir['exacta']] = correctas[elegir['exacta']]
+        respuesta[elegir['prefijo']] = "La respuesta es " + minusculas[elegir['prefijo']]
+        respuesta[elegir['sufijo']] = "Se sabe que fue " + minusculas[elegir['sufijo']] + "."
+        respuesta[elegir['mayusculas']] = "Creo que " + correctas[elegir['mayusculas']].str.upper()
+        respuesta[elegir['puntuacion']] = "¡" + correctas[elegir['puntuacion']] + "!"
+        respuesta[elegir['no_se']] = "No lo sé."
+        if elegir['otra'].any():
+            # Respuesta de otra fila del bloque (desplazamiento aleatorio no nulo)
+            desplazamiento = rng.integers(1, max(n, 2), size=n)
+            otras = correctas.to_numpy()[(np.arange(n) + desplazamiento) % n]
+            respuesta[elegir['otra']] = otras[elegir['otra']]
+        # 'vacia' queda como ""
+
+        return pd.DataFrame({'respuesta_llm': respuesta, 'tipo': tipo}, index=correctas.index)
+
+    def iter_bloques(self, registros: Iterable[dict], variantes: int = 1,
+                     tamano_bloque: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Recorre el benchmark por bloques y produce `variantes` respuestas por pregunta
+
+        Cada bloque usa su propio generador, derivado de (semilla, número de
+        bloque): el resultado es reproducible para una misma semilla y tamaño
+        de bloque, y no depende de cuántos bloques se consuman.
+        """
+        for numero, bloque in enumerate(iter_chunks(registros, tamano_bloque)):
+            rng = np.random.default_rng([self.semilla, numero])
+            df = pd.DataFrame({
+                'pregunta': [item['pregunta'] for item in bloque],
+                'respuesta_correcta': [item['respuesta_correcta'] for item in bloque],
+            })
+            if variantes > 1:
+                df = df.loc[df.index.repeat(variantes)].reset_index(drop=True)
+            yield pd.concat([df, self.simular(df['respuesta_correcta'], rng)], axis=1)
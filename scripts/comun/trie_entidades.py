@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trie de entidades por tokens para ubicar entidades conocidas en preguntas.
+
+Las preguntas del benchmark tienen la forma "¿Cuál es <relación> de <entidad>?".
+Adivinar la entidad con regex sobre el texto que sigue a " de " corta las
+entidades que contienen " de " ("Palacio de la Moneda") o toma de más cuando
+la relación también lo tiene ("país de origen de ..."). EntityTrie indexa las
+entidades ya normalizadas como secuencias de tokens y recorre la pregunta de
+izquierda a derecha: desde cada "de"/"del" camina el trie y se queda con la
+primera entidad conocida que llega hasta el final de la pregunta (la más
+larga posible). Devuelve la categoría directamente. Exigir que la entidad
+cierre la pregunta evita tomar palabras de la relación ("miembro del reparto
+de ...") que por casualidad también son entidades.
+
+    trie = EntityTrie.from_index(entity_index, ['painters', 'landmarks'])
+    trie.find("¿Cuál es el arquitecto de Palacio de la Moneda?")
+    # ('landmarks', 'Palacio de la Moneda')
+    trie.find("¿Cuál es la altura de Cerro Santa Lucía (Chile)?")
+    # ('landmarks', 'Cerro Santa Lucía (Chile)')
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from comun.normalizacion import TABLA_ACENTOS
+
+_RE_TOKEN = re.compile(r'\w+')
+
+# Tokens tras los cuales empieza la entidad en "¿Cuál es <relación> de <entidad>?"
+ANCLAS = frozenset({'de', 'del'})
+
+# Marca de fin de entidad dentro de un nodo (guarda la categoría)
+_FIN = None
+
+
+class EntityTrie:
+    """Entidades normalizadas indexadas por tokens"""
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    @staticmethod
+    def tokens(text: str) -> List[str]:
+        return _RE_TOKEN.findall(text)
+
+    def add(self, entity_norm: str, category: str):
+        """Agrega una entidad normalizada; si ya estaba, conserva la primera categoría"""
+        tokens = self.tokens(entity_norm)
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if _FIN not in node:
+            node[_FIN] = category
+            self.size += 1
+
+    @classmethod
+    def from_index(cls, entity_index: Dict[str, Set[str]], categories: Iterable[str]) -> 'EntityTrie':
+        """Construye el trie; `categories` da la prioridad si una entidad está en varias"""
+        trie = cls()
+        for category in categories:
+            for entity_norm in entity_index.get(category, ()):
+                trie.add(entity_norm, category)
+        return trie
+
+    def lookup(self, text_norm: str) -> Optional[str]:
+        """Categoría de un texto que es exactamente una entidad (o None)"""
+        node = self.root
+        for token in self.tokens(text_norm):
+            node = node.get(token)
+            if node is None:
+                return None
+        return node.get(_FIN)
+
+    def find(self, pregunta: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Entidad conocida más larga que sigue a un "de"/"del" y cierra la pregunta
+
+        Returns:
+            (categoría, entidad tal como aparece en la pregunta) o (None, None)
+        """
+        minusculas = pregunta.lower()
+        # Todo lo anterior al primer " de" no puede ser la entidad: ni se tokeniza
+        inicio = minusculas.find(' de')
+        if inicio < 0:
+            return None, None
+        resto = minusculas[inicio:]
+        tokens = _RE_TOKEN.findall(resto)
+        if not resto.isascii():
+            # Quitar tildes token a token (los tokens se repiten mucho; ver _plegar)
+            tokens = [token if token.isascii() else _plegar(token) for token in tokens]
+        n = len(tokens)
+
+        for i in range(n - 1):
+            if tokens[i] not in ANCLAS:
+                continue
+            node = self.root
+            j = i + 1
+            while j < n:
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                j += 1
+            if node is not None and _FIN in node:
+                # La primera ancla que llega al final da la entidad más larga.
+                # Se recorta de la pregunta original (lower conserva el largo casi siempre)
+                # hasta el final, sin el "?": la puntuación de cierre es parte de la
+                # entidad ("Baião (música)")
+                spans = list(_RE_TOKEN.finditer(resto))
+                texto = pregunta[inicio:] if len(minusculas) == len(pregunta) else resto
+                texto = texto.rstrip().rstrip('?').rstrip()
+                return node[_FIN], texto[spans[i + 1].start():]
+        return None, None
+
+
+@lru_cache(maxsize=1 << 16)
+def _plegar(token: str) -> str:
+    return token.translate(TABLA_ACENTOS)
@@ -5,10 +5,12 @@ Script para convertir subset QA a formato completion para Logit Lens
 Transforma: "¿Cuál es X de Y?" -> "El X de Y es"
 """
 
-import json
 import re
 from typing import Dict, List
 
+from comun.columnar import load_json, prefer_parquet
+from comun.io_datos import save_dataset
+
 
 class QAToCompletionConverter:
     """Conversor de formato QA a formato Completion"""
@@ -79,8 +81,7 @@ class QAToCompletionConverter:
         
         # Leer subset QA
         print(f"📖 Leyendo {input_file}...")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(prefer_parquet(input_file))
         
         # Convertir a formato completion
         completion_data = []
@@ -114,8 +115,7 @@ class QAToCompletionConverter:
         
         # Guardar en formato completion
         print(f"\n💾 Guardando {output_file}...")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(completion_data, f, ensure_ascii=False, indent=4)
+        save_dataset(completion_data, output_file)
         
         # Mostrar estadísticas
         print(f"\n{'='*80}")
@@ -163,7 +163,7 @@ def main():
     parser.add_argument(
         '--output',
         default='subset_h2_completion.json',
-        help='Archivo completion de salida (default: subset_h2_completion.json)'
+        help='Archivo completion de salida, JSON o JSONL con .jsonl / .jsonl.gz / .jsonl.zst (default: subset_h2_completion.json)'
     )
     
     args = parser.parse_args()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Convierte datasets JSON/JSONL y CSV de tripletas a Parquet (ver comun.columnar)
+
+El .parquet queda junto al original con el mismo nombre; los scripts de
+minado, conversión y lens lo leen en lugar del original mientras no sea más
+viejo que él.
+
+    python convertir_a_parquet.py ../data/usa_qa.json ../data/subset_h2_final.json
+    python convertir_a_parquet.py tripletas_completas.csv
+    python convertir_a_parquet.py cine_latam.csv --encoding latin-1 --sep ';'
+"""
+
+import argparse
+import os
+import sys
+
+from comun.columnar import csv_to_parquet, json_to_parquet
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convertir datasets JSON/JSONL y tripletas CSV a Parquet')
+    parser.add_argument('archivos', nargs='+', help='Archivos .json, .jsonl o .csv')
+    parser.add_argument('--encoding', default='utf-8', help='Codificación de los CSV (default: utf-8)')
+    parser.add_argument('--sep', default=',', help='Separador de los CSV (default: ,)')
+    parser.add_argument('--chunk_size', type=int, default=50000,
+                        help='Filas por grupo al escribir listas planas (default: 50000)')
+    args = parser.parse_args()
+
+    print(f"{'='*80}")
+    print("CONVERSIÓN A PARQUET")
+    print(f"{'='*80}\n")
+
+    errores = 0
+    for archivo in args.archivos:
+        try:
+            if archivo.endswith('.csv'):
+                salida = csv_to_parquet(archivo, encoding=args.encoding, sep=args.sep)
+            else:
+                salida = json_to_parquet(archivo, chunk_size=args.chunk_size)
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️  {archivo}: {e}")
+            errores += 1
+            continue
+        antes = os.path.getsize(archivo)
+        despues = os.path.getsize(salida)
+        print(f"     {antes / 1e6:8.2f} MB → {despues / 1e6:8.2f} MB ({despues / antes:.1%})")
+
+    print(f"\n✓ {len(args.archivos) - errores} de {len(args.archivos)} archivos convertidos")
+    if errores:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,15 @@ Script para extraer subset balanceado usando los CSV originales como fuente de v
 Esto garantiza que las categorías sean 100% correctas
 """
 
-import json
-import csv
-import re
 from collections import defaultdict, Counter
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from comun.columnar import prefer_parquet
+from comun.indice_entidades import load_or_build_index
+from comun.io_datos import iter_chunks, iter_records, save_dataset
+from comun.normalizacion import normalizar_entidad
+from comun.paralelo import map_chunks_ordered, merge_counts, merge_groups, top_entities
+from comun.trie_entidades import EntityTrie
 
 
 class SubsetExtractor:
@@ -27,28 +31,14 @@ class SubsetExtractor:
         
         # Índice de entidades por categoría
         self.entity_index = defaultdict(set)
+        # Trie de tokens sobre el índice (se arma en build_entity_index)
+        self.entity_trie = EntityTrie()
+        # Pares (categoría, entidad) a guardar en la segunda pasada (None = todos)
+        self.selected = None
+        self.total_read = 0
         
-    def normalize_text(self, text: str) -> str:
-        """Normaliza texto para comparación"""
-        if not text:
-            return ""
-        text = text.lower().strip()
-        # Quitar acentos
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', 'ü': 'u', 'à': 'a', 'è': 'e', 'ì': 'i',
-            'ò': 'o', 'ù': 'u', 'ã': 'a', 'õ': 'o', 'ç': 'c'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text
-    
-    def load_entities_from_csv(self, category: str, csv_file: str, max_entities: int = 500):
-        """Carga entidades desde un archivo CSV con filtros específicos"""
-        print(f"  📄 Cargando {csv_file}...")
-        
-        # Palabras a excluir por categoría
-        exclusions = {
+        # Palabras que excluyen una entidad del CSV, por categoría
+        self.exclusions = {
             'indigenous_peoples': ['italiano', 'aleman', 'frances', 'ingles', 'judio', 
                                    'sefardi', 'libanes', 'sirio', 'europeo', 'asiatico',
                                    'africano', 'inmigracion', 'diaspora'],
@@ -59,55 +49,43 @@ class SubsetExtractor:
             'landmarks': []
         }
         
-        try:
-            with open(csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                entities = set()
-                excluded_count = 0
-                
-                for row in reader:
-                    entity = row.get('entidad', '').strip()
-                    if not entity:
-                        continue
-                    
-                    # Aplicar filtros de exclusión
-                    entity_norm = self.normalize_text(entity)
-                    excluded = False
-                    
-                    for exclusion_word in exclusions.get(category, []):
-                        if self.normalize_text(exclusion_word) in entity_norm:
-                            excluded = True
-                            excluded_count += 1
-                            break
-                    
-                    if not excluded:
-                        entities.add(entity)
-                        self.entity_index[category].add(entity_norm)
-                        
-                        if len(entities) >= max_entities:
-                            break
-                
-                msg = f"     ✓ {len(entities)} entidades cargadas"
-                if excluded_count > 0:
-                    msg += f" ({excluded_count} excluidas)"
-                print(msg)
-                return entities
-                
-        except FileNotFoundError:
-            print(f"     ⚠️  Archivo no encontrado: {csv_file}")
-            return set()
-        except Exception as e:
-            print(f"     ⚠️  Error: {e}")
-            return set()
+        # Palabras de validación por categoría (en respuestas)
+        self.validation_keywords = {
+            'indigenous_peoples': ['pueblo', 'indigena', 'etnia', 'nativo', 'tribu', 
+                                   'ancestral', 'originario', 'comunidad'],
+            'dances': ['danza', 'baile', 'ritmo', 'musica', 'folklore', 'folclore',
+                      'tradicional', 'genero musical'],
+            'painters': ['pintor', 'artista', 'obra', 'cuadro', 'pintura', 'museo',
+                        'exposicion', 'galeria', 'arte'],
+            'movies': ['pelicula', 'film', 'cine', 'director', 'actor', 'produccion'],
+            'landmarks': ['ubicado', 'situado', 'monumento', 'edificio', 'puente',
+                         'parque', 'catedral', 'plaza']
+        }
+        
+    def normalize_text(self, text: str) -> str:
+        """Normaliza texto para comparación"""
+        return normalizar_entidad(text)
     
-    def build_entity_index(self):
-        """Construye índice de todas las entidades de los CSV"""
+    def build_entity_index(self, cache_path: Optional[str] = 'indice_entidades.json',
+                           max_entities: Optional[int] = None, rebuild: bool = False):
+        """
+        Construye el índice de todas las entidades de los CSV
+        
+        Los CSV se leen completos (por bloques) y el índice se guarda en
+        `cache_path`; las corridas siguientes lo reutilizan mientras ningún
+        CSV cambie (ver comun.indice_entidades).
+        """
         print(f"\n{'='*80}")
         print("CONSTRUYENDO ÍNDICE DE ENTIDADES DESDE CSV")
         print(f"{'='*80}\n")
         
-        for category, csv_file in self.csv_files.items():
-            self.load_entities_from_csv(category, csv_file)
+        index = load_or_build_index(self.csv_files, self.exclusions, cache_path, max_entities, rebuild)
+        for category, entities in index.items():
+            self.entity_index[category].update(entities)
+        
+        self.entity_trie = EntityTrie.from_index(
+            self.entity_index, ['indigenous_peoples', 'dances', 'painters', 'movies', 'landmarks']
+        )
         
         # Mostrar resumen
         print(f"\n{'='*80}")
@@ -117,44 +95,19 @@ class SubsetExtractor:
             count = len(self.entity_index[category])
             print(f"{category:25s}: {count:6,} entidades indexadas")
     
-    def extract_entity_from_question(self, pregunta: str) -> str:
-        """Extrae la entidad de la pregunta"""
-        # Patrones comunes en español
-        patterns = [
-            r'de (.+)\?$',
-            r'¿Cuál es .+ de (.+)\?',
-            r'¿Cuál es el .+ de (.+)\?',
-            r'¿Cuál es la .+ de (.+)\?',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, pregunta)
-            if match:
-                entity = match.group(1).strip()
-                # Limpiar palabras comunes al final
-                entity = re.sub(r'\s+(de|en|del|la|el|los|las)$', '', entity, flags=re.IGNORECASE)
-                return entity
-        
-        return ""
-    
     def categorize_question(self, pregunta: str, respuesta: str) -> tuple:
         """
         Categoriza una pregunta basándose en el índice de entidades CSV
         
+        Busca en la pregunta la entidad indexada más larga (con el trie de
+        tokens, así "Palacio de la Moneda" no se corta en el primer " de ").
+        
         Returns:
             (category, entity) o (None, None) si no coincide
         """
-        # Extraer entidad de la pregunta
-        entity = self.extract_entity_from_question(pregunta)
-        if not entity:
-            return None, None
-        
-        entity_norm = self.normalize_text(entity)
-        
-        # Buscar en qué categoría está esta entidad
-        for category in ['indigenous_peoples', 'dances', 'painters', 'movies', 'landmarks']:
-            if entity_norm in self.entity_index[category]:
-                return category, entity
+        category, entity = self.entity_trie.find(pregunta)
+        if category:
+            return category, entity
         
         # También buscar en la respuesta
         respuesta_norm = self.normalize_text(respuesta)
@@ -164,38 +117,9 @@ class SubsetExtractor:
         
         return None, None
     
-    def extract_subset(self, dataset_file: str, samples_per_category: int = 30):
-        """Extrae subset balanceado del dataset con validación estricta"""
-        print(f"\n{'='*80}")
-        print(f"EXTRAYENDO SUBSET DE: {dataset_file}")
-        print(f"{'='*80}\n")
-        
-        # Leer dataset
-        print("📖 Leyendo dataset...")
-        with open(dataset_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"✓ {len(data):,} preguntas cargadas\n")
-        
-        # Palabras de validación por categoría (en respuestas)
-        validation_keywords = {
-            'indigenous_peoples': ['pueblo', 'indigena', 'etnia', 'nativo', 'tribu', 
-                                   'ancestral', 'originario', 'comunidad'],
-            'dances': ['danza', 'baile', 'ritmo', 'musica', 'folklore', 'folclore',
-                      'tradicional', 'genero musical'],
-            'painters': ['pintor', 'artista', 'obra', 'cuadro', 'pintura', 'museo',
-                        'exposicion', 'galeria', 'arte'],
-            'movies': ['pelicula', 'film', 'cine', 'director', 'actor', 'produccion'],
-            'landmarks': ['ubicado', 'situado', 'monumento', 'edificio', 'puente',
-                         'parque', 'catedral', 'plaza']
-        }
-        
-        # Agrupar preguntas por entidad y categoría
-        print("🔍 Categorizando preguntas usando índice CSV...")
-        entities_by_category = defaultdict(lambda: defaultdict(list))
-        category_stats = Counter()
-        categorized = 0
-        
-        for i, item in enumerate(data, 1):
+    def iter_categorized(self, items: List[Dict]) -> Iterator[Tuple[str, str, str, str]]:
+        """(categoría, entidad, pregunta, respuesta) de las preguntas de un bloque que pasan la validación"""
+        for item in items:
             pregunta = item.get('pregunta', '')
             respuesta = item.get('respuesta_correcta', '')
             
@@ -211,7 +135,7 @@ class SubsetExtractor:
                 # O que sea una categoría específica que confíe en el CSV
                 has_validation = any(
                     self.normalize_text(keyword) in texto_completo
-                    for keyword in validation_keywords.get(category, [])
+                    for keyword in self.validation_keywords.get(category, [])
                 )
                 
                 # Relajar validación para categorías con pocos datos
@@ -230,27 +154,108 @@ class SubsetExtractor:
                             has_validation = False
                 
                 if has_validation or category in ['landmarks', 'movies']:  # Menos estricto para estas
-                    entities_by_category[category][entity].append({
-                        'pregunta': pregunta,
-                        'respuesta_correcta': respuesta
-                    })
-                    category_stats[category] += 1
-                    categorized += 1
-            
-            if i % 10000 == 0:
-                print(f"  Procesadas {i:,} preguntas ({categorized:,} categorizadas)...")
+                    yield category, entity, pregunta, respuesta
+    
+    def aggregate_chunk(self, items: List[Dict]) -> Tuple[Dict, int, int]:
+        """
+        Categoriza y valida un bloque de preguntas, agrupándolas por entidad
         
-        print(f"\n✓ {categorized:,} preguntas categorizadas de {len(data):,} totales\n")
+        Si `self.selected` tiene pares (categoría, entidad), solo guarda esas
+        (segunda pasada del modo en dos pasadas).
+        
+        Returns:
+            ({categoría: {entidad: [qa, ...]}}, preguntas leídas, categorizadas)
+        """
+        partial = defaultdict(lambda: defaultdict(list))
+        categorized = 0
+        for category, entity, pregunta, respuesta in self.iter_categorized(items):
+            categorized += 1
+            if self.selected is None or (category, entity) in self.selected:
+                partial[category][entity].append({
+                    'pregunta': pregunta,
+                    'respuesta_correcta': respuesta
+                })
+        return {cat: dict(entities) for cat, entities in partial.items()}, len(items), categorized
+    
+    def count_chunk(self, items: List[Dict]) -> Tuple[Dict, int, int]:
+        """
+        Primera pasada: solo cuenta preguntas por categoría y entidad
+        
+        Returns:
+            ({categoría: {entidad: preguntas}}, preguntas leídas, categorizadas)
+        """
+        partial = defaultdict(Counter)
+        categorized = 0
+        for category, entity, _, _ in self.iter_categorized(items):
+            partial[category][entity] += 1
+            categorized += 1
+        return {cat: dict(counts) for cat, counts in partial.items()}, len(items), categorized
+    
+    def _read(self, dataset_file: str, method: str, merge, workers: int, chunk_size: int) -> Dict:
+        """Recorre el dataset por bloques con `method` y combina los parciales en el orden del dataset"""
+        total = {}
+        categorized = 0
+        i = 0
+        bloques = iter_chunks(iter_records(prefer_parquet(dataset_file)), chunk_size)
+        for partial, leidas, categorizadas in map_chunks_ordered(self, method, bloques, workers):
+            merge(total, partial)
+            categorized += categorizadas
+            i += leidas
+            print(f"  Procesadas {i:,} preguntas ({categorized:,} categorizadas)...")
+        self.total_read = i
+        return total
+    
+    def extract_subset(self, dataset_file: str, samples_per_category: int = 30,
+                       workers: int = 1, chunk_size: int = 10000, two_pass: bool = False):
+        """
+        Extrae subset balanceado del dataset con validación estricta
+        
+        Con `two_pass` la primera pasada solo cuenta preguntas por entidad y
+        la segunda guarda las preguntas de las entidades elegidas: la memoria
+        es O(entidades + preguntas elegidas) en lugar de O(todas las preguntas).
+        """
+        print(f"\n{'='*80}")
+        print(f"EXTRAYENDO SUBSET DE: {dataset_file}")
+        print(f"{'='*80}\n")
+        
+        # Agrupar preguntas por entidad y categoría (por bloques, repartidos
+        # entre `workers` procesos y combinados en el orden del dataset)
+        print("🔍 Leyendo y categorizando preguntas usando índice CSV...")
+        if workers > 1:
+            print(f"  {workers} procesos, bloques de {chunk_size:,} preguntas")
+        
+        self.selected = None
+        if two_pass:
+            print("  Pasada 1: contando preguntas por entidad")
+            entity_counts = self._read(dataset_file, 'count_chunk', merge_counts, workers, chunk_size)
+        else:
+            entities_by_category = self._read(dataset_file, 'aggregate_chunk', merge_groups, workers, chunk_size)
+            entity_counts = {
+                cat: {entity: len(preguntas) for entity, preguntas in entities.items()}
+                for cat, entities in entities_by_category.items()
+            }
+        
+        categorized = sum(sum(counts.values()) for counts in entity_counts.values())
+        print(f"\n✓ {categorized:,} preguntas categorizadas de {self.total_read:,} totales\n")
         
         # Estadísticas
         print(f"{'='*80}")
         print("ESTADÍSTICAS DE CATEGORIZACIÓN")
         print(f"{'='*80}")
         for cat in ['indigenous_peoples', 'dances', 'painters', 'movies', 'landmarks']:
-            count = category_stats.get(cat, 0)
-            num_entities = len(entities_by_category[cat])
+            count = sum(entity_counts.get(cat, {}).values())
+            num_entities = len(entity_counts.get(cat, {}))
             print(f"{cat:25s}: {count:6,} preguntas | {num_entities:5,} entidades")
         
+        # Top N por número de preguntas
+        top = {cat: top_entities(counts, samples_per_category) for cat, counts in entity_counts.items()}
+        
+        if two_pass:
+            print("\n🔍 Pasada 2: guardando las preguntas de las entidades elegidas")
+            self.selected = {(cat, entity) for cat, entities in top.items() for entity, _ in entities}
+            entities_by_category = self._read(dataset_file, 'aggregate_chunk', merge_groups, workers, chunk_size)
+            self.selected = None
+        
         # Construir subset balanceado
         print(f"\n{'='*80}")
         print(f"EXTRAYENDO SUBSET ({samples_per_category} entidades por categoría)")
@@ -261,19 +266,10 @@ class SubsetExtractor:
         for category in ['indigenous_peoples', 'dances', 'painters', 'movies', 'landmarks']:
             subset[category] = []
             
-            # Ordenar por número de preguntas
-            entities = entities_by_category[category]
-            sorted_entities = sorted(
-                entities.items(),
-                key=lambda x: len(x[1]),
-                reverse=True
-            )
-            
-            # Tomar top N
-            for entity, preguntas in sorted_entities[:samples_per_category]:
+            for entity, _ in top.get(category, []):
                 subset[category].append({
                     'entidad': entity,
-                    'preguntas': preguntas,
+                    'preguntas': entities_by_category[category][entity],
                     'category': category
                 })
             
@@ -295,8 +291,8 @@ class SubsetExtractor:
         print(f"GUARDANDO: {output_file}")
         print(f"{'='*80}\n")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(subset, f, ensure_ascii=False, indent=4)
+        # JSON indentado, o JSONL (.jsonl, .jsonl.gz, .jsonl.zst) con una entidad por línea
+        save_dataset(subset, output_file)
         
         total_entities = sum(len(subset[cat]) for cat in subset)
         total_questions = sum(
@@ -324,7 +320,7 @@ def main():
     parser.add_argument(
         '--output',
         default='subset_h2_final.json',
-        help='Archivo de salida (default: subset_h2_final.json)'
+        help='Archivo de salida, JSON o JSONL con .jsonl / .jsonl.gz / .jsonl.zst (default: subset_h2_final.json)'
     )
     parser.add_argument(
         '--samples',
@@ -332,13 +328,46 @@ def main():
         default=30,
         help='Entidades por categoría (default: 30)'
     )
+    parser.add_argument(
+        '--index_cache',
+        default='indice_entidades.json',
+        help='Índice de entidades guardado; se reconstruye si cambia un CSV (default: indice_entidades.json)'
+    )
+    parser.add_argument(
+        '--rebuild_index',
+        action='store_true',
+        help='Reconstruir el índice desde los CSV aunque esté al día'
+    )
+    parser.add_argument(
+        '--max_entities',
+        type=int,
+        default=0,
+        help='Entidades por CSV en el índice (default: 0 = todas)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Procesos para categorizar (default: 1, en serie)'
+    )
+    parser.add_argument(
+        '--chunk_size',
+        type=int,
+        default=10000,
+        help='Preguntas por bloque (default: 10000)'
+    )
+    parser.add_argument(
+        '--two_pass',
+        action='store_true',
+        help='Contar primero y guardar solo las preguntas de las entidades elegidas (menos memoria)'
+    )
     
     args = parser.parse_args()
     
     # Ejecutar
     extractor = SubsetExtractor()
-    extractor.build_entity_index()
-    subset = extractor.extract_subset(args.dataset, args.samples)
+    extractor.build_entity_index(args.index_cache or None, args.max_entities or None, args.rebuild_index)
+    subset = extractor.extract_subset(args.dataset, args.samples, args.workers, args.chunk_size, args.two_pass)
     extractor.save_subset(subset, args.output)
     
     print(f"{'='*80}")
@@ -1,12 +1,18 @@
 import pandas as pd
 import os
-from langdetect import detect, LangDetectException 
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import parquet_path, write_dataframe
+from comun.idioma import language_mask
 
 print("--- Iniciando Script para mezclar csvs ---")
 
 archivo_canon = "canon_basic.csv"
 archivo_pintores = "pintores_latam_4671Entities.csv"
 archivo_salida = "tripletas_completas.csv"
+cache_idioma = "cache_idioma.json"  # Idiomas ya detectados de corridas anteriores
+workers = os.cpu_count() or 1       # Procesos para langdetect
 
 columnas_estandar = ['entidad', 'relacion', 'valor']
 
@@ -32,18 +38,9 @@ else:
         df_completo = df_completo.dropna()
         df_completo = df_completo.drop_duplicates()
 
-        def es_espanol(texto):
-            
-            if not isinstance(texto, str) or len(texto.strip()) < 3:
-                 return False
-            try:
-                return detect(texto) == 'es'
-            except LangDetectException:
-                return False
-            except Exception as e:
-                return False
-            
-        df_completo['es_espanol'] = df_completo['valor'].apply(es_espanol)
+        # Cada valor distinto se detecta una vez (con caché y semilla fija)
+        df_completo['es_espanol'] = language_mask(df_completo['valor'], 'es', min_len=3,
+                                                  cache_path=cache_idioma, workers=workers)
         
         df_filtrado_es = df_completo[df_completo['es_espanol'] == True].copy()
 
@@ -52,6 +49,12 @@ else:
         print(f"Filtrado completo. Se conservaron {len(df_filtrado_es)} tripletas en español.")
 
         df_filtrado_es.to_csv(archivo_salida, index=False, encoding='utf-8')
+        # Versión columnar (la leen 2_generador_qa.py y util_ver_relaciones.py si está al día)
+        try:
+            write_dataframe(df_filtrado_es, parquet_path(archivo_salida), 'tripletas')
+            print(f"Versión Parquet: '{parquet_path(archivo_salida)}'")
+        except ImportError as e:
+            print(f"No se escribió la versión Parquet: {e}")
 
         print(f"\n¡Éxito! Se estandarizaron y mezclaron los CSVs.")
         print(f"Se guardó el archivo '{archivo_salida}' con {len(df_filtrado_es)} tripletas únicas,\
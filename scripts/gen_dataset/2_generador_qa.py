@@ -1,7 +1,15 @@
 import pandas as pd
-import json
+import numpy as np
 import os
 import sys
+import time
+from itertools import chain
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import iter_triples, prefer_parquet, write_dataframes
+from comun.io_datos import write_json_frames
+from comun.plantillas_qa import preguntas_de
+
 try:
     from unidecode import unidecode # Aún necesario para normalizar blacklist/mapa
 except ImportError:
@@ -10,64 +18,7 @@ except ImportError:
 
 print("--- Iniciando Script: Generador de QA Individual (SIN filtro idioma) ---")
 
-# --- MAPA Y BLACKLIST (Asegúrate de que estén completos) ---
-MAPA_PREGUNTAS = {
-    # Relaciones en español (de pintores_latam)
-    'lugar de nacimiento': 'el lugar de nacimiento',
-    'instancia de': 'un tipo de',
-    'lugar de fallecimiento': 'el lugar de fallecimiento',
-    'educado en': 'dónde fue educado',
-    'ocupación': 'la ocupación',
-    'país de nacionalidad': 'el país de nacionalidad',
-    'movimiento': 'el movimiento artístico/cultural',
-    'premio recibido': 'el premio recibido',
-    'género': 'el género',
-    'sello discográfico': 'el sello discográfico',
-    'pareja': 'la pareja',
-    'influenciado por': 'quién lo influenció',
-    'forma parte de': 'de qué forma parte',
-    'obra destacada': 'la obra destacada',
-    'instrumento': 'el instrumento que toca',
-    
-    # Relaciones en inglés (principalmente de canon_basic)
-    'author': 'el autor',
-    'country of origin': 'el país de origen',
-    'country of citizenship': 'el país de ciudadanía',
-    'country': 'el país',
-    'located in the administrative territorial entity': 'la ubicación administrativa',
-    'instance of': 'un tipo de', # Duplicado intencional
-    'headquarters location': 'la ubicación de la sede',
-    'location': 'la ubicación',
-    'occupation': 'la ocupación', # Duplicado intencional
-    'position held': 'el puesto ocupado',
-    'member of political party': 'el partido político',
-    'place of birth': 'el lugar de nacimiento', # Duplicado intencional
-    'date of birth': 'la fecha de nacimiento',
-    'publication date': 'la fecha de publicación',
-    'date of death': 'la fecha de muerte',
-    'place of death': 'el lugar de muerte', # Duplicado intencional
-    'founded by': 'el fundador',
-    'child': 'el hijo/a',
-    'member of': 'miembro de',
-    'religion': 'la religión',
-    'spouse': 'el/la cónyuge', # Duplicado intencional
-    'field of work': 'el campo de trabajo',
-    'cause of death': 'la causa de muerte',
-    'currency': 'la moneda',
-    'height': 'la altura',
-    'notable work': 'la obra destacada', # Duplicado intencional
-    'movement': 'el movimiento artístico/cultural', # Duplicado intencional
-    'population': 'la población',
-    'place of burial': 'el lugar de sepultura',
-    'manner of death': 'la forma de muerte',
-    'official language': 'el idioma oficial',
-    'family': 'la familia',
-    'director': 'el director',
-    'screenwriter': 'el guionista',
-    'native language': 'el idioma nativo',
-    # Añade MÁS relaciones aquí si son relevantes
-}
-
+# --- BLACKLIST (el mapa de relaciones está en comun/plantillas_qa.py) ---
 BLACKLIST_RELACIONES_RAW = {
     'Chile', '16 de marzo de 1935', 'chileno', 'doma',
     'lugar de nacimiento', 'instancia de', 'lugar de fallecimiento', 'educado en',
@@ -77,65 +28,86 @@ BLACKLIST_RELACIONES_RAW = {
 }
 BLACKLIST_RELACIONES = {unidecode(r.lower()) for r in BLACKLIST_RELACIONES_RAW}
 
+# Tripletas leídas por bloque (la memoria no crece con el CSV)
+FILAS_POR_BLOQUE = 100000
+
+COLUMNAS_NECESARIAS = ['entidad', 'relacion', 'valor']
+
+
+def por_relacion(relaciones, funcion):
+    """Aplica `funcion` una vez por relación distinta y la expande a la columna"""
+    codigos, unicas = pd.factorize(relaciones)
+    return np.array([funcion(r) for r in unicas], dtype=bool)[codigos]
+
+
+def en_blacklist(relacion):
+    return unidecode(relacion.lower()) in BLACKLIST_RELACIONES
+
+
+def formato_invalido(relacion):
+    return '%' in relacion or len(relacion) < 2 or len(relacion) > 80
+
+
+def generar_qa(bloques, conteos):
+    """Pares pregunta/respuesta de cada bloque de tripletas, con operaciones sobre columnas"""
+    for df in bloques:
+        # Filas con algún vacío: no hay pregunta posible
+        completas = df[COLUMNAS_NECESARIAS].notna().all(axis=1)
+        conteos['formato'] += int((~completas).sum())
+        df = df.loc[completas, COLUMNAS_NECESARIAS].astype(str)
+
+        # Ignorar si está en blacklist o es formato inválido
+        blacklist = por_relacion(df['relacion'], en_blacklist)
+        formato = ~blacklist & por_relacion(df['relacion'], formato_invalido)
+        conteos['blacklist'] += int(blacklist.sum())
+        conteos['formato'] += int(formato.sum())
+        df = df[~(blacklist | formato)]
+
+        # El valor ya debería estar en español (o inglés si es USA)
+        yield pd.DataFrame({
+            'pregunta': preguntas_de(df['relacion'], df['entidad']),
+            'respuesta_correcta': df['valor'],
+        })
+
+
 # --- Leer argumentos ---
 if len(sys.argv) != 3:
-    print("Error: Debes proporcionar el nombre del CSV de entrada y el JSON de salida.")
-    print("Uso: python generador_qa_individual.py <archivo_entrada.csv> <archivo_salida.json>")
+    print("Error: Debes proporcionar el nombre del CSV de entrada y el archivo de salida.")
+    print("Uso: python 2_generador_qa.py <archivo_entrada.csv> <archivo_salida.json|.jsonl|.jsonl.gz|.jsonl.zst|.parquet>")
     exit()
 
 input_csv_file = sys.argv[1]
 output_json_file = sys.argv[2]
 
 # --- Procesamiento ---
-dataset_qa = []
-filas_ignoradas_blacklist = 0
-filas_ignoradas_formato = 0
-
 if not os.path.exists(input_csv_file):
     print(f"Error: No se encuentra el archivo de entrada '{input_csv_file}'.")
 else:
     print(f"Procesando archivo: {input_csv_file}")
     # Asumimos UTF-8 porque los scripts de merge guardan en UTF-8
-    df = pd.read_csv(input_csv_file, index_col=False, encoding='utf-8') 
-    
+    origen = prefer_parquet(input_csv_file)
+    # Del CSV todo como texto: los valores quedan tal como están escritos
+    opciones = {} if origen.endswith('.parquet') else {'encoding': 'utf-8', 'dtype': str}
+    bloques = iter_triples(origen, chunk_size=FILAS_POR_BLOQUE, **opciones)
+    primero = next(bloques, None)
+
     # Verificar que existan las columnas estándar
-    columnas_necesarias = ['entidad', 'relacion', 'valor']
-    if not all(col in df.columns for col in columnas_necesarias):
-         print(f"Error: El CSV debe contener las columnas {columnas_necesarias}.")
-         print(f"Columnas encontradas: {df.columns.tolist()}")
+    if primero is not None and not all(col in primero.columns for col in COLUMNAS_NECESARIAS):
+         print(f"Error: El CSV debe contener las columnas {COLUMNAS_NECESARIAS}.")
+         print(f"Columnas encontradas: {primero.columns.tolist()}")
          exit()
-         
-    # --- Generación de QA (SIN FILTRO IDIOMA) ---
-    print("Generando pares Pregunta/Respuesta...")
-    for index, row in df.iterrows():
-        entidad = str(row['entidad'])
-        relacion = str(row['relacion'])
-        valor = str(row['valor']) # Ya debería ser el valor en español (o inglés si es USA)
-        
-        relacion_norm = unidecode(relacion.lower())
-
-        # Ignorar si está en blacklist o es formato inválido
-        if relacion_norm in BLACKLIST_RELACIONES:
-            filas_ignoradas_blacklist += 1
-            continue
-        if '%' in relacion or len(relacion) < 2 or len(relacion) > 80:
-            filas_ignoradas_formato += 1
-            continue
-            
-        plantilla_relacion = MAPA_PREGUNTAS.get(relacion, relacion) 
-        pregunta = f"¿Cuál es {plantilla_relacion} de {entidad}?"
-        
-        respuesta_correcta = valor
-        
-        dataset_qa.append({
-            "pregunta": pregunta,
-            "respuesta_correcta": respuesta_correcta
-        })
+    bloques = [] if primero is None else chain([primero], bloques)
 
-    # Guardar el JSON
-    with open(output_json_file, 'w', encoding='utf-8') as f:
-        json.dump(dataset_qa, f, ensure_ascii=False, indent=4)
+    # --- Generación de QA (SIN FILTRO IDIOMA), escrita bloque a bloque ---
+    print("Generando pares Pregunta/Respuesta...")
+    inicio = time.perf_counter()
+    conteos = {'blacklist': 0, 'formato': 0}
+    pares = generar_qa(bloques, conteos)
+    if output_json_file.endswith('.parquet'):
+        total = write_dataframes(pares, output_json_file, 'plano')
+    else:
+        total = write_json_frames(pares, output_json_file)
 
-    print(f"\n¡Éxito! Se ha creado '{output_json_file}' con {len(dataset_qa)} pares QA.")
-    print(f"(Se ignoraron {filas_ignoradas_blacklist} filas por blacklist, {filas_ignoradas_formato} por formato)")
-    print("-------------------------------------------------")
\ No newline at end of file
+    print(f"\n¡Éxito! Se ha creado '{output_json_file}' con {total} pares QA ({time.perf_counter() - inicio:.1f} s).")
+    print(f"(Se ignoraron {conteos['blacklist']} filas por blacklist, {conteos['formato']} por formato)")
+    print("-------------------------------------------------")
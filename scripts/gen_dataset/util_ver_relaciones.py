@@ -1,9 +1,15 @@
+import os
+import sys
+
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import prefer_parquet, read_triples
+
 print("--- Viendo todas las relaciones únicas ---")
 
 try:
-    df = pd.read_csv("tripletas_completas.csv")
+    df = read_triples(prefer_parquet("tripletas_completas.csv"), columns=['relacion'])
     relaciones_unicas = df['relacion'].unique()
     
     print(f"Encontradas {len(relaciones_unicas)} relaciones únicas en tu dataset:")
@@ -11,7 +17,7 @@ try:
     for r in relaciones_unicas:
         print(f"  - '{r}'")
         
-    print("\nCopia estas relaciones en el 'MAPA_PREGUNTAS' de tu script '2_generador_qa.py'")
+    print("\nCopia estas relaciones en el 'MAPA_PREGUNTAS' de scripts/comun/plantillas_qa.py")
     
 except FileNotFoundError:
     print("Error: No se encuentra 'tripletas_completas.csv'. Ejecuta el script 1 primero.")
\ No newline at end of file
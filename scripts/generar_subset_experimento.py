@@ -1,13 +1,15 @@
-import json
 import os
 from collections import Counter
 
+from comun.io_datos import iter_records, save_dataset
+from comun.plantillas_qa import extraer_entidad
+
 print("--- Generando Subset LIMPIO para Experimento ---")
 
 # Archivos de entrada
 FILES_LATAM = ["tomy_qa.json", "justo_qa.json"]
 FILE_USA = "usa_qa.json"
-OUTPUT_FILE = "subset_experimento_preliminar.json"
+OUTPUT_FILE = "subset_experimento_preliminar.json"  # .jsonl.gz / .jsonl.zst: JSONL comprimido
 
 # Lista de palabras a ignorar (Basura detectada)
 BLACKLIST = [
@@ -23,13 +25,11 @@ def cargar_y_filtrar(filenames, top_n=10):
         if not os.path.exists(filename):
             continue
             
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        for item in data:
+        # Pregunta a pregunta: justo_qa.json tiene 310K y no hace falta cargarlo entero
+        for item in iter_records(filename):
             try:
-                # Extraer entidad
-                entidad = item['pregunta'].split(" de ")[-1].replace("?", "").strip()
+                # Extraer entidad (cortando tras la relación: conserva los " de " del título)
+                entidad = extraer_entidad(item['pregunta'])
                 
                 # --- FILTROS DE LIMPIEZA ---
                 # 1. Ignorar si está en la lista negra
@@ -73,7 +73,6 @@ for ent, count in top_usa:
     subset_final["usa"].append({"entidad": ent, "preguntas": data_usa[ent]})
 
 # 3. Guardar
-with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-    json.dump(subset_final, f, ensure_ascii=False, indent=4)
+save_dataset(subset_final, OUTPUT_FILE)
 
 print(f"\n¡Listo! Archivo '{OUTPUT_FILE}' generado.")
\ No newline at end of file
@@ -6,7 +6,10 @@ import pandas as pd
 from tqdm import tqdm
 import os
 import argparse
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import load_json, prefer_parquet
 
 # --- Clases de Wrappers (Actualizadas para Qwen) ---
 class AttnWrapper(torch.nn.Module):
@@ -248,8 +251,7 @@ def main():
 
     # Cargar el dataset de Hugging Face
     dataset_path = '/workspace1/gonzalo.fuentes/proyecto_generativa/dataset_completion_base_full.json'
-    with open(dataset_path, 'r') as f:
-        data = json.load(f)
+    data = load_json(prefer_parquet(dataset_path))
     
     lista_prompts = []
     # (El código de aplanado es el mismo que en el notebook...)
@@ -10,6 +10,10 @@ from collections import Counter
 import argparse
 import json
 import gc
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import load_json, prefer_parquet
 
 # ===============================================================
 # 1. DEFINICIONES DE CLASES Y FUNCIONES (Idéntico al notebook)
@@ -209,8 +213,7 @@ def main():
         return
 
     # --- Cargar y aplanar el dataset ---
-    with open('/workspace1/gonzalo.fuentes/proyecto_generativa/dataset_completion_base_full.json', 'r') as f:
-        data = json.load(f)
+    data = load_json(prefer_parquet('/workspace1/gonzalo.fuentes/proyecto_generativa/dataset_completion_base_full.json'))
     
     lista_prompts = []
     for region in ['latam', 'usa']:
@@ -6,7 +6,10 @@ import pandas as pd
 from tqdm import tqdm
 import os
 import argparse
-import json
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.columnar import load_json, prefer_parquet
 
 # --- Clases de Wrappers (Actualizadas para Qwen) ---
 class AttnWrapper(torch.nn.Module):
@@ -93,11 +96,12 @@ class BlockOutputWrapper(torch.nn.Module):
 
 # --- Clase Helper y Función de Análisis ---
 class Qwen3_8BHelper:
-    def __init__(self, token, gpu_id):
+    def __init__(self, token, gpu_id, wrap_layers=True):
         self.device = f"cuda:{gpu_id}"
         self.tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-7B-Instruct", trust_remote_code=True, token=token)
         self.model = AutoModelForCausalLM.from_pretrained("Qwen/Qwen2.5-7B-Instruct", trust_remote_code=True, token=token).to(self.device)
-        for i, layer in enumerate(self.model.model.layers):
+        # En modo compilado no se envuelven las capas: el lens compilado lee los hidden states
+        for i, layer in enumerate(self.model.model.layers if wrap_layers else []):
             self.model.model.layers[i] = BlockOutputWrapper(layer, self.model.lm_head, self.model.model.norm).to(self.device)
 
     def get_logits(self, prompt):
@@ -122,11 +126,11 @@ class Qwen3_8BHelper:
             self.model.model.layers[i].reset()
 
 class Llama3_1_8BHelper:
-    def __init__(self, token, gpu_id):
+    def __init__(self, token, gpu_id, wrap_layers=True):
         self.device = f"cuda:{gpu_id}"
         self.tokenizer = AutoTokenizer.from_pretrained("meta-llama/Meta-Llama-3.1-8B-Instruct", token=token)
         self.model = AutoModelForCausalLM.from_pretrained("meta-llama/Meta-Llama-3.1-8B-Instruct", token=token).to(self.device)
-        for i, layer in enumerate(self.model.model.layers):
+        for i, layer in enumerate(self.model.model.layers if wrap_layers else []):
             self.model.model.layers[i] = LlamaBlockOutputWrapper(layer, self.model.lm_head, self.model.model.norm).to(self.device)
 
     def get_logits(self, prompt):
@@ -153,11 +157,11 @@ class LlamaBlockOutputWrapper(torch.nn.Module):
     def reset(self):
         self.block_output_unembedded = None
 
-def get_model_helper(model_name, token, gpu_id):
+def get_model_helper(model_name, token, gpu_id, wrap_layers=True):
     if model_name == "llama3":
-        return Llama3_1_8BHelper(token, gpu_id)
+        return Llama3_1_8BHelper(token, gpu_id, wrap_layers)
     elif model_name == "qwen3":
-        return Qwen3_8BHelper(token, gpu_id)
+        return Qwen3_8BHelper(token, gpu_id, wrap_layers)
     else:
         raise ValueError(f"Modelo '{model_name}' no soportado.")
 
@@ -225,6 +229,34 @@ def analizar_trayectorias(model_helper, data):
             todas_las_trayectorias.append(df_trayectoria)
     return pd.concat(todas_las_trayectorias)
 
+def analizar_trayectorias_compilado(model_helper, data, lens):
+    """Igual que analizar_trayectorias, pero con el lens compilado (por batches)"""
+    filas, prompt_ids, target_ids = [], [], []
+    for idx, fila in data.iterrows():
+        # Mismos filtros que get_probability_trajectory
+        if not fila['prompt'] or not fila['ground_truth']:
+            continue
+        prompt_tokens = model_helper.tokenizer(fila['prompt'], add_special_tokens=False)['input_ids']
+        gt_tokens = model_helper.tokenizer(fila['ground_truth'], add_special_tokens=False)['input_ids']
+        if not prompt_tokens or not gt_tokens or gt_tokens[0] >= model_helper.model.config.vocab_size:
+            continue
+        filas.append((idx, fila['category']))
+        prompt_ids.append(model_helper.tokenizer(fila['prompt'])['input_ids'])
+        target_ids.append(gt_tokens[0])
+
+    gt_probs, top_probs = lens.trajectories(prompt_ids, target_ids)
+    num_layers = gt_probs.shape[1]
+    resultados = pd.DataFrame({
+        'layer': list(range(num_layers)) * len(filas),
+        'ground_truth_prob': gt_probs.reshape(-1).tolist(),
+        'top_1_prob': top_probs.reshape(-1).tolist(),
+        'category': [category for _, category in filas for _ in range(num_layers)],
+        'prompt_id': [f"p_{idx}" for idx, _ in filas for _ in range(num_layers)],
+    })
+    print(f"Lens compilado: {len(lens.compiled_shapes)} formas compiladas en {lens.stats['warmup_seconds']:.1f}s; "
+          f"{lens.stats['calls']} batches más en {lens.stats['seconds']:.1f}s")
+    return resultados
+
 # --- Lógica Principal del Script ---
 def main():
     parser = argparse.ArgumentParser(description="Analizar trayectorias de logits en paralelo.")
@@ -233,6 +265,9 @@ def main():
     parser.add_argument("--total_partitions", type=int, required=True, help="Número total de particiones.")
     parser.add_argument("--model_name", type=str, default="llama3", help="Nombre del modelo a utilizar (llama3 o qwen3).")
     parser.add_argument("--results_dir", type=str, default="resultados", help="Directorio donde guardar los resultados.")
+    parser.add_argument("--compilado", action="store_true", help="Usar el lens compilado (torch.compile, formas estáticas por bucket).")
+    parser.add_argument("--bucket", type=int, default=32, help="Múltiplo al que se rellenan los prompts en --compilado.")
+    parser.add_argument("--batch_size", type=int, default=8, help="Prompts por forward en --compilado.")
     args = parser.parse_args()
 
     # --- Carga de Datos y Modelo ---
@@ -241,15 +276,14 @@ def main():
         raise ValueError("La variable de entorno HUGGING_FACE_TOKEN no está configurada.")
 
     try:
-        model_helper = get_model_helper(args.model_name, HUGGING_FACE_TOKEN, args.gpu_id)
+        model_helper = get_model_helper(args.model_name, HUGGING_FACE_TOKEN, args.gpu_id, wrap_layers=not args.compilado)
     except ValueError as e:
         print(f"Error: {e}")
         return
 
     # Cargar el dataset de Hugging Face
     dataset_path = '/workspace1/gonzalo.fuentes/proyecto_generativa/subset_h2_completion.json'
-    with open(dataset_path, 'r') as f:
-        data = json.load(f)
+    data = load_json(prefer_parquet(dataset_path))
     
     lista_prompts = []
     # El nuevo formato es una lista directa de objetos
@@ -274,7 +308,12 @@ def main():
     print(f"Procesando {len(df_partition)} muestras...")
 
     # --- Procesamiento ---
-    resultados = analizar_trayectorias(model_helper, df_partition)
+    if args.compilado:
+        from comun.compilado import CompiledLens
+        lens = CompiledLens(model_helper.model, model_helper.tokenizer, bucket=args.bucket, batch_size=args.batch_size)
+        resultados = analizar_trayectorias_compilado(model_helper, df_partition, lens)
+    else:
+        resultados = analizar_trayectorias(model_helper, df_partition)
 
     # --- Guardar Resultados ---
     results_dir = args.results_dir
@@ -1,184 +1,24 @@
 import warnings
 warnings.filterwarnings("ignore")
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, AutoModelForVision2Seq, AutoModel
 import pandas as pd
 from tqdm import tqdm
-import re
 import os
-from collections import Counter
 import argparse
-import json
 import gc
+import sys
+import time
+from collections import deque
 
-# ===============================================================
-# 1. DEFINICIONES DE CLASES Y FUNCIONES (Idéntico al notebook)
-# ===============================================================
-
-class Qwen3_8BHelper:
-    """Wrapper para el modelo Qwen3-8B."""
-    def __init__(self, token, gpu_id):
-        self.device = f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu"
-        self.tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen3-VL-8B-Instruct", trust_remote_code=True, token=token)
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-        self.model = AutoModelForCausalLM.from_pretrained(
-            "Qwen/Qwen3-VL-8B-Instruct",
-            trust_remote_code=True,
-            token=token,
-            torch_dtype=torch.float16
-        ).to(self.device)
-
-    def generate_text(self, prompt, max_new_tokens=200):
-        # Usar chat template para mejorar el rendimiento en modelos Instruct
-        messages = [{"role": "user", "content": prompt}]
-        try:
-            text = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        except Exception:
-            text = prompt
-            
-        inputs = self.tokenizer(text, return_tensors="pt").to(self.device)
-        with torch.no_grad():
-            generate_ids = self.model.generate(
-                inputs.input_ids,
-                attention_mask=inputs.attention_mask,
-                max_new_tokens=max_new_tokens,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-        new_tokens = generate_ids[0][inputs.input_ids.shape[1]:]
-        return self.tokenizer.batch_decode([new_tokens], skip_special_tokens=True, clean_up_tokenization_spaces=False)[0].strip()
-
-class Llama3_1_8BHelper:
-    """Versión modificada para cargar el modelo en una GPU específica."""
-    def __init__(self, token, gpu_id):
-        self.device = f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu"
-        self.tokenizer = AutoTokenizer.from_pretrained("meta-llama/Meta-Llama-3.1-8B-Instruct", token=token)
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-        self.model = AutoModelForCausalLM.from_pretrained(
-            "meta-llama/Meta-Llama-3.1-8B-Instruct", 
-            token=token,
-            torch_dtype=torch.float16
-        ).to(self.device) # <-- Carga el modelo completo en la GPU especificada
-
-    def generate_text(self, prompt, max_new_tokens=200):
-        # Usar chat template para mejorar el rendimiento en modelos Instruct
-        messages = [{"role": "user", "content": prompt}]
-        try:
-            text = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        except Exception:
-            text = prompt
-
-        inputs = self.tokenizer(text, return_tensors="pt").to(self.device)
-        with torch.no_grad():
-            generate_ids = self.model.generate(
-                inputs.input_ids,
-                attention_mask=inputs.attention_mask,
-                max_new_tokens=max_new_tokens,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-        new_tokens = generate_ids[0][inputs.input_ids.shape[1]:]
-        return self.tokenizer.batch_decode([new_tokens], skip_special_tokens=True, clean_up_tokenization_spaces=False)[0].strip()
-
-def normalize_text(s):
-    s = s.lower()
-    s = re.sub(r'[^\w\s]', '', s)
-    return s
-
-def f1_score(prediction, ground_truth):
-    pred_tokens = normalize_text(prediction).split()
-    gt_tokens = normalize_text(ground_truth).split()
-    if not gt_tokens: return 1 if not pred_tokens else 0
-    if not pred_tokens: return 0
-    common = Counter(pred_tokens) & Counter(gt_tokens)
-    num_same = sum(common.values())
-    if num_same == 0: return 0
-    precision = 1.0 * num_same / len(pred_tokens)
-    recall = 1.0 * num_same / len(gt_tokens)
-    f1 = (2 * precision * recall) / (precision + recall)
-    return f1
-
-def substring_accuracy(prediction, ground_truth):
-    return 1 if normalize_text(ground_truth) in normalize_text(prediction) else 0
-
-class JudgeModel:
-    """Clase para evaluar con un modelo Juez (Qwen)."""
-    def __init__(self, token, gpu_id):
-        self.device = f"cuda:{gpu_id}" if torch.cuda.is_available() else "cpu"
-        # Usamos Qwen2.5-7B-Instruct: Más estable para texto y sin problemas de config
-        model_name = "Qwen/Qwen2.5-7B-Instruct"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name, token=token, trust_remote_code=True)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_name, 
-            token=token, 
-            trust_remote_code=True,
-            torch_dtype=torch.float16
-        ).to(self.device)
-
-    def evaluate(self, prompt, prediction, ground_truth):
-        # Usar chat template para mejor adherencia a instrucciones y formato JSON
-        messages = [
-            {"role": "system", "content": "Eres un juez evaluador experto. Tu tarea es determinar si una predicción es correcta basándote en una respuesta de referencia."},
-            {"role": "user", "content": f"""Evalúa si la 'Predicción' es una respuesta aceptable para el 'Prompt', considerando la 'Respuesta Correcta' como referencia.
-            
-            Prompt: {prompt}
-            Respuesta Correcta: {ground_truth}
-            Predicción: {prediction}
-            
-            Responde ÚNICAMENTE con un objeto JSON que tenga un campo "score" con valor 1 (aceptable) o 0 (no aceptable).
-            Ejemplo: {{"score": 1}}"""}
-        ]
-        
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
-        
-        inputs = self.tokenizer([text], return_tensors="pt").to(self.device)
-
-        with torch.no_grad():
-            output_tokens = self.model.generate(
-                inputs.input_ids, 
-                attention_mask=inputs.attention_mask,
-                max_new_tokens=50,
-                pad_token_id=self.tokenizer.eos_token_id
-            )[0]
-            
-        response = self.tokenizer.decode(output_tokens[len(inputs.input_ids[0]):], skip_special_tokens=True).strip()
-        
-        # Intentar parsear JSON
-        score = 0
-        try:
-            # Buscar algo que parezca un JSON: { ... }
-            json_match = re.search(r'\{.*?\}', response, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group(0))
-                score = int(data.get("score", 0))
-            else:
-                # Fallback a búsqueda de dígitos si falla JSON
-                match = re.search(r'\d', response)
-                if match:
-                    score = int(match.group(0))
-        except Exception as e:
-            print(f"Error parsing JSON judge response: {e}")
-            # Fallback final
-            match = re.search(r'\d', response)
-            if match:
-                score = int(match.group(0))
-                
-        return score, response
-
-def get_model_helper(model_name, token, gpu_id):
-    if model_name == "llama3":
-        return Llama3_1_8BHelper(token, gpu_id)
-    elif model_name == "qwen3":
-        return Qwen3_8BHelper(token, gpu_id)
-    else:
-        raise ValueError(f"Modelo '{model_name}' no soportado.")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from comun.backends import BACKENDS, create_backend
+from comun.cache_generacion import GenerationCache
+from comun.columnar import load_json, prefer_parquet
+from comun.evaluacion import add_text_metrics, generate_predictions
+from comun.juez import JudgeModel, PipelinedJudge, judge_one
 
 # ===============================================================
-# 2. LÓGICA PRINCIPAL DE EVALUACIÓN
+# LÓGICA PRINCIPAL DE EVALUACIÓN
 # ===============================================================
 
 def main():
@@ -186,8 +26,20 @@ def main():
     parser.add_argument("--gpu_id", type=int, required=True, help="ID de la GPU a utilizar.")
     parser.add_argument("--partition", type=int, required=True, help="Número de esta partición (desde 0).")
     parser.add_argument("--total_partitions", type=int, required=True, help="Número total de particiones.")
-    parser.add_argument("--model_name", type=str, default="llama3", help="Nombre del modelo a utilizar (llama3 o qwen3).")
+    parser.add_argument("--model_name", type=str, default="llama3", help="Modelo a utilizar: alias (llama3, qwen3) o id de Hugging Face.")
     parser.add_argument("--results_dir", type=str, default="resultados", help="Directorio donde guardar los resultados.")
+    parser.add_argument("--cache_path", type=str, default=None, help="Archivo SQLite de la caché de generaciones (default: <results_dir>/cache_generacion.sqlite).")
+    parser.add_argument("--no_cache", action="store_true", help="No consultar ni escribir la caché de generaciones.")
+    parser.add_argument("--backend", type=str, default="hf-eager", choices=list(BACKENDS), help="Motor de generación (hf-eager, hf-batched, hf-compiled, hf-speculative, vllm o fake).")
+    parser.add_argument("--batch_size", type=int, default=16, help="Secuencias simultáneas en hf-batched.")
+    parser.add_argument("--draft_model", type=str, default=None, help="Modelo borrador de hf-speculative (default: llama3-1b para llama3).")
+    parser.add_argument("--num_draft_tokens", type=int, default=5, help="Tokens propuestos por ronda en hf-speculative.")
+    parser.add_argument("--pipeline", action="store_true", help="Juzgar mientras se genera (juez en un worker aparte con cola acotada).")
+    parser.add_argument("--judge_device", type=str, default=None, help="Dispositivo del juez en --pipeline: 'cuda:N' o 'cpu' (default: la GPU de --gpu_id).")
+    parser.add_argument("--judge_worker", type=str, default="thread", choices=["thread", "process"], help="Worker del juez en --pipeline: hilo o proceso aparte (recomendado con el juez en CPU).")
+    parser.add_argument("--queue_size", type=int, default=64, help="Máximo de predicciones en vuelo hacia el juez en --pipeline.")
+    parser.add_argument("--no_prefix_cache", action="store_true", help="No reusar el caché KV del prefijo constante del juez.")
+    parser.add_argument("--chunk_size", type=int, default=None, help="Prompts por bloque de generación (default: 256; 32 con --pipeline).")
     args = parser.parse_args()
 
     # --- Carga de Datos y Modelo ---
@@ -196,21 +48,15 @@ def main():
         raise ValueError("La variable de entorno HUGGING_FACE_TOKEN no está configurada.")
 
     try:
-        model_helper = get_model_helper(args.model_name, HUGGING_FACE_TOKEN, args.gpu_id)
+        backend = create_backend(args.backend, args.model_name, gpu_id=args.gpu_id, token=HUGGING_FACE_TOKEN,
+                                 max_new_tokens=200, batch_size=args.batch_size,
+                                 draft_model=args.draft_model, num_draft_tokens=args.num_draft_tokens)
     except ValueError as e:
         print(f"Error: {e}")
         return
 
-    # --- Inicializar Juez ---
-    try:
-        judge = JudgeModel(HUGGING_FACE_TOKEN, args.gpu_id)
-    except Exception as e:
-        print(f"Error al cargar el modelo Juez: {e}")
-        return
-
     # --- Cargar y aplanar el dataset ---
-    with open('/workspace1/gonzalo.fuentes/proyecto_generativa/subset_h2_completion.json', 'r') as f:
-        data = json.load(f)
+    data = load_json(prefer_parquet('/workspace1/gonzalo.fuentes/proyecto_generativa/subset_h2_completion.json'))
     
     lista_prompts = []
     # El nuevo formato es una lista directa de objetos
@@ -237,67 +83,98 @@ def main():
     df_partition = df_flat.iloc[start_index:end_index].copy()
     print(f"Procesando {len(df_partition)} muestras (de índice {start_index} a {end_index-1})")
 
-    # --- FASE 1: Generación ---
-    print("--- Iniciando Generación ---")
-    try:
-        model_helper = get_model_helper(args.model_name, HUGGING_FACE_TOKEN, args.gpu_id)
-        predictions = []
-        for _, row in tqdm(df_partition.iterrows(), total=len(df_partition)):
-            pred = model_helper.generate_text(row['prompt'], max_new_tokens=200)
-            predictions.append(pred)
-        
-        df_partition['prediction'] = predictions
-        
-        # Liberar memoria del generador
-        del model_helper
-        torch.cuda.empty_cache()
-        gc.collect()
-        print("Generación completada. Memoria liberada.")
-        
-    except Exception as e:
-        print(f"Error en generación: {e}")
-        return
+    cache_path = args.cache_path or os.path.join(args.results_dir, "cache_generacion.sqlite")
+    cache = GenerationCache(cache_path, enabled=not args.no_cache)
+    chunk_size = args.chunk_size or (32 if args.pipeline else 256)
+
+    if args.pipeline:
+        # --- FASES 1 y 2 EN PIPELINE: el juez consume mientras se genera ---
+        judge_device = args.judge_device or (f"cuda:{args.gpu_id}" if torch.cuda.is_available() else "cpu")
+        print(f"--- Iniciando Generación y Evaluación en pipeline (juez en {judge_device}, worker {args.judge_worker}) ---")
+        prompts = df_partition['prompt'].tolist()
+        ground_truths = df_partition['ground_truth'].tolist()
+        t0 = time.time()
+        try:
+            judge = PipelinedJudge(HUGGING_FACE_TOKEN, judge_device, queue_size=args.queue_size, worker=args.judge_worker,
+                                   reuse_prefix=not args.no_prefix_cache)
+        except Exception as e:
+            print(f"Error al iniciar el worker del Juez: {e}")
+            return
+
+        # Lo que no entra en la cola espera aquí: la generación nunca se frena por el juez
+        backlog = deque()
+
+        def on_ready(ready):
+            backlog.extend(ready)
+            while backlog and judge.offer(backlog[0][0], prompts[backlog[0][0]], backlog[0][1], ground_truths[backlog[0][0]]):
+                backlog.popleft()
+
+        try:
+            df_partition['prediction'] = generate_predictions(backend, prompts, cache, chunk_size=chunk_size, on_ready=on_ready)
+            cache.close()
+            backend.close()
+            del backend
+            gen_seconds = time.time() - t0
+            print(f"Generación completada en {gen_seconds:.1f}s. Memoria liberada; {len(backlog)} predicciones aún esperan al juez.")
+
+            while backlog:
+                index, prediction = backlog.popleft()
+                judge.submit(index, prompts[index], prediction, ground_truths[index])
+            results = judge.finish()
+        except Exception as e:
+            print(f"Error en generación/evaluación: {e}")
+            return
+
+        df_partition['judge_score'] = [results[i][0] for i in range(len(prompts))]
+        df_partition['judge_raw'] = [results[i][1] for i in range(len(prompts))]
+        print(f"Pipeline completado en {time.time() - t0:.1f}s (generación: {gen_seconds:.1f}s).")
+
+    else:
+        # --- FASE 1: Generación ---
+        print("--- Iniciando Generación ---")
+        try:
+            df_partition['prediction'] = generate_predictions(backend, df_partition['prompt'].tolist(), cache, chunk_size=chunk_size)
+            cache.close()
+
+            # Liberar memoria del generador
+            backend.close()
+            del backend
+            print("Generación completada. Memoria liberada.")
+
+        except Exception as e:
+            print(f"Error en generación: {e}")
+            return
+
+        # --- FASE 2: Evaluación ---
+        print("--- Iniciando Evaluación con Juez ---")
+        try:
+            judge = JudgeModel(HUGGING_FACE_TOKEN, args.gpu_id, reuse_prefix=not args.no_prefix_cache)
+        except Exception as e:
+            print(f"Error al cargar el modelo Juez: {e}")
+            return
+        try:
+            judge_scores = []
+            judge_raw_responses = []
+
+            for i, (_, row) in tqdm(enumerate(df_partition.iterrows()), total=len(df_partition)):
+                score, raw_response = judge_one(judge, i, row['prompt'], row['prediction'], row['ground_truth'])
+                judge_scores.append(score)
+                judge_raw_responses.append(raw_response)
+
+            df_partition['judge_score'] = judge_scores
+            df_partition['judge_raw'] = judge_raw_responses
+            print(judge.prefill_summary())
+
+            del judge
+            torch.cuda.empty_cache()
+            gc.collect()
+
+        except Exception as e:
+            print(f"Error en evaluación: {e}")
+            return
 
-    # --- FASE 2: Evaluación ---
-    print("--- Iniciando Evaluación con Juez ---")
-    try:
-        judge = JudgeModel(HUGGING_FACE_TOKEN, args.gpu_id)
-        judge_scores = []
-        judge_raw_responses = []
-        
-        for i, (_, row) in tqdm(enumerate(df_partition.iterrows()), total=len(df_partition)):
-            try:
-                score, raw_response = judge.evaluate(row['prompt'], row['prediction'], row['ground_truth'])
-                
-                # Debug print para las primeras iteraciones
-                if i < 3:
-                    print(f"\n[DEBUG Juez #{i}]")
-                    print(f"Predicción: {row['prediction'][:50]}...")
-                    print(f"Respuesta Juez Raw: {raw_response}")
-                    print(f"Score extraído: {score}")
-                    
-            except Exception as e:
-                print(f"Error juez: {e}")
-                score = 0
-                raw_response = "ERROR"
-            
-            judge_scores.append(score)
-            judge_raw_responses.append(raw_response)
-            
-        df_partition['judge_score'] = judge_scores
-        df_partition['judge_raw'] = judge_raw_responses
-        
-        del judge
-        torch.cuda.empty_cache()
-        gc.collect()
-        
-    except Exception as e:
-        print(f"Error en evaluación: {e}")
-        return
-        
     # --- Guardar resultados parciales ---
-    df_partition['f1_score'] = df_partition.apply(lambda x: f1_score(x['prediction'], x['ground_truth']), axis=1)
-    df_partition['substring_accuracy'] = df_partition.apply(lambda x: substring_accuracy(x['prediction'], x['ground_truth']), axis=1)
+    add_text_metrics(df_partition)
 
     results_dir = args.results_dir
     os.makedirs(results_dir, exist_ok=True)
@@ -5,9 +5,12 @@ Script de limpieza automática para subset_h2_final.json
 Elimina entidades incorrectamente categorizadas
 """
 
-import json
 from typing import Dict, List
 
+from comun.columnar import load_json, prefer_parquet
+from comun.io_datos import save_dataset
+from comun.normalizacion import normalizar_entidad
+
 
 class SubsetCleaner:
     """Limpiador de subset con reglas específicas por categoría"""
@@ -65,16 +68,7 @@ class SubsetCleaner:
     
     def normalize_text(self, text: str) -> str:
         """Normaliza texto"""
-        if not text:
-            return ""
-        text = text.lower().strip()
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', 'ü': 'u'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text
+        return normalizar_entidad(text)
     
     def should_remove_entity(self, category: str, entity_data: Dict) -> tuple:
         """
@@ -138,8 +132,7 @@ class SubsetCleaner:
         
         # Leer subset
         print(f"📖 Leyendo {input_file}...")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = load_json(prefer_parquet(input_file))
         
         # Estadísticas
         stats = {
@@ -175,8 +168,7 @@ class SubsetCleaner:
         
         # Guardar subset limpio
         print(f"\n💾 Guardando {output_file}...\n")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_data, f, ensure_ascii=False, indent=4)
+        save_dataset(cleaned_data, output_file)
         
         # Mostrar resultados
         print(f"{'='*80}")
@@ -242,7 +234,7 @@ def main():
     parser.add_argument(
         '--output',
         default='subset_h2_limpio.json',
-        help='Archivo de salida (default: subset_h2_limpio.json)'
+        help='Archivo de salida, JSON o JSONL con .jsonl / .jsonl.gz / .jsonl.zst (default: subset_h2_limpio.json)'
     )
     
     args = parser.parse_args()
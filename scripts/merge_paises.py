@@ -2,7 +2,7 @@ import pandas as pd
 import os
 import sys
 try:
-    from langdetect import detect, LangDetectException
+    import langdetect  # lo usa comun.idioma
 except ImportError:
     print("Error: Necesitas 'langdetect'. Instálalo con: pip install langdetect")
     exit()
@@ -12,6 +12,8 @@ except ImportError:
     print("Error: Necesitas 'unidecode'. Instálalo con: pip install unidecode")
     exit()
 
+from comun.idioma import language_mask
+
 print("--- Iniciando Script: Mezclador de CSVs de Países (Forzando sep=';') ---")
 
 # --- CONFIGURACIÓN ---
@@ -20,6 +22,8 @@ archivo2 = "tripletas_chile.csv"
 archivo3 = "tripletas_peru.csv"
 
 archivo_salida = "tripletas_paises_ES.csv"
+cache_idioma = "cache_idioma.json"  # Idiomas ya detectados (compartido con los otros merge)
+workers = os.cpu_count() or 1       # Procesos para langdetect
 # --------------------------------------------
 
 archivos_entrada = [archivo1, archivo2, archivo3]
@@ -103,13 +107,9 @@ df_completo = df_completo.drop_duplicates()
 print(f"Eliminados {filas_antes_duplicados - len(df_completo)} duplicados.")
 
 print("Iniciando filtrado por idioma español... (Puede tardar)")
-def es_espanol(texto):
-    if not isinstance(texto, str) or len(texto.strip()) < 2: return False
-    try: return detect(texto) == 'es'
-    except LangDetectException: return False
-    except Exception: return False
-
-df_completo['es_espanol'] = df_completo['valor'].apply(es_espanol)
+# Cada valor distinto se detecta una vez (con caché y semilla fija)
+df_completo['es_espanol'] = language_mask(df_completo['valor'], 'es', min_len=2,
+                                          cache_path=cache_idioma, workers=workers)
 filas_antes_idioma = len(df_completo)
 df_filtrado_es = df_completo[df_completo['es_espanol'] == True].copy()
 df_filtrado_es = df_filtrado_es.drop(columns=['es_espanol'])
@@ -5,11 +5,14 @@ Script para minar dataset_benchmark_qa.json y extraer subset balanceado
 con las 5 categorías de la Hipótesis 2
 """
 
-import json
 import re
 from collections import defaultdict, Counter
 from typing import Dict, List, Tuple
 
+from comun.columnar import prefer_parquet
+from comun.io_datos import iter_records, save_dataset
+from comun.normalizacion import normalizar_entidad
+
 
 class DatasetMiner:
     """Minero de datasets para extraer y categorizar entidades"""
@@ -110,18 +113,7 @@ class DatasetMiner:
         
     def normalize_text(self, text: str) -> str:
         """Normaliza texto para comparación"""
-        if not text:
-            return ""
-        text = text.lower().strip()
-        # Quitar acentos
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', 'ü': 'u', 'à': 'a', 'è': 'e', 'ì': 'i',
-            'ò': 'o', 'ù': 'u', 'ã': 'a', 'õ': 'o', 'ç': 'c'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text
+        return normalizar_entidad(text)
     
     def extract_entity_from_question(self, pregunta: str) -> str:
         """Extrae la entidad principal de la pregunta"""
@@ -202,20 +194,13 @@ class DatasetMiner:
         print(f"MINANDO DATASET: {input_file}")
         print(f"{'='*80}\n")
         
-        # Leer dataset
-        print("📖 Leyendo dataset...")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"✓ {len(data):,} preguntas cargadas\n")
-        
-        # Agrupar por entidad y categoría
-        print("🔍 Categorizando preguntas...")
+        # Agrupar por entidad y categoría (el dataset se lee pregunta a pregunta)
+        print("🔍 Leyendo y categorizando preguntas...")
         entities_by_category = defaultdict(lambda: defaultdict(list))
         category_stats = Counter()
         processed = 0
         
-        for item in data:
+        for item in iter_records(prefer_parquet(input_file)):
             pregunta = item.get('pregunta', '')
             respuesta = item.get('respuesta_correcta', '')
             
@@ -294,8 +279,8 @@ class DatasetMiner:
         print(f"GUARDANDO SUBSET: {output_file}")
         print(f"{'='*80}\n")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(subset, f, ensure_ascii=False, indent=4)
+        # JSON indentado, o JSONL (.jsonl, .jsonl.gz, .jsonl.zst) con una entidad por línea
+        save_dataset(subset, output_file)
         
         # Calcular totales
         total_entities = sum(len(subset[cat]) for cat in subset)
@@ -325,7 +310,7 @@ def main():
     parser.add_argument(
         '--output',
         default='subset_h2_balanceado.json',
-        help='Archivo JSON de salida (default: subset_h2_balanceado.json)'
+        help='Archivo JSON de salida, o JSONL con .jsonl / .jsonl.gz / .jsonl.zst (default: subset_h2_balanceado.json)'
     )
     parser.add_argument(
         '--samples',
@@ -5,12 +5,16 @@ Script MEJORADO para minar dataset_benchmark_qa.json
 Extrae subset balanceado con categorización PRECISA de las 5 categorías
 """
 
-import json
-import re
 from collections import defaultdict, Counter
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Tuple
 import argparse
 
+from comun.columnar import prefer_parquet
+from comun.io_datos import iter_chunks, iter_records, save_dataset
+from comun.paralelo import map_chunks_ordered, merge_counts, merge_groups, top_entities
+from comun.normalizacion import normalizar_entidad
+from comun.plantillas_qa import extraer_entidad
+
 
 class DatasetMinerMejorado:
     """Minero mejorado con reglas estrictas de categorización"""
@@ -60,20 +64,14 @@ class DatasetMinerMejorado:
                 'exclude': ['ocupacion', 'partido politico', 'ministerio']
             }
         }
+        
+        # Pares (categoría, entidad) a guardar en la segunda pasada (None = todos)
+        self.selected = None
+        self.total_read = 0
     
     def normalize_text(self, text: str) -> str:
         """Normaliza texto"""
-        if not text:
-            return ""
-        text = text.lower().strip()
-        replacements = {
-            'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-            'ñ': 'n', 'ü': 'u', 'à': 'a', 'è': 'e', 'ì': 'i',
-            'ò': 'o', 'ù': 'u', 'ã': 'a', 'õ': 'o', 'ç': 'c'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text
+        return normalizar_entidad(text)
     
     def categorize_question(self, pregunta: str, respuesta: str) -> str:
         """
@@ -117,57 +115,97 @@ class DatasetMinerMejorado:
         return None  # No categorizada
     
     def extract_entity(self, pregunta: str) -> str:
-        """Extrae la entidad de la pregunta"""
-        patterns = [
-            r'¿Cuál es .+ de (.+)\?',
-            r'de (.+)\?$'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, pregunta)
-            if match:
-                return match.group(1).strip()
-        
-        return pregunta.replace('¿', '').replace('?', '').strip()
+        """Extrae la entidad de la pregunta (cortando tras la relación, ver comun.plantillas_qa)"""
+        return extraer_entidad(pregunta)
     
-    def mine(self, input_file: str, samples: int = 25) -> Dict:
-        """Mina el dataset y extrae subset balanceado"""
-        
-        print("="*80)
-        print(f"MINERÍA MEJORADA: {input_file}")
-        print("="*80)
-        
-        # Leer dataset
-        print("\n📖 Leyendo dataset...")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"✓ {len(data):,} preguntas cargadas")
-        
-        # Categorizar y agrupar por entidad
-        print("\n🔍 Categorizando con REGLAS MEJORADAS...")
-        
-        category_entities = defaultdict(lambda: defaultdict(list))
-        total_categorized = 0
-        
-        for i, item in enumerate(data, 1):
-            if i % 10000 == 0:
-                print(f"  Procesadas {i:,} preguntas...")
-            
+    def iter_categorized(self, items: List[Dict]) -> Iterator[Tuple[str, str, str, str]]:
+        """(categoría, entidad, pregunta, respuesta) de las preguntas categorizadas de un bloque"""
+        for item in items:
             pregunta = item.get('pregunta', '')
             respuesta = item.get('respuesta_correcta', '')
             
             category = self.categorize_question(pregunta, respuesta)
             
             if category:
-                entity = self.extract_entity(pregunta)
-                category_entities[category][entity].append({
+                yield category, self.extract_entity(pregunta), pregunta, respuesta
+    
+    def aggregate_chunk(self, items: List[Dict]) -> Tuple[Dict, int]:
+        """
+        Categoriza un bloque de preguntas y las agrupa por categoría y entidad
+        
+        Si `self.selected` tiene pares (categoría, entidad), solo guarda esas
+        (segunda pasada del modo en dos pasadas).
+        
+        Returns:
+            ({categoría: {entidad: [qa, ...]}}, preguntas leídas)
+        """
+        partial = defaultdict(lambda: defaultdict(list))
+        for category, entity, pregunta, respuesta in self.iter_categorized(items):
+            if self.selected is None or (category, entity) in self.selected:
+                partial[category][entity].append({
                     'pregunta': pregunta,
                     'respuesta_correcta': respuesta
                 })
-                total_categorized += 1
+        return {cat: dict(entities) for cat, entities in partial.items()}, len(items)
+    
+    def count_chunk(self, items: List[Dict]) -> Tuple[Dict, int]:
+        """
+        Primera pasada: solo cuenta preguntas por categoría y entidad
+        
+        Returns:
+            ({categoría: {entidad: preguntas}}, preguntas leídas)
+        """
+        partial = defaultdict(Counter)
+        for category, entity, _, _ in self.iter_categorized(items):
+            partial[category][entity] += 1
+        return {cat: dict(counts) for cat, counts in partial.items()}, len(items)
+    
+    def _read(self, input_file: str, method: str, merge, workers: int, chunk_size: int) -> Dict:
+        """Recorre el dataset por bloques con `method` y combina los parciales en orden"""
+        total = {}
+        i = 0
+        bloques = iter_chunks(iter_records(prefer_parquet(input_file)), chunk_size)
+        for partial, leidas in map_chunks_ordered(self, method, bloques, workers):
+            # Combinar en el orden de los bloques: mismo resultado que en serie
+            merge(total, partial)
+            i += leidas
+            print(f"  Procesadas {i:,} preguntas...")
+        self.total_read = i
+        return total
+    
+    def mine(self, input_file: str, samples: int = 25, workers: int = 1, chunk_size: int = 10000,
+             two_pass: bool = False) -> Dict:
+        """
+        Mina el dataset y extrae subset balanceado
         
-        print(f"\n✓ {total_categorized:,} preguntas categorizadas")
+        Con `two_pass` la primera pasada solo cuenta preguntas por entidad y
+        la segunda guarda las preguntas de las entidades elegidas: la memoria
+        es O(entidades + preguntas elegidas) en lugar de O(todas las preguntas).
+        """
+        
+        print("="*80)
+        print(f"MINERÍA MEJORADA: {input_file}")
+        print("="*80)
+        
+        # Categorizar y agrupar por entidad (el dataset se lee por bloques,
+        # repartidos entre `workers` procesos)
+        print("\n🔍 Leyendo y categorizando con REGLAS MEJORADAS...")
+        if workers > 1:
+            print(f"  {workers} procesos, bloques de {chunk_size:,} preguntas")
+        
+        self.selected = None
+        if two_pass:
+            print("  Pasada 1: contando preguntas por entidad")
+            entity_counts = self._read(input_file, 'count_chunk', merge_counts, workers, chunk_size)
+        else:
+            category_entities = self._read(input_file, 'aggregate_chunk', merge_groups, workers, chunk_size)
+            entity_counts = {
+                cat: {entity: len(preguntas) for entity, preguntas in entities.items()}
+                for cat, entities in category_entities.items()
+            }
+        
+        total_categorized = sum(sum(counts.values()) for counts in entity_counts.values())
+        print(f"\n✓ {total_categorized:,} preguntas categorizadas de {self.total_read:,} leídas")
         
         # Estadísticas
         print("\n" + "="*80)
@@ -175,11 +213,20 @@ class DatasetMinerMejorado:
         print("="*80)
         
         for cat in ['indigenous_peoples', 'dances', 'painters', 'movies', 'landmarks']:
-            if cat in category_entities:
-                num_entities = len(category_entities[cat])
-                num_preguntas = sum(len(preg_list) for preg_list in category_entities[cat].values())
+            if cat in entity_counts:
+                num_entities = len(entity_counts[cat])
+                num_preguntas = sum(entity_counts[cat].values())
                 print(f"{cat:25s}: {num_preguntas:6d} preguntas | {num_entities:5d} entidades")
         
+        # Tomar las top N entidades por número de preguntas (descendente)
+        top = {cat: top_entities(counts, samples) for cat, counts in entity_counts.items()}
+        
+        if two_pass:
+            print("\n🔍 Pasada 2: guardando las preguntas de las entidades elegidas")
+            self.selected = {(cat, entity) for cat, entities in top.items() for entity, _ in entities}
+            category_entities = self._read(input_file, 'aggregate_chunk', merge_groups, workers, chunk_size)
+            self.selected = None
+        
         # Extraer subset
         print("\n" + "="*80)
         print(f"EXTRAYENDO SUBSET ({samples} entidades por categoría)")
@@ -188,24 +235,16 @@ class DatasetMinerMejorado:
         subset = {}
         
         for cat in ['indigenous_peoples', 'dances', 'painters', 'movies', 'landmarks']:
-            if cat not in category_entities:
+            if cat not in top:
                 print(f"\n⚠️  {cat}: No hay entidades")
                 continue
             
-            # Ordenar entidades por número de preguntas (descendente)
-            sorted_entities = sorted(
-                category_entities[cat].items(),
-                key=lambda x: len(x[1]),
-                reverse=True
-            )
-            
-            # Tomar las top N entidades
-            top_entities = sorted_entities[:samples]
+            top_list = [(entity, category_entities[cat][entity]) for entity, _ in top[cat]]
             
             subset[cat] = []
             total_preg = 0
             
-            for entity, preguntas in top_entities:
+            for entity, preguntas in top_list:
                 subset[cat].append({
                     'entidad': entity,
                     'preguntas': preguntas,
@@ -213,11 +252,11 @@ class DatasetMinerMejorado:
                 })
                 total_preg += len(preguntas)
             
-            print(f"\n✓ {cat:25s}: {len(top_entities):3d} entidades | {total_preg:4d} preguntas")
+            print(f"\n✓ {cat:25s}: {len(top_list):3d} entidades | {total_preg:4d} preguntas")
             
             # Mostrar top 5
             print(f"  Top entidades:")
-            for i, (entity, preguntas) in enumerate(top_entities[:5], 1):
+            for i, (entity, preguntas) in enumerate(top_list[:5], 1):
                 print(f"    {i}. {entity:50s} ({len(preguntas):3d} preguntas)")
         
         return subset
@@ -228,8 +267,8 @@ class DatasetMinerMejorado:
         print(f"GUARDANDO: {output_file}")
         print("="*80)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(subset, f, ensure_ascii=False, indent=4)
+        # JSON indentado, o JSONL (.jsonl, .jsonl.gz, .jsonl.zst) con una entidad por línea
+        save_dataset(subset, output_file)
         
         total_entities = sum(len(items) for items in subset.values())
         total_questions = sum(
@@ -251,14 +290,20 @@ def main():
     parser.add_argument('--input', default='dataset_benchmark_qa.json',
                        help='Archivo de entrada')
     parser.add_argument('--output', default='subset_h2_mejorado.json',
-                       help='Archivo de salida')
+                       help='Archivo de salida (JSON, o JSONL con .jsonl / .jsonl.gz / .jsonl.zst)')
     parser.add_argument('--samples', type=int, default=25,
                        help='Número de entidades por categoría')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Procesos para categorizar (default: 1, en serie)')
+    parser.add_argument('--chunk_size', type=int, default=10000,
+                       help='Preguntas por bloque (default: 10000)')
+    parser.add_argument('--two_pass', action='store_true',
+                       help='Contar primero y guardar solo las preguntas de las entidades elegidas (menos memoria)')
     
     args = parser.parse_args()
     
     miner = DatasetMinerMejorado()
-    subset = miner.mine(args.input, args.samples)
+    subset = miner.mine(args.input, args.samples, args.workers, args.chunk_size, args.two_pass)
     miner.save_subset(subset, args.output)
 
 
@@ -0,0 +1,58 @@
+import os
+import sys
+
+# Los tests importan `comun` igual que los scripts (desde scripts/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pytest
+
+# Vocabulario chico: los modelos aleatorios repiten tokens y EOS aparece pronto
+VOCAB = 48
+
+
+@pytest.fixture
+def tiny_lm():
+    """
+    Fábrica de modelos causales diminutos y aleatorios (CPU), sin descargar nada
+
+    float64 por defecto, para que las rutas comparadas no difieran por redondeo.
+    Con padding a la izquierda hay que usar float32: en float64 las filas de
+    padding dan NaN en transformers y contaminan el resto del batch.
+    """
+    torch = pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+
+    def build(kind: str = 'llama', seed: int = 0, layers: int = 2, dtype=None):
+        config_cls = {'llama': transformers.LlamaConfig, 'qwen2': transformers.Qwen2Config}[kind]
+        config = config_cls(vocab_size=VOCAB, hidden_size=32, intermediate_size=64, num_hidden_layers=layers,
+                            num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=256,
+                            bos_token_id=1, eos_token_id=2, pad_token_id=0, tie_word_embeddings=False,
+                            # Con el 0.02 por defecto la atención es casi uniforme y un error
+                            # de posiciones o de máscara no cambia el argmax
+                            initializer_range=0.2)
+        torch.manual_seed(seed)
+        model = transformers.AutoModelForCausalLM.from_config(config, attn_implementation='eager')
+        return model.to(dtype or torch.float64).eval()
+
+    return build
+
+
+@pytest.fixture
+def prompts():
+    """Prompts tokenizados de largos distintos (sin pad ni EOS)"""
+    torch = pytest.importorskip('torch')
+    generator = torch.Generator().manual_seed(123)
+    return [torch.randint(3, VOCAB, (n,), generator=generator).tolist() for n in (3, 11, 6, 1, 17, 8)]
+
+
+def greedy_reference(model, prompt_ids, max_new_tokens, eos_token_id):
+    """Tokens nuevos de model.generate(do_sample=False), prompt por prompt y sin padding"""
+    import torch
+    outputs = []
+    for ids in prompt_ids:
+        input_ids = torch.tensor([ids])
+        with torch.no_grad():
+            out = model.generate(input_ids, attention_mask=torch.ones_like(input_ids), do_sample=False,
+                                 max_new_tokens=max_new_tokens, eos_token_id=eos_token_id, pad_token_id=0)
+        outputs.append(out[0, len(ids):].tolist())
+    return outputs
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import greedy_reference
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from comun.batching_continuo import ContinuousBatchingEngine
+
+MAX_NEW_TOKENS = 12
+# EOS que los modelos de prueba no generan: las salidas llegan a MAX_NEW_TOKENS
+EOS = 46
+
+
+def build(tiny_lm, kind):
+    # float32: en float64 transformers da NaN en las filas de padding (ver tiny_lm)
+    return tiny_lm(kind, dtype=torch.float32)
+
+
+def engine(model, max_batch_size, eos=EOS):
+    tokenizer = SimpleNamespace(pad_token_id=0, eos_token_id=eos)
+    return ContinuousBatchingEngine(model, tokenizer, max_batch_size=max_batch_size,
+                                    max_new_tokens=MAX_NEW_TOKENS, eos_token_ids=[eos])
+
+
+def early_eos(reference):
+    """EOS que corta algunas salidas a mitad de camino y deja otras completas"""
+    counts = {}
+    for tokens in reference:
+        for token in set(tokens[1:-1]):
+            counts[token] = counts.get(token, 0) + 1
+    return min(counts, key=lambda token: (abs(counts[token] - len(reference) / 2), token))
+
+
+@pytest.mark.parametrize('kind', ['llama', 'qwen2'])
+@pytest.mark.parametrize('max_batch_size', [1, 2, 4, 16])
+def test_matches_greedy(tiny_lm, prompts, kind, max_batch_size):
+    model = build(tiny_lm, kind)
+    reference = greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS)
+    assert engine(model, max_batch_size).generate_ids(prompts) == reference
+
+
+@pytest.mark.parametrize('kind', ['llama', 'qwen2'])
+@pytest.mark.parametrize('max_batch_size', [2, 3])
+def test_matches_greedy_with_early_eos(tiny_lm, prompts, kind, max_batch_size):
+    model = build(tiny_lm, kind)
+    eos = early_eos(greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS))
+    reference = greedy_reference(model, prompts, MAX_NEW_TOKENS, eos)
+    lengths = [len(tokens) for tokens in reference]
+    # Unas terminan antes (liberan su fila y entran prompts de la cola) y otras llegan al máximo
+    assert min(lengths) < MAX_NEW_TOKENS and max(lengths) == MAX_NEW_TOKENS
+    batching = engine(model, max_batch_size, eos)
+    assert batching.generate_ids(prompts) == reference
+    assert batching.stats['new_tokens'] == sum(lengths)
+
+
+def test_eos_on_first_token(tiny_lm, prompts):
+    model = build(tiny_lm, 'llama')
+    reference = greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS)
+    eos = reference[0][0]
+    assert engine(model, 2, eos).generate_ids(prompts) == greedy_reference(model, prompts, MAX_NEW_TOKENS, eos)
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from calcular_accuracy import contar_archivo, nombre_modelo
+from comun.io_datos import save_dataset
+
+RESULTADOS = [{'evaluacion': 'CORRECTO', 'region': 'latam'}, {'evaluacion': 'INCORRECTO', 'region': 'usa'}]
+
+
+@pytest.mark.parametrize('name', ['evaluacion_real_C.json', 'evaluacion_real_C.jsonl',
+                                  'evaluacion_real_C.jsonl.gz', 'evaluacion_real_C.jsonl.zst',
+                                  'evaluacion_real_C.json.gz', 'evaluacion_real_C.parquet'])
+def test_model_name_ignores_format_and_compression(name):
+    assert nombre_modelo(f'resultados/{name}') == 'C'
+
+
+def test_compressed_and_plain_runs_are_one_model(tmp_path):
+    plano, comprimido = str(tmp_path / 'evaluacion_real_C.jsonl'), str(tmp_path / 'evaluacion_real_C.jsonl.gz')
+    save_dataset(RESULTADOS, plano)
+    save_dataset(RESULTADOS, comprimido)
+    assert contar_archivo(plano)[1] == contar_archivo(comprimido)[1]
+    assert contar_archivo(comprimido)[1][('C', 'total', '-')] == [1, 2]
+
+
+def test_truncated_jsonl_line_is_skipped(tmp_path):
+    path = tmp_path / 'evaluacion_real_C.jsonl'
+    path.write_text(''.join(json.dumps(r) + '\n' for r in RESULTADOS) + '{"evaluacion": "CORR', encoding='utf-8')
+    _, conteos, invalidos, lineas_malas, error = contar_archivo(str(path))
+    assert (conteos[('C', 'total', '-')], invalidos, lineas_malas, error) == ([1, 2], 0, 1, None)
+
+
+def test_truncated_json_array_is_reported(tmp_path):
+    path = tmp_path / 'evaluacion_real_C.json'
+    path.write_text(json.dumps(RESULTADOS)[:-20], encoding='utf-8')
+    _, conteos, _, _, error = contar_archivo(str(path))
+    assert conteos == {} and error is not None
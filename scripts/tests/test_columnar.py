@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from comun.columnar import json_to_parquet, load_json
+from comun.io_datos import save_dataset
+
+
+def round_trip(tmp_path, data, name, chunk_size):
+    path = str(tmp_path / name)
+    save_dataset(data, path)
+    return load_json(json_to_parquet(path, chunk_size=chunk_size))
+
+
+@pytest.mark.parametrize('name', ['plano.json', 'plano.jsonl'])
+def test_flat_keys_after_first_chunk(tmp_path, name):
+    data = [{'pregunta': f'p{i}', 'respuesta': f'r{i}'} for i in range(6)]
+    data[-1]['category'] = 'movies'
+    data[4]['qid'] = 7
+    assert round_trip(tmp_path, data, name, chunk_size=3) == data
+
+
+def test_flat_field_null_in_first_chunk(tmp_path):
+    data = [{'pregunta': 'p0', 'extra': None}, {'pregunta': 'p1'}, {'pregunta': 'p2', 'extra': 3}]
+    expected = [{'pregunta': 'p0'}, {'pregunta': 'p1'}, {'pregunta': 'p2', 'extra': 3}]
+    assert round_trip(tmp_path, data, 'nulos.json', chunk_size=1) == expected
+
+
+def test_grouped_keys_after_first_chunk(tmp_path):
+    data = {
+        'latam': [{'entidad': 'A', 'preguntas': [{'pregunta': 'p1', 'respuesta': 'r1'},
+                                                  {'pregunta': 'p2', 'respuesta': 'r2'}]}],
+        'usa': [{'entidad': 'B', 'qid': 'Q1', 'preguntas': [{'pregunta': 'p3', 'respuesta': 'r3',
+                                                               'category': 'movies'}]},
+                {'entidad': 'C', 'preguntas': []}],
+    }
+    assert round_trip(tmp_path, data, 'agrupado.json', chunk_size=1) == data
+
+
+def test_conflicting_types_raise(tmp_path):
+    data = [{'valor': 1}, {'valor': 'uno'}]
+    path = str(tmp_path / 'conflicto.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    with pytest.raises(ValueError):
+        json_to_parquet(path, chunk_size=1)
+
+
+def test_empty(tmp_path):
+    assert round_trip(tmp_path, [], 'vacio.json', chunk_size=3) == []
@@ -0,0 +1,81 @@
+import copy
+
+import pytest
+
+from conftest import greedy_reference
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from comun.especulativo import SpeculativeDecoder
+
+MAX_NEW_TOKENS = 20
+# EOS que los modelos de prueba no generan: las salidas llegan a MAX_NEW_TOKENS
+EOS = 46
+
+
+def noisy_copy(model, scale=0.005, seed=5):
+    """Borrador que coincide con el modelo en parte de los tokens (lm_head con ruido)"""
+    draft = copy.deepcopy(model)
+    generator = torch.Generator().manual_seed(seed)
+    with torch.no_grad():
+        weight = draft.lm_head.weight
+        weight.add_(torch.randn(weight.shape, generator=generator, dtype=weight.dtype) * scale)
+    return draft
+
+
+def eos_inside(reference):
+    """Un token que aparece a mitad de alguna salida: usado como EOS corta antes del máximo"""
+    return next(tokens[len(tokens) // 2] for tokens in reference if len(tokens) > 2)
+
+
+def decoder(model, draft, k, eos=EOS):
+    return SpeculativeDecoder(model, draft, tokenizer=None, num_draft_tokens=k,
+                              max_new_tokens=MAX_NEW_TOKENS, eos_token_ids=[eos])
+
+
+@pytest.mark.parametrize('kind', ['llama', 'qwen2'])
+@pytest.mark.parametrize('k', [1, 3, 5, 32])
+def test_matches_greedy(tiny_lm, prompts, kind, k):
+    model = tiny_lm(kind)
+    reference = greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS)
+    speculative = decoder(model, noisy_copy(model), k)
+    assert speculative.generate_ids(prompts) == reference
+    # Hubo aciertos y rechazos del borrador: se ejercitan el recorte de ambos cachés
+    assert 0 < speculative.stats['accepted_tokens'] < speculative.stats['drafted_tokens']
+
+
+@pytest.mark.parametrize('k', [1, 3])
+def test_matches_greedy_with_independent_draft(tiny_lm, prompts, k):
+    model, draft = tiny_lm('qwen2', seed=0), tiny_lm('qwen2', seed=1, layers=1)
+    assert decoder(model, draft, k).generate_ids(prompts) == greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS)
+
+
+@pytest.mark.parametrize('k', [1, 4])
+def test_matches_greedy_with_early_eos(tiny_lm, prompts, k):
+    model = tiny_lm('llama')
+    eos = eos_inside(greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS))
+    reference = greedy_reference(model, prompts, MAX_NEW_TOKENS, eos)
+    assert any(len(tokens) < MAX_NEW_TOKENS for tokens in reference)
+    assert decoder(model, noisy_copy(model), k, eos).generate_ids(prompts) == reference
+
+
+@pytest.mark.parametrize('k', [1, 4, 7])
+def test_self_draft_accepts_everything(tiny_lm, prompts, k):
+    model = tiny_lm('llama')
+    speculative = decoder(model, model, k)
+    assert speculative.generate_ids(prompts) == greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS)
+    assert speculative.stats['accepted_tokens'] == speculative.stats['drafted_tokens'] > 0
+
+
+@pytest.mark.parametrize('k', [1, 4])
+def test_zero_acceptance(tiny_lm, prompts, k):
+    model, draft = tiny_lm('llama', seed=0), tiny_lm('llama', seed=1)
+    # Borrador que propone siempre el token 0 (logits todos iguales): nunca coincide con el modelo
+    with torch.no_grad():
+        draft.lm_head.weight.zero_()
+    reference = greedy_reference(model, prompts, MAX_NEW_TOKENS, EOS)
+    assert all(0 not in tokens for tokens in reference)
+    speculative = decoder(model, draft, k)
+    assert speculative.generate_ids(prompts) == reference
+    assert speculative.stats['accepted_tokens'] == 0 and speculative.stats['drafted_tokens'] > 0
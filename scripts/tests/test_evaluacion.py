@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('pandas')
+
+from comun.backends import FakeBackend
+from comun.cache_generacion import GenerationCache
+from comun.evaluacion import generate_predictions
+
+PROMPTS = ['¿Cuál es el género de Amores perros?', '¿Cuál es el director de La ciénaga?']
+
+
+class OtherEngine(FakeBackend):
+    """Mismo modelo y decodificación que FakeBackend, otro motor y otras salidas"""
+
+    name = 'fake-otro'
+
+    def generate(self, prompts):
+        return [f'otro: {prediction}' for prediction in super().generate(prompts)]
+
+
+def test_cache_is_per_engine(tmp_path):
+    cache = GenerationCache(str(tmp_path / 'cache.sqlite'))
+    try:
+        fake = generate_predictions(FakeBackend(), PROMPTS, cache)
+        other = generate_predictions(OtherEngine(), PROMPTS, cache)
+        assert other == OtherEngine().generate([FakeBackend().build_prompt(p) for p in PROMPTS])
+        assert other != fake
+        # La segunda corrida de cada motor sale entera de la caché, con sus propias salidas
+        hits = cache.hits
+        assert generate_predictions(FakeBackend(), PROMPTS, cache) == fake
+        assert generate_predictions(OtherEngine(), PROMPTS, cache) == other
+        assert cache.hits - hits == 2 * len(PROMPTS)
+    finally:
+        cache.close()
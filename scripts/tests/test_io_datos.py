@@ -0,0 +1,22 @@
+import pytest
+
+from comun.io_datos import iter_records, load_dataset, save_dataset
+
+# U+0085 es el "…" de cp1252 leído como latin-1; U+2028/U+2029 separan líneas para str.splitlines
+SEPARADORES = 'Canci\x85n   y  '
+
+
+@pytest.mark.parametrize('name', ['datos.jsonl', 'datos.jsonl.gz', 'datos.json'])
+def test_line_separators_inside_strings(tmp_path, name):
+    data = [{'entidad': SEPARADORES, 'respuesta': 'r'}, {'entidad': 'otra', 'respuesta': SEPARADORES}]
+    path = str(tmp_path / name)
+    save_dataset(data, path)
+    assert list(iter_records(path)) == data
+    assert load_dataset(path) == data
+
+
+def test_grouped_round_trip(tmp_path):
+    data = {'latam': [{'entidad': SEPARADORES, 'preguntas': [{'pregunta': 'p'}]}], 'usa': [], 'n': 3}
+    path = str(tmp_path / 'agrupado.jsonl.gz')
+    save_dataset(data, path)
+    assert load_dataset(path) == data
@@ -1,13 +1,14 @@
-import json
+
+from comun.columnar import load_json, prefer_parquet
+from comun.io_datos import save_dataset
 
 # Usamos el archivo limpio que generamos antes
 INPUT_FILE = "subset_experimento_final.json"
-OUTPUT_FILE = "dataset_completion_base_full.json" # Cambié el nombre para diferenciar
+OUTPUT_FILE = "dataset_completion_base_full.json" # Cambié el nombre para diferenciar (.jsonl.gz / .jsonl.zst: JSONL comprimido)
 
 print(f"Transformando {INPUT_FILE} a formato Completion (CON REPETIDOS)...")
 
-with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+data = load_json(prefer_parquet(INPUT_FILE))
 
 nuevo_dataset = {"latam": [], "usa": []}
 
@@ -62,8 +63,7 @@ for region in ["latam", "usa"]:
             "samples": nuevas_preguntas
         })
 
-with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-    json.dump(nuevo_dataset, f, ensure_ascii=False, indent=4)
+save_dataset(nuevo_dataset, OUTPUT_FILE)
 
 print(f"¡Listo! Dataset guardado en {OUTPUT_FILE}")
 print(f"Total de samples generados: {total_items}")
\ No newline at end of file
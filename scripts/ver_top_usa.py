@@ -1,18 +1,17 @@
-import json
 from collections import Counter
 
+from comun.io_datos import iter_records
+from comun.plantillas_qa import extraer_entidad
+
 FILE_USA = "usa_qa.json"
 
 print(f"--- Analizando Top 50 USA en {FILE_USA} ---")
 
-with open(FILE_USA, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
 conteo = Counter()
-for item in data:
+for item in iter_records(FILE_USA):
     try:
-        # Extraemos la entidad (mismo método que antes)
-        entidad = item['pregunta'].split(" de ")[-1].replace("?", "").strip()
+        # Extraemos la entidad (mismo extractor que los mineros)
+        entidad = extraer_entidad(item['pregunta'])
         # Filtro básico: Que empiece con Mayúscula y tenga más de 3 letras
         if len(entidad) > 3 and entidad[0].isupper():
             conteo[entidad] += 1